@@ -1,60 +1,196 @@
 
-from fastapi import FastAPI, HTTPException
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, Field, validator
-import joblib
-import pandas as pd
+from pydantic.json_schema import SkipJsonSchema
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import math
+import threading
+import numpy as np
 import json
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
-from src.feature_extractor import extract_features, get_feature_vector
-
-# --- Load model and metadata ---
-MODEL_PATH = "src/phishing_model.pkl"
-METADATA_PATH = "src/model_metadata.json"
-FEATURE_COLUMNS_PATH = "src/feature_columns.json"
-
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"✅ Model loaded from {MODEL_PATH}")
-except Exception as e:
-    raise RuntimeError(f"Error loading model from {MODEL_PATH}: {e}")
-
-# Load feature columns
-try:
-    with open(FEATURE_COLUMNS_PATH, 'r') as f:
-        FEATURE_COLUMNS = json.load(f)
-    print(f"✅ Loaded {len(FEATURE_COLUMNS)} feature columns")
-except FileNotFoundError:
-    print("⚠️  feature_columns.json not found, using fallback")
-    FEATURE_COLUMNS = [
-        'NumDots', 'SubdomainLevel', 'PathLevel', 'UrlLength', 'NumDash', 'NumDashInHostname',
-        'AtSymbol', 'TildeSymbol', 'NumUnderscore', 'NumPercent', 'NumQueryComponents', 'NumAmpersand',
-        'NumHash', 'NumNumericChars', 'NoHttps', 'RandomString', 'IpAddress', 'DomainInSubdomains',
-        'DomainInPaths', 'HttpsInHostname', 'HostnameLength', 'PathLength', 'QueryLength',
-        'DoubleSlashInPath', 'NumSensitiveWords', 'EmbeddedBrandName', 'PctExtHyperlinks',
-        'PctExtResourceUrls', 'ExtFavicon', 'InsecureForms', 'RelativeFormAction', 'ExtFormAction',
-        'AbnormalFormAction', 'PctNullSelfRedirectHyperlinks', 'FrequentDomainNameMismatch',
-        'FakeLinkInStatusBar', 'RightClickDisabled', 'PopUpWindow', 'SubmitInfoToEmail',
-        'IframeOrFrame', 'MissingTitle', 'ImagesOnlyInForm', 'SubdomainLevelRT', 'UrlLengthRT',
-        'PctExtResourceUrlsRT', 'AbnormalExtFormActionR', 'ExtMetaScriptLinkRT',
-        'PctExtNullSelfRedirectHyperlinksRT'
-    ]
-
-MODEL_INFO = {}
-if os.path.exists(METADATA_PATH):
-    with open(METADATA_PATH, 'r') as f:
-        MODEL_INFO = json.load(f)
+from src.domain_index import DENY, DomainIndex, load_domain_index
+from src.drift_monitor import DriftMonitor
+from src.feature_extractor import (PAGE_FEATURE_COLUMNS, extract_features, extract_features_batch, feature_cache_stats,
+                                   get_feature_vector, normalize_url)
+from src.metrics import REGISTRY, CallbackGauge, Counter, LabeledHistogram, process_memory
+from src.micro_batcher import MicroBatcher
+from src.model_registry import ModelBundle, check_probabilities, files_signature, load_bundle, validate_bundle
+from src.page_analyzer import HAS_HTTPX, PageAnalyzer
+from src.public_suffix import host_from_url
+from src.scoring_executor import PROCESS, ExecutorBusy, ScoringExecutor
+from src.verdict_cache import VerdictCache
+
+# --- Model directory: this package unless MODEL_DIR overrides it ---
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.dirname(os.path.abspath(__file__)))
+# Seconds between checks for a new model on disk; 0 disables the file watcher
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+# Token required by POST /admin/reload; the endpoint is disabled when unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# Optional domain lists answered without the model (see domain_index.py); the denylist wins
+DOMAIN_ALLOWLIST_PATH = os.environ.get("DOMAIN_ALLOWLIST_PATH", "")
+DOMAIN_DENYLIST_PATH = os.environ.get("DOMAIN_DENYLIST_PATH", "")
+
+# Verdicts keyed by normalized URL; 0 entries disables the cache
+verdict_cache = VerdictCache(
+    max_entries=int(os.environ.get("VERDICT_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("VERDICT_CACHE_TTL_SECONDS", "300"))
+)
+
+# The served model, feature columns and metadata, swapped as one object on reload.
+# Populated by initialize() at startup, not at import.
+active_bundle: Optional[ModelBundle] = None
+drift_monitor: Optional[DriftMonitor] = None
+domain_index: Optional[DomainIndex] = None
+ready = False
+STARTUP_TIMINGS = {}
+# Per-worker resident memory before and after the model was loaded
+STARTUP_MEMORY = {}
+
+# Upper bound on URLs accepted by /predict/batch in a single request
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+
+# Dedicated pool for the CPU-bound scoring (see scoring_executor.py): "thread" or "process", its size
+# (0: one worker per core), and how many scoring calls may be queued or running (0: 64 per worker)
+# before /predict answers 503 with Retry-After
+SCORING_EXECUTOR = os.environ.get("SCORING_EXECUTOR", "thread").lower()
+SCORING_WORKERS = int(os.environ.get("SCORING_WORKERS", "0"))
+SCORING_MAX_PENDING = int(os.environ.get("SCORING_MAX_PENDING", "0"))
+SCORING_RETRY_AFTER_SECONDS = float(os.environ.get("SCORING_RETRY_AFTER_SECONDS", "1"))
+
+# Optional micro-batching of concurrent /predict calls (see micro_batcher.py)
+MICRO_BATCH_ENABLED = os.environ.get("MICRO_BATCH_ENABLED", "0").lower() in ("1", "true", "yes")
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "2"))
+MICRO_BATCH_CONCURRENCY = int(os.environ.get("MICRO_BATCH_CONCURRENCY", "2"))
+
+# Answer confident URLs with the first-stage model when the served model has one (see model_training.py)
+CASCADE_ENABLED = os.environ.get("CASCADE_ENABLED", "1").lower() in ("1", "true", "yes")
+STAGE_FIRST = "first_stage"
+STAGE_FULL = "full"
+
+# Optional page fetch for the HTML-based features of /predict (see page_analyzer.py); needs httpx
+PAGE_ANALYSIS_ENABLED = os.environ.get("PAGE_ANALYSIS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Per-feature drift of live traffic against the training data, over the last DRIFT_WINDOW model verdicts
+# served (cache hits included), when the model's metadata has a reference (see drift_monitor.py)
+DRIFT_MONITOR_ENABLED = os.environ.get("DRIFT_MONITOR_ENABLED", "1").lower() in ("1", "true", "yes")
+DRIFT_WINDOW = int(os.environ.get("DRIFT_WINDOW", "10000"))
+DRIFT_SLICES = int(os.environ.get("DRIFT_SLICES", "10"))
+
+# --- Metrics (served on /metrics) ---
+REQUESTS = REGISTRY.register(Counter(
+    "phishing_api_requests_total", "HTTP requests by route and status", labelnames=("method", "route", "status")
+))
+REQUEST_SECONDS = REGISTRY.register(LabeledHistogram(
+    "phishing_api_request_duration_seconds", "End-to-end request latency", labelnames=("route",)
+))
+# validation (body read, JSON parsing and pydantic checks), feature_extraction, array_build,
+# first_stage, predict_proba (or predict), response_build and serialization
+STAGE_SECONDS = REGISTRY.register(LabeledHistogram(
+    "phishing_api_stage_duration_seconds", "Latency of each stage of a prediction request", labelnames=("stage",)
+))
+PREDICTIONS = REGISTRY.register(Counter(
+    "phishing_api_predictions_total", "Verdicts returned, by risk level and what answered",
+    labelnames=("risk_level", "source", "stage")
+))
+REGISTRY.register(CallbackGauge(
+    "phishing_model_info", "The served model (value is always 1)",
+    lambda: {(active_bundle.version, type(active_bundle.model).__name__): 1} if active_bundle else {},
+    labelnames=("version", "model_type")
+))
+REGISTRY.register(CallbackGauge("phishing_api_ready", "1 once the model is loaded and warmed up",
+                                lambda: {(): int(ready)}))
+REGISTRY.register(CallbackGauge(
+    "phishing_scoring_pending", "Scoring calls queued or running on the scoring executor",
+    lambda: {(): scoring_executor.pending}
+))
+REGISTRY.register(CallbackGauge(
+    "phishing_scoring_rejected_total", "Scoring calls refused with 503 because the executor queue was full",
+    lambda: {(): scoring_executor.rejected}, kind="counter"
+))
+REGISTRY.register(CallbackGauge(
+    "phishing_feature_psi", "Population stability index of each feature over the drift window",
+    lambda: {(col,): score["psi"] for col, score in drift_monitor.scores()["features"].items()}
+    if drift_monitor is not None else {},
+    labelnames=("feature",)
+))
+REGISTRY.register(CallbackGauge(
+    "phishing_verdict_cache_lookups_total", "Verdict cache lookups by result",
+    lambda: {("hit",): verdict_cache.hits, ("miss",): verdict_cache.misses}, labelnames=("result",), kind="counter"
+))
+
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware (cheaper than BaseHTTPMiddleware) that counts requests and times them.
+    Route handlers read scope["state"]["started"] to time validation, and set "handler_done"
+    so the time FastAPI spends serializing the response can be recorded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["started"] = started
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                handler_done = state.get("handler_done")
+                if handler_done is not None:
+                    STAGE_SECONDS.observe(time.perf_counter() - handler_done, "serialization")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.inc(scope["method"], route, str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route)
+
 
 # --- FastAPI setup ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up off the event loop; /ready flips once this finishes
+    await run_in_threadpool(initialize)
+    watcher = asyncio.create_task(watch_model_files()) if MODEL_WATCH_INTERVAL > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    scoring_executor.shutdown(wait=False)
+    if page_analyzer is not None:
+        await page_analyzer.aclose()
+
+
 app = FastAPI(
     title="Phishing URL Detection API",
     description="Detects if a given URL is likely to be phishing or safe using ML model.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(RequestMetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -69,11 +205,11 @@ class URLRequest(BaseModel):
     
     @validator('url')
     def validate_url(cls, v):
-        if not v.strip():
-            raise ValueError("URL cannot be empty")
-        if not any(v.startswith(prefix) for prefix in ['http://', 'https://', 'ftp://']):
-            v = 'https://' + v
-        return v
+        return normalize_url(v)
+
+
+class BatchURLRequest(BaseModel):
+    urls: List[str] = Field(..., description="URLs to check for phishing", min_length=1, max_length=MAX_BATCH_SIZE)
 
 
 class PhishingPredictionResponse(BaseModel):
@@ -88,6 +224,11 @@ class PhishingPredictionResponse(BaseModel):
     probability: float = Field(..., description="Probability of being phishing (0-1)")
     risk_level: str = Field(..., description="LOW, MEDIUM, or HIGH")
     timestamp: str = Field(..., description="ISO timestamp of analysis")
+    source: str = Field("model", description="What answered: model, allowlist or denylist")
+    stage: Optional[str] = Field(None, description="For model verdicts, which model answered: first_stage or full")
+    # Model input row behind the verdict, kept with it in the cache so every served copy reaches the drift
+    # monitor; never serialized
+    feature_row: SkipJsonSchema[Any] = Field(None, exclude=True, repr=False)
     
     class Config:
         json_schema_extra = {
@@ -98,12 +239,34 @@ class PhishingPredictionResponse(BaseModel):
                 "confidence": 85.5,
                 "probability": 0.075,
                 "risk_level": "LOW",
-                "timestamp": "2025-01-15T10:30:00Z"
+                "timestamp": "2025-01-15T10:30:00Z",
+                "source": "model",
+                "stage": "first_stage"
             }
         }
 
 
+class BatchPredictionItem(BaseModel):
+    """Result for one URL of a batch: either a prediction or an error message"""
+    url: str = Field(..., description="The URL as submitted")
+    result: Optional[PhishingPredictionResponse] = Field(None, description="Prediction, if scoring succeeded")
+    error: Optional[str] = Field(None, description="Error message, if scoring failed")
+
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchPredictionItem] = Field(..., description="One entry per submitted URL, in input order")
+    count: int = Field(..., description="Number of URLs submitted")
+    errors: int = Field(..., description="Number of URLs that could not be scored")
+
+
 # --- Helper Functions ---
+class ScoringError(HTTPException):
+    """HTTPException that survives pickling, so process-pool workers can raise or return it"""
+
+    def __reduce__(self):
+        return type(self), (self.status_code, self.detail)
+
+
 def get_risk_level(probability: float) -> str:
     """Categorize risk based on probability"""
     if probability < 0.3:
@@ -114,46 +277,486 @@ def get_risk_level(probability: float) -> str:
         return "HIGH"
 
 
-def predict_phishing_from_url(url: str) -> PhishingPredictionResponse:
+_last_timestamp = (0, "")
+
+
+def utc_timestamp() -> str:
+    """ISO timestamp of now, to the millisecond; formatted once per millisecond and shared by the calls within it"""
+    global _last_timestamp
+    now = time.time()
+    millis = int(now * 1000)
+    if _last_timestamp[0] != millis:
+        _last_timestamp = (millis, datetime.utcfromtimestamp(now).isoformat(timespec="milliseconds") + "Z")
+    return _last_timestamp[1]
+
+
+def json_response(model: BaseModel) -> Response:
+    """
+    Encode an already validated response model in one pydantic-core call. Returning a Response skips
+    FastAPI's response_model round trip (re-validation, jsonable_encoder, json.dumps); response_model
+    stays on the routes for the docs.
+    """
+    return Response(model.model_dump_json(), media_type="application/json")
+
+
+def busy_error(e: ExecutorBusy) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+
+def record_validation(request: Request):
+    """Time from the request arriving to the handler starting: body read, parsing and validation"""
+    started = getattr(request.state, "started", None)
+    if started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - started, "validation")
+
+
+def record_prediction(result: PhishingPredictionResponse):
+    """Count a verdict served to a client, and feed its features to the drift monitor"""
+    PREDICTIONS.inc(result.risk_level, result.source, result.stage or "none")
+    monitor, row = drift_monitor, result.feature_row
+    # A verdict scored by the previous model during a reload may have other columns
+    if monitor is not None and row is not None and len(row) == monitor.row_size:
+        monitor.observe(row)
+
+
+def build_prediction_response(url: str, prediction: int, probability: float, source: str = "model",
+                              stage: Optional[str] = None,
+                              feature_row: Optional[np.ndarray] = None) -> PhishingPredictionResponse:
+    """Turn a raw model output (or a domain list verdict) into the unified response model"""
+    risk_level = get_risk_level(probability)
+    confidence = abs(probability - 0.5) * 200  # Scale to 0-100%
+
+    return PhishingPredictionResponse(
+        url=url,
+        is_phishing=bool(prediction == 1),
+        prediction=prediction,
+        confidence=round(confidence, 2),
+        probability=round(probability, 4),
+        risk_level=risk_level,
+        timestamp=utc_timestamp(),
+        source=source,
+        stage=stage,
+        feature_row=feature_row
+    )
+
+
+def listed_verdict(url: str) -> Optional[PhishingPredictionResponse]:
+    """Verdict for a URL whose host, or a parent domain, is on the allowlist or denylist; None otherwise"""
+    if domain_index is None:
+        return None
+    listed = domain_index.lookup(host_from_url(url))
+    if listed is None:
+        return None
+    prediction = 1 if listed == DENY else 0
+    return build_prediction_response(url, prediction, float(prediction), source=listed)
+
+
+def score_feature_matrix(model, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a (n_urls, n_features) matrix with a single model call.
+    Returns (predictions, phishing probabilities), one entry per row.
+    """
+    started = time.perf_counter()
+    try:
+        proba = model.predict_proba(X)
+    except AttributeError:
+        # Timed from the first attempt, so the failed predict_proba call is not lost from the stage latency
+        predictions = np.asarray(model.predict(X)).astype(int)
+        STAGE_SECONDS.observe(time.perf_counter() - started, "predict")
+        return predictions, predictions.astype(float)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "predict_proba")
+
+    # Same rule as model.predict: the most probable class wins
+    classes = np.asarray(getattr(model, 'classes_', np.arange(proba.shape[1])))
+    predictions = classes[proba.argmax(axis=1)].astype(int)
+    return predictions, proba[:, 1]
+
+
+def score_rows(bundle: ModelBundle, X: np.ndarray,
+               use_cascade: bool = True) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Score a matrix in bundle.input_columns order. With a first stage, rows it scores at or beyond
+    its cut-offs keep its verdict and only the rows in between are sent to the full model.
+    Returns (predictions, phishing probabilities, stage that answered), one entry per row.
+    """
+    n_columns = len(bundle.feature_columns)
+    first_stage = bundle.first_stage if use_cascade and CASCADE_ENABLED else None
+    if first_stage is None:
+        predictions, probabilities = score_feature_matrix(bundle.model, X[:, :n_columns])
+        return predictions, probabilities, [STAGE_FULL] * len(X)
+
+    started = time.perf_counter()
+    probabilities = first_stage.model.predict_proba(X[:, first_stage.index])[:, 1].copy()
+    STAGE_SECONDS.observe(time.perf_counter() - started, "first_stage")
+    predictions = (probabilities >= first_stage.high_cutoff).astype(int)
+    escalate = (probabilities > first_stage.low_cutoff) & (probabilities < first_stage.high_cutoff)
+    rows = np.flatnonzero(escalate)
+    if len(rows):
+        predictions[rows], probabilities[rows] = score_feature_matrix(bundle.model, X[rows, :n_columns])
+    return predictions, probabilities, [STAGE_FULL if e else STAGE_FIRST for e in escalate.tolist()]
+
+
+def cache_verdict(bundle: ModelBundle, url: str, result: PhishingPredictionResponse):
+    """Cache a verdict, unless the model that produced it was replaced in the meantime"""
+    if bundle is active_bundle:
+        verdict_cache.put(url, result)
+
+
+def predict_phishing_from_url(url: str, use_cache: bool = True, bundle: Optional[ModelBundle] = None,
+                              use_domain_index: bool = True,
+                              page_features: Optional[dict] = None,
+                              use_cascade: bool = True) -> PhishingPredictionResponse:
     """
     Extract features from URL and predict if it's phishing.
+    Expects a URL already passed through normalize_url, which is also the cache key.
+    Listed domains are answered by the domain index before the cache or the model.
+    page_features (from the page analyzer) replace the HTML-based columns, which are 0 otherwise;
+    the URL-only first stage is skipped for them, since the page was fetched for the full model.
+    Uses the active model unless a bundle is given.
     Returns unified response model.
     """
+    listed = listed_verdict(url) if use_domain_index else None
+    if listed is not None:
+        return listed
+
+    cached = verdict_cache.get(url) if use_cache else None
+    if cached is not None:
+        return cached
+
+    # Captured once, so a reload mid-request doesn't mix models and feature columns
+    bundle = bundle or active_bundle
     try:
         # Extract features
-        features = get_feature_vector(url, FEATURE_COLUMNS)
+        started = time.perf_counter()
+        features = get_feature_vector(url, bundle.input_columns)
+        if page_features:
+            features.update((col, page_features[col]) for col in bundle.feature_columns if col in page_features)
+        extracted = time.perf_counter()
         
-        # Convert to DataFrame
-        X = pd.DataFrame([features])
-        X = X[FEATURE_COLUMNS]
-        X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
-        
-        # Make prediction
-        prediction = int(model.predict(X)[0])
-        
-        # Get probability
-        try:
-            probability = float(model.predict_proba(X)[0][1])
-        except AttributeError:
-            probability = float(prediction)
+        # One-row feature matrix, in training column order (plus any first-stage-only columns)
+        X = np.array([[features[col] for col in bundle.input_columns]], dtype=np.float64)
+        STAGE_SECONDS.observe(extracted - started, "feature_extraction")
+        STAGE_SECONDS.observe(time.perf_counter() - extracted, "array_build")
         
-        # Calculate risk level and confidence
-        risk_level = get_risk_level(probability)
-        confidence = abs(probability - 0.5) * 200  # Scale to 0-100%
+        # Make prediction and get probability: first stage, then the full model if it is unsure
+        predictions, probabilities, stages = score_rows(bundle, X, use_cascade and not page_features)
+        prediction = int(predictions[0])
+        probability = float(probabilities[0])
         
         # ✅ Return unified response
-        return PhishingPredictionResponse(
-            url=url,
-            is_phishing=bool(prediction == 1),
-            prediction=prediction,
-            confidence=round(confidence, 2),
-            probability=round(probability, 4),
-            risk_level=risk_level,
-            timestamp=datetime.utcnow().isoformat() + "Z"
-        )
+        started = time.perf_counter()
+        result = build_prediction_response(url, prediction, probability, stage=stages[0],
+                                           feature_row=X[0, :len(bundle.feature_columns)])
+        STAGE_SECONDS.observe(time.perf_counter() - started, "response_build")
+        cache_verdict(bundle, url, result)
+        return result
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+        raise ScoringError(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+def predict_phishing_from_urls(urls: List[str], use_cache: bool = True, bundle: Optional[ModelBundle] = None,
+                               use_domain_index: bool = True, use_cascade: bool = True) -> List[BatchPredictionItem]:
+    """
+    Score many URLs with one call per model stage.
+    Listed domains and cached verdicts (unless use_cache is False) are answered directly;
+    only the remaining URLs go through the model, and only those the first stage is unsure about
+    through the full model.
+    Uses the active model unless a bundle is given.
+    Invalid URLs or failed extractions are reported per item; the rest of the batch is still scored.
+    """
+    bundle = bundle or active_bundle
+    items = [BatchPredictionItem(url=url) for url in urls]
+    scored = []  # (item index, normalized url) for every row of the matrix
+
+    for i, url in enumerate(urls):
+        try:
+            normalized = normalize_url(url)
+        except ValueError as e:
+            items[i].error = f"Invalid URL: {str(e)}"
+            continue
+
+        cached = listed_verdict(normalized) if use_domain_index else None
+        if cached is None and use_cache:
+            cached = verdict_cache.get(normalized)
+        if cached is not None:
+            items[i].result = cached
+        else:
+            scored.append((i, normalized))
+
+    if not scored:
+        return items
+
+    try:
+        started = time.perf_counter()
+        X = extract_features_batch([normalized for _, normalized in scored], bundle.input_columns)
+        # The batch extractor writes straight into the matrix, so there is no separate array_build stage
+        STAGE_SECONDS.observe(time.perf_counter() - started, "feature_extraction")
+    except Exception as e:
+        for i, _ in scored:
+            items[i].error = f"Feature extraction error: {str(e)}"
+        return items
+
+    try:
+        predictions, probabilities, stages = score_rows(bundle, X, use_cascade)
+    except Exception as e:
+        for i, _ in scored:
+            items[i].error = f"Prediction error: {str(e)}"
+        return items
+
+    started = time.perf_counter()
+    n_columns = len(bundle.feature_columns)
+    for j, ((i, normalized), prediction, probability, stage) in enumerate(zip(scored, predictions, probabilities,
+                                                                            stages)):
+        # Copied, so a cached verdict doesn't keep the whole batch matrix alive
+        result = build_prediction_response(normalized, int(prediction), float(probability), stage=stage,
+                                           feature_row=X[j, :n_columns].copy())
+        cache_verdict(bundle, normalized, result)
+        items[i].result = result
+    STAGE_SECONDS.observe(time.perf_counter() - started, "response_build")
+
+    return items
+
+
+def score_micro_batch(urls: List[str]) -> list:
+    """Batch scorer for the micro-batcher: one response (or exception) per URL"""
+    # Callers already checked the domain index and the cache before queueing
+    items = predict_phishing_from_urls(urls, use_cache=False, use_domain_index=False)
+    return [item.result if item.result is not None
+            else ScoringError(status_code=500, detail=item.error)
+            for item in items]
+
+
+def init_scoring_worker():
+    """
+    Initializer of process-pool workers. Forked workers inherit the loaded model and domain index;
+    others load their own. Verdicts are cached by the API process, so workers keep none.
+    """
+    global active_bundle, domain_index
+    verdict_cache.max_entries = 0
+    verdict_cache.clear()
+    if active_bundle is None:
+        bundle = load_bundle(MODEL_DIR)
+        validate_bundle(bundle)
+        active_bundle = bundle
+    if domain_index is None and (DOMAIN_ALLOWLIST_PATH or DOMAIN_DENYLIST_PATH):
+        domain_index = load_domain_index(DOMAIN_ALLOWLIST_PATH, DOMAIN_DENYLIST_PATH)
+
+
+scoring_executor = ScoringExecutor(
+    SCORING_EXECUTOR,
+    workers=SCORING_WORKERS,
+    max_pending=SCORING_MAX_PENDING,
+    retry_after=SCORING_RETRY_AFTER_SECONDS,
+    initializer=init_scoring_worker if SCORING_EXECUTOR == PROCESS else None
+)
+
+page_analyzer = PageAnalyzer() if PAGE_ANALYSIS_ENABLED and HAS_HTTPX else None
+if PAGE_ANALYSIS_ENABLED and not HAS_HTTPX:
+    print("⚠️  PAGE_ANALYSIS_ENABLED is set but httpx is not installed; using URL-only features")
+
+micro_batcher = MicroBatcher(
+    score_micro_batch,
+    max_batch_size=MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+    max_concurrent_batches=MICRO_BATCH_CONCURRENCY,
+    executor=scoring_executor.start
+) if MICRO_BATCH_ENABLED else None
+
+
+# In-flight predictions by normalized URL: concurrent requests for the same URL share one task
+_inflight: Dict[str, asyncio.Task] = {}
+coalesced_requests = 0
+
+
+def uses_page_features(bundle: ModelBundle) -> bool:
+    """Whether the model has any HTML-based column, i.e. whether fetching the page can change its verdict"""
+    return not set(PAGE_FEATURE_COLUMNS).isdisjoint(bundle.feature_columns)
+
+
+async def _score_url(url: str) -> PhishingPredictionResponse:
+    # Callers already checked the domain index and the cache
+    bundle = active_bundle
+    page_features = None
+    if page_analyzer is not None and uses_page_features(bundle):
+        page_features = await page_analyzer.analyze(url)
+    if page_features is not None:
+        # The batch extractor has no HTML columns, so pages that were analyzed skip the micro-batcher
+        result = await scoring_executor.run(predict_phishing_from_url, url, False, None, False, page_features)
+    elif micro_batcher is not None:
+        with scoring_executor.admit():
+            result = await micro_batcher.submit(url)
+    else:
+        result = await scoring_executor.run(predict_phishing_from_url, url, False, None, False)
+    if scoring_executor.kind == PROCESS:
+        cache_verdict(bundle, url, result)  # workers keep no verdict cache
+    return result
+
+
+async def score_batch(urls: List[str]) -> List[BatchPredictionItem]:
+    """
+    predict_phishing_from_urls on the scoring executor. Process workers keep no verdict cache, so in
+    that mode cached URLs are answered here, only the rest are sent, and new verdicts are cached here.
+    """
+    if scoring_executor.kind != PROCESS:
+        return await scoring_executor.run(predict_phishing_from_urls, urls)
+
+    bundle = active_bundle
+    items, pending = [], []
+    for url in urls:
+        try:
+            cached = verdict_cache.get(normalize_url(url))
+        except ValueError:
+            cached = None  # reported by the worker
+        items.append(BatchPredictionItem(url=url, result=cached))
+        if cached is None:
+            pending.append(len(items) - 1)
+    if pending:
+        scored = await scoring_executor.run(predict_phishing_from_urls, [urls[i] for i in pending])
+        for i, item in zip(pending, scored):
+            items[i] = item
+            if item.result is not None and item.result.source == "model":
+                cache_verdict(bundle, item.result.url, item.result)
+    return items
+
+
+async def predict_single_flight(url: str) -> PhishingPredictionResponse:
+    """
+    Score a normalized URL, joining the prediction already running for it if there is one.
+    The shared task is shielded, so a disconnecting caller doesn't cancel it for the others.
+    """
+    global coalesced_requests
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.get_running_loop().create_task(_score_url(url))
+        _inflight[url] = task
+        task.add_done_callback(lambda done: _inflight.pop(url, None) if _inflight.get(url) is done else None)
+    else:
+        coalesced_requests += 1
+    return await asyncio.shield(task)
+
+
+# --- Startup ---
+# Representative URLs pushed through both scoring paths before the service reports ready
+WARMUP_URLS = [
+    "https://www.google.com",
+    "http://192.168.1.1/login",
+    "https://secure-paypal-verify.com/update?account=1&session=abc",
+    "http://bit.ly/xyz123",
+]
+
+
+def warm_up(bundle: ModelBundle):
+    """
+    Exercise extraction and scoring once, so the first real request doesn't pay for lazy setup.
+    Also checks that the model returns sane probabilities. Bypasses the domain index, which
+    could otherwise answer for the warm-up URLs without touching the model, and the batch goes
+    past the first stage so the full model is always exercised.
+    """
+    result = predict_phishing_from_url(normalize_url(WARMUP_URLS[0]), use_cache=False, bundle=bundle,
+                                       use_domain_index=False)
+    items = predict_phishing_from_urls(WARMUP_URLS, use_cache=False, bundle=bundle, use_domain_index=False,
+                                       use_cascade=False)
+    errors = [item.error for item in items if item.error is not None]
+    if errors:
+        raise ValueError(f"Warm-up failed: {errors[0]}")
+    check_probabilities([result.probability] + [item.result.probability for item in items])
+
+
+def activate_bundle(bundle: ModelBundle):
+    """Atomically make bundle the served model and drop verdicts cached from the previous one"""
+    global active_bundle, drift_monitor
+    monitor = None
+    if DRIFT_MONITOR_ENABLED:
+        monitor = DriftMonitor.from_metadata(bundle.info, bundle.feature_columns, window=DRIFT_WINDOW,
+                                             slices=DRIFT_SLICES)
+    active_bundle, drift_monitor = bundle, monitor
+    verdict_cache.clear()
+    print(f"✅ Serving model {bundle.version} from {bundle.path}")
+    if page_analyzer is not None and not uses_page_features(bundle):
+        print("ℹ️  The model has no HTML-based columns: pages are not fetched while it is served")
+
+
+# Serializes reloads; requests never take this lock
+_reload_lock = threading.Lock()
+RELOAD_STATUS = {"reloads": 0, "failures": 0, "last_error": None, "last_reload_at": None}
+
+
+def reload_model() -> ModelBundle:
+    """
+    Load, validate and warm up the model currently in MODEL_DIR, then swap it in.
+    Requests already running keep the bundle they started with. On failure the old model stays.
+    """
+    with _reload_lock:
+        try:
+            bundle = load_bundle(MODEL_DIR)
+            validate_bundle(bundle)
+            warm_up(bundle)
+        except Exception as e:
+            RELOAD_STATUS["failures"] += 1
+            RELOAD_STATUS["last_error"] = str(e)
+            print(f"❌ Model reload failed, keeping {active_bundle.version if active_bundle else 'no model'}: {e}")
+            raise
+        activate_bundle(bundle)
+        if scoring_executor.kind == PROCESS:
+            scoring_executor.restart()  # new workers are forked with (or load) the new model
+        RELOAD_STATUS["reloads"] += 1
+        RELOAD_STATUS["last_error"] = None
+        RELOAD_STATUS["last_reload_at"] = bundle.loaded_at
+        return bundle
+
+
+async def watch_model_files():
+    """Reload once the model files in MODEL_DIR change and then stay unchanged for one interval"""
+    current = files_signature(MODEL_DIR)
+    pending = None
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        signature = files_signature(MODEL_DIR)
+        if signature == current:
+            pending = None
+        elif signature != pending:
+            pending = signature  # still being written; check again next interval
+        else:
+            current, pending = signature, None
+            try:
+                await run_in_threadpool(reload_model)
+            except Exception:
+                pass  # already recorded in RELOAD_STATUS
+
+
+def initialize():
+    """
+    Load the domain lists (if configured) and load, validate and warm up the model,
+    then mark the service ready. Records time per phase.
+    """
+    global ready, domain_index
+    STARTUP_MEMORY["before_load"] = process_memory()
+    if DOMAIN_ALLOWLIST_PATH or DOMAIN_DENYLIST_PATH:
+        started = time.perf_counter()
+        domain_index = load_domain_index(DOMAIN_ALLOWLIST_PATH, DOMAIN_DENYLIST_PATH)
+        STARTUP_TIMINGS["domain_index_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    bundle = load_bundle(MODEL_DIR)
+    STARTUP_TIMINGS["model_load_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    validate_bundle(bundle)
+    warm_up(bundle)
+    STARTUP_TIMINGS["warm_up_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    STARTUP_MEMORY["after_load"] = process_memory()
+
+    activate_bundle(bundle)
+    # Created after the model is loaded, so forked process workers inherit it
+    scoring_executor.start()
+    ready = True
+    print(f"✅ Ready (pid {os.getpid()}): {STARTUP_TIMINGS}, memory {STARTUP_MEMORY}")
+
+
+def require_ready():
+    if not ready:
+        raise HTTPException(status_code=503, detail="Model is still loading")
 
 
 # --- API Routes ---
@@ -162,38 +765,170 @@ def root():
     return {
         "message": "🛡️ Phishing URL Detection API",
         "version": "1.0.0",
-        "model_info": MODEL_INFO,
+        "model_version": active_bundle.version if active_bundle else None,
+        "model_info": active_bundle.info if active_bundle else {},
         "endpoints": {
             "/predict": "POST - Predict if URL is phishing",
+            "/predict/batch": "POST - Predict many URLs in one call",
             "/health": "GET - Check API health",
+            "/ready": "GET - Readiness probe (model loaded and warmed up)",
+            "/drift": "GET - Per-feature drift (PSI/KS) of recent traffic against the training data",
+            "/metrics": "GET - Prometheus metrics (requests, per-stage latency, verdicts by risk level)",
+            "/admin/reload": "POST - Load the model on disk and swap it in (X-Admin-Token)",
             "/docs": "GET - API documentation"
         }
     }
 
 
+def cascade_status(bundle: Optional[ModelBundle]) -> dict:
+    first_stage = bundle.first_stage if bundle is not None else None
+    if first_stage is None or not CASCADE_ENABLED:
+        return {"enabled": False}
+    trained = bundle.info.get("cascade") or {}
+    return {
+        "enabled": True,
+        "low_cutoff": first_stage.low_cutoff,
+        "high_cutoff": first_stage.high_cutoff,
+        "features_count": len(first_stage.feature_columns),
+        "escalation_rate_at_training": trained.get("escalation_rate"),
+        "accuracy_change_at_training": trained.get("accuracy_change")
+    }
+
+
 @app.get("/health")
 def health_check():
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
-        "features_count": len(FEATURE_COLUMNS)
+        "model_loaded": active_bundle is not None,
+        "model_version": active_bundle.version if active_bundle else None,
+        "model_loaded_at": active_bundle.loaded_at if active_bundle else None,
+        "model_reloads": RELOAD_STATUS,
+        "features_count": len(active_bundle.feature_columns) if active_bundle else 0,
+        "model_memory_mapped": getattr(active_bundle.model, "memory_mapped", False) if active_bundle else False,
+        "memory": {"pid": os.getpid(), **STARTUP_MEMORY, "current": process_memory()},
+        "verdict_cache": verdict_cache.stats(),
+        "feature_cache": feature_cache_stats(),
+        "cascade": cascade_status(active_bundle),
+        "domain_index": domain_index.stats() if domain_index is not None else {"enabled": False},
+        "page_analysis": {**page_analyzer.stats(),
+                          "used_by_model": bool(active_bundle) and uses_page_features(active_bundle)}
+        if page_analyzer is not None else {"enabled": False},
+        "micro_batching": micro_batcher.stats() if micro_batcher is not None else {"enabled": False},
+        "scoring_executor": scoring_executor.stats(),
+        "single_flight": {"in_flight": len(_inflight), "coalesced_requests": coalesced_requests}
     }
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before that"""
+    body = {"ready": ready, "startup": STARTUP_TIMINGS}
+    return body if ready else JSONResponse(status_code=503, content=body)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the process-wide metrics registry"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/drift")
+def drift():
+    """
+    Per-feature PSI and KS of the model verdicts served recently (cached and coalesced ones included)
+    against the training data, most drifted first. Verdicts from the domain allow/deny lists are not
+    counted, as no features are extracted for them.
+    PSI above 0.1 is reported as moderate and above 0.25 as significant drift.
+    """
+    monitor = drift_monitor
+    if monitor is None:
+        reason = "disabled" if not DRIFT_MONITOR_ENABLED else "model metadata has no drift_reference"
+        return {"enabled": False, "reason": reason}
+    reference = active_bundle.info.get("drift_reference", {}) if active_bundle else {}
+    return {"enabled": True, "model_version": active_bundle.version if active_bundle else None,
+            "reference_rows": reference.get("rows"), "excludes": "domain allowlist/denylist verdicts",
+            **monitor.scores()}
+
+
 @app.post("/predict", response_model=PhishingPredictionResponse)
-def predict_url(data: URLRequest):
+async def predict_url(data: URLRequest, request: Request):
     """
     ✅ Predict if a URL is phishing or safe.
     Returns standardized PhishingPredictionResponse model.
+    Listed domains are answered without the model (source shows which list).
+    With PAGE_ANALYSIS_ENABLED the page is fetched for the HTML-based features, falling back to
+    URL-only features when it can't be fetched in time.
+    Concurrent requests for the same URL share one prediction; with micro-batching enabled,
+    cache misses are queued and scored together with other concurrent requests.
+    Scoring runs on the scoring executor; when its queue is full the answer is 503 with Retry-After.
     """
+    record_validation(request)
+    require_ready()
     try:
-        result = predict_phishing_from_url(data.url)
-        return result
+        result = listed_verdict(data.url) or verdict_cache.get(data.url)
+        if result is None:
+            result = await predict_single_flight(data.url)
     except HTTPException:
         raise
+    except ExecutorBusy as e:
+        raise busy_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    record_prediction(result)
+    request.state.handler_done = time.perf_counter()
+    return json_response(result)
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_urls(data: BatchURLRequest, request: Request):
+    """
+    ✅ Predict many URLs at once with a single model call.
+    Results are returned in input order; a bad URL only fails its own entry.
+    The whole batch is one call on the scoring executor (503 with Retry-After when its queue is full).
+    """
+    record_validation(request)
+    require_ready()
+    try:
+        items = await score_batch(data.urls)
+    except ExecutorBusy as e:
+        raise busy_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+    for item in items:
+        if item.result is not None:
+            record_prediction(item.result)
+    response = BatchPredictionResponse(
+        results=items,
+        count=len(items),
+        errors=sum(1 for item in items if item.error is not None)
+    )
+    request.state.handler_done = time.perf_counter()
+    return json_response(response)
+
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: str = Header("")):
+    """
+    Load the model files currently in MODEL_DIR in the background and swap them in atomically.
+    In-flight requests finish on the old model; on validation failure the old model keeps serving.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model reload is disabled (ADMIN_TOKEN not set)")
+    # Constant-time comparison; bytes, since compare_digest refuses non-ASCII str
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    previous = active_bundle.version if active_bundle else None
+    try:
+        bundle = await run_in_threadpool(reload_model)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model reload failed: {str(e)}")
+    return {"previous_version": previous, "model_version": bundle.version, "loaded_at": bundle.loaded_at}
+
+
+STARTUP_TIMINGS["imports_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+
 
 if __name__ == "__main__":
     import uvicorn
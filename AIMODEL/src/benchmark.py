@@ -0,0 +1,446 @@
+"""
+Reproducible benchmarks for feature extraction, inference and the HTTP path.
+
+A seeded generator builds the same URL corpus on every run (benign sites, brand-squatting hosts,
+raw IP hosts and long query strings). Each target is timed call by call for p50/p99 latency and
+throughput, then run again under tracemalloc on a sample for the bytes allocated per call.
+/predict goes through an in-process ASGI client at several concurrency levels.
+extract_features is also compared with reference_extract_features, the extractor as it was before
+its rewrite: the run reports the p50 speed-up and fails if any URL gets different values.
+
+Results are saved as JSON; pass --baseline with an earlier file to compare and exit non-zero
+when a target got slower than --max-regression allows. A target that cannot run (no model in
+MODEL_DIR, read by both model_predict.py and the API) is reported and also fails the run.
+
+    cd AIMODEL && python -m src.benchmark --urls 2000 --output bench.json
+    python -m src.benchmark --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+if not __package__:  # run as a script from inside src/: make the "src." imports below resolve
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.feature_extractor import EXPECTED_FEATURES, extract_features, get_feature_vector  # noqa: E402
+
+CATEGORIES = ("benign", "brand_squatting", "ip_host", "long_query")
+CONCURRENCY_LEVELS = (1, 8, 32)
+# Calls measured under tracemalloc per target (it slows every allocation down)
+ALLOCATION_SAMPLE = 200
+
+_WORDS = ("news", "blog", "shop", "docs", "cloud", "mail", "travel", "music", "photo", "recipes", "sports", "wiki")
+_TLDS = ("com", "org", "net", "io", "de", "co.uk", "com.au", "fr", "xyz", "info")
+_BRANDS = ("paypal", "amazon", "google", "microsoft", "apple", "facebook", "netflix", "bank", "ebay", "instagram")
+_LURES = ("login", "secure", "verify", "account", "update", "signin", "confirm", "support", "billing")
+_SHADY_TLDS = ("tk", "ml", "ga", "xyz", "top", "info", "online", "site")
+
+
+def _benign(rng: random.Random) -> str:
+    host = f"{rng.choice(('www.', '', 'blog.', 'shop.'))}{rng.choice(_WORDS)}{rng.choice(_WORDS)}.{rng.choice(_TLDS)}"
+    path = "/".join(rng.choice(_WORDS) for _ in range(rng.randint(0, 3)))
+    return f"https://{host}/{path}"
+
+
+def _brand_squatting(rng: random.Random) -> str:
+    brand, lure = rng.choice(_BRANDS), rng.choice(_LURES)
+    host = rng.choice((
+        f"{brand}-{lure}.{rng.choice(_SHADY_TLDS)}",
+        f"{lure}.{brand}.com.{rng.choice(_WORDS)}-{rng.randint(1, 999)}.{rng.choice(_SHADY_TLDS)}",
+        f"www.{brand}{rng.randint(1, 99)}-{lure}.com",
+        f"{brand}.{lure}-{rng.choice(_LURES)}.{rng.choice(_TLDS)}",
+    ))
+    path = f"/{lure}/{brand}/{rng.choice(('index.php', 'session', 'webscr', ''))}"
+    return f"{rng.choice(('http', 'https'))}://{host}{path}"
+
+
+def _ip_host(rng: random.Random) -> str:
+    ip = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+    port = rng.choice(("", ":8080", ":443"))
+    return f"http://{ip}{port}/{rng.choice(_LURES)}/{rng.choice(_BRANDS)}.html"
+
+
+def _long_query(rng: random.Random) -> str:
+    params = "&".join(f"{rng.choice(_WORDS + _LURES)}{i}={rng.getrandbits(64):x}" for i in range(rng.randint(8, 30)))
+    return f"https://{rng.choice(_WORDS)}.{rng.choice(_TLDS)}/redirect?{params}&next=%2F{rng.choice(_LURES)}"
+
+
+_GENERATORS = {"benign": _benign, "brand_squatting": _brand_squatting, "ip_host": _ip_host, "long_query": _long_query}
+
+
+def make_corpus(n: int, seed: int = 0) -> list:
+    """n (category, url) pairs, the same for the same seed, categories in equal shares and shuffled"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        corpus.append((category, _GENERATORS[category](rng)))
+    rng.shuffle(corpus)
+    return corpus
+
+
+# --- extract_features as it was before it was rewritten, the yardstick for its speed-up ---
+_reference_splitter = None
+
+
+def _reference_split(url: str):
+    """tldextract on its bundled suffix snapshot (no network), or public_suffix when it is not installed"""
+    global _reference_splitter
+    if _reference_splitter is None:
+        try:
+            import tldextract
+            _reference_splitter = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+        except ImportError:
+            from src.public_suffix import extract
+            _reference_splitter = extract
+    return _reference_splitter(url)
+
+
+def reference_extract_features(url: str) -> dict:
+    """The original extractor: a scan per character count, patterns and keyword lists rebuilt per call"""
+    try:
+        parsed = urlparse(url)
+        extracted = _reference_split(url)
+        hostname = parsed.hostname or ""
+        path = parsed.path or ""
+        query = parsed.query or ""
+        scheme = parsed.scheme or ""
+        subdomain = extracted.subdomain or ""
+        domain = extracted.domain or ""
+        subdomain_level = len(subdomain.split('.')) if subdomain else 0
+        url_length = len(url)
+        sensitive_words = ['login', 'secure', 'account', 'bank', 'verify', 'update',
+                           'confirm', 'signin', 'ebay', 'paypal', 'amazon']
+        brand_names = ['paypal', 'amazon', 'google', 'microsoft', 'apple', 'facebook',
+                       'netflix', 'ebay', 'alibaba', 'instagram']
+        features = {
+            'NumDots': url.count('.'),
+            'SubdomainLevel': subdomain_level,
+            'PathLevel': len([p for p in path.split('/') if p]),
+            'UrlLength': url_length,
+            'NumDash': url.count('-'),
+            'NumDashInHostname': hostname.count('-'),
+            'AtSymbol': 1 if '@' in url else 0,
+            'TildeSymbol': 1 if '~' in url else 0,
+            'NumUnderscore': url.count('_'),
+            'NumPercent': url.count('%'),
+            'NumQueryComponents': len(parse_qs(query)),
+            'NumAmpersand': url.count('&'),
+            'NumHash': url.count('#'),
+            'NumNumericChars': sum(c.isdigit() for c in url),
+            'NoHttps': 1 if scheme != 'https' else 0,
+            'RandomString': 1 if re.search(r'[bcdfghjklmnpqrstvwxyz]{8,}', url.lower()) else 0,
+            'IpAddress': 1 if re.match(r"^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$", hostname) else 0,
+            'DomainInSubdomains': 1 if domain and domain in subdomain else 0,
+            'DomainInPaths': 1 if domain and domain in path else 0,
+            'HttpsInHostname': 1 if 'https' in hostname else 0,
+            'HostnameLength': len(hostname),
+            'PathLength': len(path),
+            'QueryLength': len(query),
+            'DoubleSlashInPath': 1 if '//' in path else 0,
+            'NumSensitiveWords': sum(1 for word in sensitive_words if word in url.lower()),
+            'EmbeddedBrandName': 1 if any(brand in url.lower() for brand in brand_names)
+            and domain.lower() not in brand_names else 0,
+            'SubdomainLevelRT': subdomain_level,
+            'UrlLengthRT': url_length,
+        }
+        # HTML-based and the other RT columns are 0
+        return {col: features.get(col, 0) for col in EXPECTED_FEATURES}
+    except Exception:
+        return {col: 0 for col in EXPECTED_FEATURES}
+
+
+def _summary(latencies_ns: list, wall_seconds: float, calls: int) -> dict:
+    latencies_us = np.asarray(latencies_ns, dtype=np.float64) / 1000
+    return {
+        "calls": calls,
+        "throughput_per_s": round(calls / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_us": round(float(latencies_us.mean()), 2),
+        "p50_us": round(float(np.percentile(latencies_us, 50)), 2),
+        "p99_us": round(float(np.percentile(latencies_us, 99)), 2),
+        "max_us": round(float(latencies_us.max()), 2)
+    }
+
+
+def _allocations(func, inputs: list) -> dict:
+    """Peak bytes allocated during one call (transient) and bytes still held afterwards (retained)"""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for args in inputs[:ALLOCATION_SAMPLE]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func(*args)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_bytes_per_call": round(float(np.mean(peaks)), 1),
+        "retained_bytes_per_call": round(float(np.mean(retained)), 1)
+    }
+
+
+def bench_function(func, inputs: list, repeat: int = 3, warmup: int = 50) -> dict:
+    """
+    Time func(*args) for every args tuple in inputs, after a few untimed warm-up calls.
+    The pass with the lowest p50 out of repeat is kept, as timeit does, to damp machine noise.
+    """
+    for args in inputs[:warmup]:
+        func(*args)
+    clock = time.perf_counter_ns
+    best = None
+    for _ in range(max(1, repeat)):
+        latencies = []
+        started = time.perf_counter()
+        for args in inputs:
+            call_started = clock()
+            func(*args)
+            latencies.append(clock() - call_started)
+        result = _summary(latencies, time.perf_counter() - started, len(inputs))
+        if best is None or result["p50_us"] < best["p50_us"]:
+            best = result
+    best.update(_allocations(func, inputs))
+    return best
+
+
+async def _bench_http(client, urls: list, concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(url):
+        async with slots:
+            started = time.perf_counter_ns()
+            response = await client.post("/predict", json={"url": url})
+            latencies.append(time.perf_counter_ns() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    result = _summary(latencies, time.perf_counter() - started, len(urls))
+    result["concurrency"] = concurrency
+    result["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+async def _http_allocations(client, urls: list) -> dict:
+    """Same measurement as _allocations, one request at a time (client, ASGI app and handler included)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for url in urls[:ALLOCATION_SAMPLE]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await client.post("/predict", json={"url": url})
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_bytes_per_call": round(float(np.mean(peaks)), 1)}
+
+
+async def bench_http(urls: list, concurrency_levels=CONCURRENCY_LEVELS) -> dict:
+    """/predict through httpx's ASGI transport (no sockets), verdict cache off so every call is scored"""
+    import httpx
+    from src import api
+
+    if not api.ready:
+        api.initialize()  # the ASGI transport doesn't run the lifespan
+    cache_size = api.verdict_cache.max_entries
+    api.verdict_cache.clear()
+    api.verdict_cache.max_entries = 0
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench") as client:
+            await _bench_http(client, urls[:50], 1)  # warm-up
+            for concurrency in concurrency_levels:
+                results[f"concurrency_{concurrency}"] = await _bench_http(client, urls, concurrency)
+                if concurrency == 1:
+                    results["concurrency_1"].update(await _http_allocations(client, urls))
+    finally:
+        api.verdict_cache.max_entries = cache_size
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run_benchmarks(n_urls: int = 2000, seed: int = 0, concurrency_levels=CONCURRENCY_LEVELS,
+                   http_requests: int = 1000, targets=None, repeat: int = 3) -> dict:
+    corpus = make_corpus(n_urls, seed)
+    urls = [url for _, url in corpus]
+    wanted = set(targets) if targets else None
+    results, skipped = {}, {}
+
+    def enabled(name):
+        return wanted is None or name in wanted
+
+    if enabled("extract_features"):
+        results["extract_features"] = bench_function(extract_features, [(url,) for url in urls], repeat)
+        # Per category, to see which kind of URL got slower
+        results["extract_features"]["by_category_p50_us"] = {
+            category: bench_function(extract_features, [(url,) for c, url in corpus if c == category],
+                                     repeat)["p50_us"]
+            for category in CATEGORIES
+        }
+    if enabled("extract_features_reference"):
+        results["extract_features_reference"] = bench_function(reference_extract_features, [(url,) for url in urls],
+                                                               repeat)
+        if "extract_features" in results:
+            # Same values on the whole corpus, and how much faster the rewrite is at the median
+            current = results["extract_features"]
+            current["reference_mismatches"] = sum(
+                1 for url in urls if reference_extract_features(url) != get_feature_vector(url, EXPECTED_FEATURES))
+            current["speedup_vs_reference"] = round(
+                results["extract_features_reference"]["p50_us"] / current["p50_us"], 2)
+    if enabled("get_feature_vector"):
+        inputs = [(url, EXPECTED_FEATURES) for url in urls]
+        results["get_feature_vector"] = bench_function(get_feature_vector, inputs, repeat)
+
+    if enabled("predict_phishing"):
+        try:
+            from src.model_predict import predict_phishing
+        except ImportError as e:
+            skipped["predict_phishing"] = f"model_predict unavailable: {e}"
+        except SystemExit:  # model_predict prints the load error and exits when its model is missing
+            skipped["predict_phishing"] = (f"model_predict found no model in "
+                                           f"{os.environ.get('MODEL_DIR') or 'src/ (MODEL_DIR unset)'}")
+        else:
+            feature_dicts = [(extract_features(url),) for url in urls]
+            with warnings.catch_warnings():
+                # A pickled sklearn model fitted on a DataFrame warns on every NumPy call
+                warnings.filterwarnings("ignore", message="X does not have valid feature names")
+                results["predict_phishing"] = bench_function(predict_phishing, feature_dicts, repeat)
+
+    model_version = None
+    if enabled("predict_phishing_from_url") or enabled("http_predict"):
+        from src import api
+        if not api.ready:
+            api.initialize()
+        model_version = api.active_bundle.version
+        if enabled("predict_phishing_from_url"):
+            normalized = [(api.normalize_url(url), False) for url in urls]
+            results["predict_phishing_from_url"] = bench_function(api.predict_phishing_from_url, normalized, repeat)
+        if enabled("http_predict"):
+            http_urls = [urls[i % len(urls)] for i in range(http_requests)]
+            results["http_predict"] = asyncio.run(bench_http(http_urls, concurrency_levels))
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "git_commit": _git_commit(),
+            "model_version": model_version
+        },
+        "corpus": {"urls": n_urls, "seed": seed, "categories": list(CATEGORIES)},
+        "repeat": repeat,
+        "results": results,
+        "skipped": skipped
+    }
+
+
+def _latency_entries(results: dict):
+    """(name, summary) for every timed entry, HTTP concurrency levels included"""
+    for name, result in results.items():
+        if name == "http_predict":
+            for level, summary in result.items():
+                yield f"http_predict[{level}]", summary
+        else:
+            yield name, result
+
+
+def compare(baseline: dict, current: dict, max_regression: float = 0.10, metric: str = "p50_us") -> list:
+    """Entries whose metric grew by more than max_regression (a fraction) over the baseline"""
+    before = dict(_latency_entries(baseline.get("results", {})))
+    regressions = []
+    for name, summary in _latency_entries(current.get("results", {})):
+        if name in before and before[name].get(metric):
+            change = summary[metric] / before[name][metric] - 1
+            print(f"   {name:<36} {before[name][metric]:>10.2f} -> {summary[metric]:>10.2f}us {change:+.1%}")
+            if change > max_regression:
+                regressions.append({"target": name, "baseline": before[name][metric],
+                                    "current": summary[metric], "change": round(change, 4)})
+    return regressions
+
+
+def print_results(report: dict):
+    print("=" * 50)
+    print(f"Benchmark: {report['corpus']['urls']} URLs, seed {report['corpus']['seed']}, "
+          f"commit {report['environment']['git_commit'] or '?'}")
+    print("=" * 50)
+    for name, summary in _latency_entries(report["results"]):
+        allocations = summary.get("alloc_peak_bytes_per_call")
+        print(f"⏱️  {name:<36} p50 {summary['p50_us']:>9.1f}us  p99 {summary['p99_us']:>9.1f}us  "
+              f"{summary['throughput_per_s']:>9.1f}/s" + (f"  {allocations:>8.0f} B/call" if allocations else ""))
+    extraction = report["results"].get("extract_features", {})
+    if "speedup_vs_reference" in extraction:
+        mark = "✅" if not extraction["reference_mismatches"] else "❌"
+        print(f"{mark} extract_features is {extraction['speedup_vs_reference']:.2f}x the pre-rewrite extractor at p50, "
+              f"{extraction['reference_mismatches']} URLs with different values")
+    for name, reason in report["skipped"].items():
+        print(f"❌ {name} skipped: {reason}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark feature extraction, inference and /predict")
+    parser.add_argument("--urls", type=int, default=2000, help="Corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(CONCURRENCY_LEVELS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per function target; the best is kept")
+    parser.add_argument("--http-requests", type=int, default=1000, help="/predict calls per concurrency level")
+    parser.add_argument("--targets", nargs="+", help="Subset of: extract_features extract_features_reference "
+                                                     "get_feature_vector predict_phishing predict_phishing_from_url http_predict")
+    parser.add_argument("--output", default="", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default="", help="Earlier results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed p50 slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.urls, args.seed, args.concurrency, args.http_requests, args.targets,
+                            args.repeat)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    mismatches = report["results"].get("extract_features", {}).get("reference_mismatches")
+    status = 1 if report["skipped"] or mismatches else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} ({baseline.get('environment', {}).get('git_commit') or '?'}):")
+        regressions = compare(baseline, report, args.max_regression)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.max_regression:.0%}: "
+                  f"{', '.join(r['target'] for r in regressions)}")
+            return 1
+        print(f"✅ No regression above {args.max_regression:.0%}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
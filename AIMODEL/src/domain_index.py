@@ -0,0 +1,283 @@
+"""
+Allow/deny index of domains checked before the model.
+
+Domains from the allowlist and denylist files (one per line, '#' comments,
+bare domains or URLs) are stored as sorted arrays of 64-bit hashes, with one
+Bloom filter over both lists in front, so most lookups for unlisted hosts end
+after a few byte reads. The denylist wins when a host matches both.
+
+A denylisted domain also covers its subdomains. An allowlisted domain covers
+only that exact host, unless it is written '*.example.com' (the domain and all
+its subdomains): allowing a shared host such as github.io must not mark every
+user's subdomain safe. Parent domains are only matched down to the registrable
+domain (public_suffix.py), so an entry such as co.uk never covers a registry.
+
+Hashes are Python's built-in str hash (SipHash), which is seeded per process,
+so the arrays are rebuilt at startup. What is cached (in a .npz next to the
+denylist or allowlist, until a list changes) is the parsed, normalized domain
+text, which skips the slow line-by-line parsing.
+"""
+import json
+import math
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+try:
+    from src.public_suffix import split_hostname
+except ImportError:  # run as a script from inside src/
+    from public_suffix import split_hostname
+
+ALLOW = "allowlist"
+DENY = "denylist"
+# Prefix of list entries that also cover every subdomain
+WILDCARD = "*."
+# Version of the parsed lists cached in .index.npz; a cache of another version is rebuilt
+CACHE_FORMAT = 2
+# Target false-positive rate of the Bloom filter; a false positive only costs a binary search
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+_MASK64 = (1 << 64) - 1
+
+
+def domain_hash(domain: str) -> int:
+    """Unsigned 64-bit hash, valid within this process only"""
+    return hash(domain) & _MASK64
+
+
+def normalize_domain(entry: str) -> str:
+    """
+    Lowercased host of a list entry: drops scheme, path, port and trailing dots.
+    A leading '*.' or '.' is kept as '*.', marking an entry that covers subdomains.
+    """
+    entry = entry.strip().lower()
+    if "://" in entry:
+        entry = entry.split("://", 1)[1]
+    entry = entry.split("/", 1)[0].rpartition("@")[2].split(":", 1)[0]
+    wildcard = False
+    while entry.startswith(("*.", ".")):
+        wildcard = True
+        entry = entry[1:] if entry.startswith(".") else entry[2:]
+    entry = entry.rstrip(".")
+    return WILDCARD + entry if wildcard and entry else entry
+
+
+def read_domain_list(path: str) -> list:
+    domains = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            if line.strip():
+                domain = normalize_domain(line)
+                if domain:
+                    domains.append(domain)
+    return domains
+
+
+def _candidates(host: str) -> list:
+    """The host and each parent domain with at least two labels: a.b.example.com, b.example.com, example.com"""
+    candidates = [host]
+    dot = host.find(".")
+    while dot != -1 and host.find(".", dot + 1) != -1:
+        candidates.append(host[dot + 1:])
+        dot = host.find(".", dot + 1)
+    return candidates
+
+
+def _matchable(host: str, candidates: list) -> list:
+    """
+    The candidates down to the registrable domain: for a.b.example.co.uk, never co.uk. Without a known
+    suffix every candidate of two labels or more; for an IP address only the address itself.
+    """
+    _, domain, suffix = split_hostname(host)
+    if not suffix:
+        return candidates if domain != host else candidates[:1]
+    registrable_labels = suffix.count(".") + (2 if domain else 1)
+    return candidates[:max(1, host.count(".") + 2 - registrable_labels)]
+
+
+class DomainIndex:
+    """
+    Sorted hash arrays (exact allowed hosts, '*.' allowed domains, denied domains) plus a shared
+    Bloom filter
+    """
+
+    def __init__(self, allow_hashes: np.ndarray, deny_hashes: np.ndarray, bloom: np.ndarray, bloom_hashes: int,
+                 allow_wildcard_hashes: np.ndarray = ()):
+        self.allow_hashes = np.asarray(allow_hashes, dtype=np.uint64)
+        self.allow_wildcard_hashes = np.asarray(allow_wildcard_hashes, dtype=np.uint64)
+        self.deny_hashes = np.asarray(deny_hashes, dtype=np.uint64)
+        # Kept as bytes: indexing bytes is far cheaper than NumPy scalar access
+        self.bloom = np.asarray(bloom, dtype=np.uint8).tobytes()
+        self.bloom_hashes = int(bloom_hashes)
+        self._bloom_bits = len(self.bloom) * 8
+        self.checks = 0
+        self.hits = {ALLOW: 0, DENY: 0}
+
+    @staticmethod
+    def _hashes(domains: list) -> np.ndarray:
+        # Same values as domain_hash: the signed hash reinterpreted as unsigned
+        hashes = np.sort(np.fromiter(map(hash, domains), dtype=np.int64, count=len(domains)).view(np.uint64))
+        # sort + mask rather than np.unique, which is several times slower on millions of entries
+        return hashes[np.concatenate(([True], hashes[1:] != hashes[:-1]))] if len(hashes) else hashes
+
+    @classmethod
+    def build(cls, allow_domains: list, deny_domains: list) -> "DomainIndex":
+        """Index of normalized entries; '*.' allow entries cover subdomains, deny entries always do"""
+        allow = cls._hashes([domain for domain in allow_domains if not domain.startswith(WILDCARD)])
+        allow_wildcard = cls._hashes([domain[len(WILDCARD):] for domain in allow_domains
+                                      if domain.startswith(WILDCARD)])
+        deny = cls._hashes([domain[len(WILDCARD):] if domain.startswith(WILDCARD) else domain
+                            for domain in deny_domains])
+        n = max(1, len(allow) + len(allow_wildcard) + len(deny))
+        m = max(64, int(math.ceil(-n * math.log(BLOOM_FALSE_POSITIVE_RATE) / math.log(2) ** 2)))
+        k = max(1, int(round(-math.log2(BLOOM_FALSE_POSITIVE_RATE))))  # optimal count for that m
+        m = 1 << (m - 1).bit_length()  # power of two: positions are masked instead of divided
+
+        bits = np.zeros(m, dtype=bool)
+        hashes = np.concatenate([allow, allow_wildcard, deny])
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        # positions stay below 2**33 + k * 2**32, so the uint64 arithmetic never wraps
+        for i in range(k):
+            bits[((h1 + np.uint64(i) * h2) & np.uint64(m - 1)).astype(np.intp)] = True
+        return cls(allow, deny, np.packbits(bits, bitorder="little"), k, allow_wildcard)
+
+    def _maybe_listed(self, h: int) -> bool:
+        position, step = h & 0xFFFFFFFF, (h >> 32) | 1
+        bloom, mask = self.bloom, self._bloom_bits - 1
+        for _ in range(self.bloom_hashes):
+            bit = position & mask
+            if not bloom[bit >> 3] >> (bit & 7) & 1:
+                return False
+            position += step
+        return True
+
+    @staticmethod
+    def _contains(hashes: np.ndarray, h: int) -> bool:
+        i = int(np.searchsorted(hashes, np.uint64(h)))
+        return i < len(hashes) and int(hashes[i]) == h
+
+    def lookup(self, host: str) -> Optional[str]:
+        """
+        DENY when the host or a parent domain is denylisted, else ALLOW when the host is allowlisted
+        or it or a parent domain is allowlisted as '*.domain', otherwise None
+        """
+        self.checks += 1
+        host = host.lower().rstrip(".")
+        if not host:
+            return None
+        candidates = _candidates(host)
+        hashes = [domain_hash(candidate) for candidate in candidates]
+        if not any(self._maybe_listed(h) for h in hashes):
+            return None  # most unlisted hosts end here, before the public suffix lookup
+        hashes = hashes[:len(_matchable(host, candidates))]
+        listed = [h for h in hashes if self._maybe_listed(h)]
+        if any(self._contains(self.deny_hashes, h) for h in listed):
+            self.hits[DENY] += 1
+            return DENY
+        if self._contains(self.allow_hashes, hashes[0]) or \
+                any(self._contains(self.allow_wildcard_hashes, h) for h in listed):
+            self.hits[ALLOW] += 1
+            return ALLOW
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.allow_hashes.nbytes + self.allow_wildcard_hashes.nbytes + self.deny_hashes.nbytes + len(self.bloom)
+
+    def stats(self) -> dict:
+        return {
+            "allow_entries": len(self.allow_hashes),
+            "allow_wildcard_entries": len(self.allow_wildcard_hashes),
+            "deny_entries": len(self.deny_hashes),
+            "bloom_bits": self._bloom_bits,
+            "bloom_hashes": self.bloom_hashes,
+            "memory_bytes": self.nbytes,
+            "checks": self.checks,
+            "allow_hits": self.hits[ALLOW],
+            "deny_hits": self.hits[DENY]
+        }
+
+
+def _signature(paths: list) -> dict:
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def _to_blob(domains: list) -> np.ndarray:
+    return np.frombuffer("\n".join(domains).encode("utf-8"), dtype=np.uint8)
+
+
+def _from_blob(blob: np.ndarray) -> list:
+    text = blob.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def load_domain_index(allowlist_path: str = "", denylist_path: str = "", use_cache: bool = True) -> DomainIndex:
+    """
+    Index for the given list files (either may be empty). The parsed domains are cached in
+    <denylist or allowlist>.index.npz and reused while both lists are unchanged.
+    """
+    paths = [path for path in (allowlist_path, denylist_path) if path]
+    if not paths:
+        raise ValueError("No allowlist or denylist given")
+    cache_path = os.path.splitext(paths[-1])[0] + ".index.npz"
+    signature = dict(_signature(paths), format=CACHE_FORMAT)
+
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            if json.loads(str(data["sources"])) == signature:
+                return DomainIndex.build(_from_blob(data["allow"]), _from_blob(data["deny"]))
+
+    allow = read_domain_list(allowlist_path) if allowlist_path else []
+    deny = read_domain_list(denylist_path) if denylist_path else []
+    if use_cache:
+        try:
+            np.savez(cache_path, allow=_to_blob(allow), deny=_to_blob(deny), sources=json.dumps(signature))
+        except OSError as e:
+            print(f"⚠️  Could not cache domain list at {cache_path}: {e}")
+    return DomainIndex.build(allow, deny)
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    random.seed(0)
+    n = 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        allow_path, deny_path = os.path.join(tmp, "allow.txt"), os.path.join(tmp, "deny.txt")
+        with open(allow_path, "w") as f:
+            f.write("# well-known domains\n*.google.com\nwww.paypal.com\ngithub.io\n*.co.uk\n")
+            f.writelines(f"site{i}.example{i % 97}.com\n" for i in range(n))
+        with open(deny_path, "w") as f:
+            f.write("http://evil-login.tk/verify\n*.phish.example.com\nco.jp\n")
+            f.writelines(f"bad{i}.xyz\n" for i in range(n // 10))
+
+        for attempt in ("build", "cached"):
+            started = time.perf_counter()
+            index = load_domain_index(allow_path, deny_path)
+            print(f"✅ {attempt}: {time.perf_counter() - started:.2f}s, {index.stats()}")
+
+        assert index.lookup("mail.google.com") == ALLOW and index.lookup("google.com") == ALLOW
+        assert index.lookup("WWW.PayPal.com.") == ALLOW
+        assert index.lookup("paypal.com") is None and index.lookup("login.www.paypal.com") is None
+        assert index.lookup("github.io") == ALLOW and index.lookup("attacker.github.io") is None
+        assert index.lookup("evil-login.tk") == DENY and index.lookup("secure.evil-login.tk") == DENY
+        assert index.lookup("a.phish.example.com") == DENY
+        assert index.lookup("site5.example5.com") == ALLOW and index.lookup("x.site5.example5.com") is None
+        # Public suffixes never match as a parent, in either list
+        assert index.lookup("bbc.co.uk") is None and index.lookup("example.co.jp") is None
+        assert index.lookup("192.168.1.1") is None
+
+        hosts = [f"host{random.random()}.unlisted.org" for _ in range(100000)]
+        started = time.perf_counter()
+        misses = sum(index.lookup(host) is None for host in hosts)
+        elapsed = time.perf_counter() - started
+        print(f"   unlisted lookups: {elapsed / len(hosts) * 1e6:.2f}us each, {misses} of {len(hosts)} missed")
+        print(f"   memory: {index.nbytes / 2 ** 20:.1f} MB for {len(index.allow_hashes) + len(index.deny_hashes)} domains")
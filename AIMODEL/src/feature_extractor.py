@@ -1,11 +1,58 @@
 import re
-import tldextract
-from urllib.parse import urlparse, parse_qs
+import numpy as np
+from functools import lru_cache
+from itertools import repeat
+from urllib.parse import urlparse, unquote
 import json
+import logging
+import random
 import os
 
-# Load expected feature columns
-FEATURE_COLUMNS_PATH = "feature_columns.json"
+try:
+    from src import public_suffix
+    from src.metrics import REGISTRY, Counter
+except ImportError:  # run as a script from inside src/
+    import public_suffix
+    from metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+# URLs that failed to parse and were scored with all-zero features
+EXTRACTION_FALLBACKS = REGISTRY.register(Counter(
+    "phishing_feature_extraction_fallbacks_total",
+    "URLs whose feature extraction failed and fell back to all-zero features",
+    labelnames=("extractor",)
+))
+
+# Load expected feature columns (next to this module, independent of the working directory)
+FEATURE_COLUMNS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_columns.json")
+
+# Every column extract_features produces (the 48 features of the training dataset)
+DEFAULT_FEATURE_COLUMNS = [
+    'NumDots', 'SubdomainLevel', 'PathLevel', 'UrlLength', 'NumDash', 'NumDashInHostname',
+    'AtSymbol', 'TildeSymbol', 'NumUnderscore', 'NumPercent', 'NumQueryComponents', 'NumAmpersand',
+    'NumHash', 'NumNumericChars', 'NoHttps', 'RandomString', 'IpAddress', 'DomainInSubdomains',
+    'DomainInPaths', 'HttpsInHostname', 'HostnameLength', 'PathLength', 'QueryLength',
+    'DoubleSlashInPath', 'NumSensitiveWords', 'EmbeddedBrandName', 'PctExtHyperlinks',
+    'PctExtResourceUrls', 'ExtFavicon', 'InsecureForms', 'RelativeFormAction', 'ExtFormAction',
+    'AbnormalFormAction', 'PctNullSelfRedirectHyperlinks', 'FrequentDomainNameMismatch',
+    'FakeLinkInStatusBar', 'RightClickDisabled', 'PopUpWindow', 'SubmitInfoToEmail',
+    'IframeOrFrame', 'MissingTitle', 'ImagesOnlyInForm', 'SubdomainLevelRT', 'UrlLengthRT',
+    'PctExtResourceUrlsRT', 'AbnormalExtFormActionR', 'ExtMetaScriptLinkRT',
+    'PctExtNullSelfRedirectHyperlinksRT'
+]
+
+# Columns computed from the page HTML: always 0 here, filled in by page_analyzer.py when it runs
+PAGE_FEATURE_COLUMNS = (
+    'PctExtHyperlinks', 'PctExtResourceUrls', 'ExtFavicon', 'InsecureForms', 'RelativeFormAction',
+    'ExtFormAction', 'AbnormalFormAction', 'PctNullSelfRedirectHyperlinks', 'FrequentDomainNameMismatch',
+    'FakeLinkInStatusBar', 'RightClickDisabled', 'PopUpWindow', 'SubmitInfoToEmail', 'IframeOrFrame',
+    'MissingTitle', 'ImagesOnlyInForm', 'PctExtResourceUrlsRT', 'AbnormalExtFormActionR',
+    'ExtMetaScriptLinkRT', 'PctExtNullSelfRedirectHyperlinksRT'
+)
+# Columns the URL string alone determines
+URL_FEATURE_COLUMNS = [col for col in DEFAULT_FEATURE_COLUMNS if col not in PAGE_FEATURE_COLUMNS]
+
 
 def load_feature_columns():
     """Load the feature columns used during training"""
@@ -13,23 +60,124 @@ def load_feature_columns():
         with open(FEATURE_COLUMNS_PATH, 'r') as f:
             return json.load(f)
     else:
-        # Fallback to the 47 features from your predict.py
-        return [
-            'NumDots', 'SubdomainLevel', 'PathLevel', 'UrlLength', 'NumDash', 'NumDashInHostname',
-            'AtSymbol', 'TildeSymbol', 'NumUnderscore', 'NumPercent', 'NumQueryComponents', 'NumAmpersand',
-            'NumHash', 'NumNumericChars', 'NoHttps', 'RandomString', 'IpAddress', 'DomainInSubdomains',
-            'DomainInPaths', 'HttpsInHostname', 'HostnameLength', 'PathLength', 'QueryLength',
-            'DoubleSlashInPath', 'NumSensitiveWords', 'EmbeddedBrandName', 'PctExtHyperlinks',
-            'PctExtResourceUrls', 'ExtFavicon', 'InsecureForms', 'RelativeFormAction', 'ExtFormAction',
-            'AbnormalFormAction', 'PctNullSelfRedirectHyperlinks', 'FrequentDomainNameMismatch',
-            'FakeLinkInStatusBar', 'RightClickDisabled', 'PopUpWindow', 'SubmitInfoToEmail',
-            'IframeOrFrame', 'MissingTitle', 'ImagesOnlyInForm', 'SubdomainLevelRT', 'UrlLengthRT',
-            'PctExtResourceUrlsRT', 'AbnormalExtFormActionR', 'ExtMetaScriptLinkRT',
-            'PctExtNullSelfRedirectHyperlinksRT'
-        ]
+        return list(DEFAULT_FEATURE_COLUMNS)
 
 EXPECTED_FEATURES = load_feature_columns()
 
+# Schemes kept as given by normalize_url; anything else is treated as a scheme-less URL
+URL_SCHEMES = ("http", "https", "ftp")
+
+
+def normalize_url(url: str) -> str:
+    """
+    The form every URL is featurized in, by the API, bulk scoring and incremental training alike.
+    Rejects empty URLs, trims surrounding whitespace and defaults to https:// when no scheme is given.
+    The scheme and host are lowercased and a trailing dot is dropped from the host, so every spelling
+    of a URL shares one cache key; userinfo, port, path and query are kept as they are.
+    """
+    url = url.strip()
+    if not url:
+        raise ValueError("URL cannot be empty")
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme.lower() not in URL_SCHEMES:
+        scheme, rest = "https", url
+    end = len(rest)
+    for delimiter in "/?#":
+        position = rest.find(delimiter, 0, end)
+        if position != -1:
+            end = position
+    userinfo, at, hostport = rest[:end].rpartition("@")
+    if hostport.startswith("["):  # IPv6 literal: the port follows the closing bracket
+        host, bracket, port = hostport.partition("]")
+        host += bracket
+    else:
+        host, colon, port = hostport.partition(":")
+        port = colon + port
+    return f"{scheme.lower()}://{userinfo}{at}{host.lower().rstrip('.')}{port}{rest[end:]}"
+
+
+# Keyword lists, precompiled patterns and lookup tables shared by every call
+SENSITIVE_WORDS = ('login', 'secure', 'account', 'bank', 'verify', 'update',
+                   'confirm', 'signin', 'ebay', 'paypal', 'amazon')
+BRAND_NAMES = ('paypal', 'amazon', 'google', 'microsoft', 'apple', 'facebook',
+               'netflix', 'ebay', 'alibaba', 'instagram')
+_BRAND_SET = frozenset(BRAND_NAMES)
+_SENSITIVE_SET = frozenset(SENSITIVE_WORDS)
+# Union of both lists, so each keyword is searched for once and the hits answer both features.
+# That is one substring search per keyword (str.__contains__, in C): a single regex pass with an
+# overlapping alternation gives the same hits but measured about 4x slower on the benchmark corpus.
+_KEYWORDS = tuple(sorted(_SENSITIVE_SET | _BRAND_SET))
+
+_IP_ADDRESS_RE = re.compile(r"^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$")
+_RANDOM_STRING_RE = re.compile(r'[bcdfghjklmnpqrstvwxyz]{8,}')
+_ASCII_DIGITS = b'0123456789'
+
+
+# Distinct hosts whose features are kept; traffic has far fewer hosts than URLs
+HOST_FEATURE_CACHE_SIZE = int(os.environ.get("HOST_FEATURE_CACHE_SIZE", "65536"))
+
+
+@lru_cache(maxsize=HOST_FEATURE_CACHE_SIZE)
+def _host_features(hostname: str, host: str) -> tuple:
+    """
+    Features that depend only on the host, memoized per host.
+    hostname is urlparse's (lowercased) hostname, host the case-preserving one the suffix split uses.
+    Returns (subdomain_level, num_dash_hostname, hostname_length, ip_address, https_in_hostname,
+    domain_in_subdomains, domain, domain_is_brand).
+    """
+    extracted = public_suffix.split_hostname(host)
+    subdomain = extracted.subdomain or ""
+    domain = extracted.domain or ""
+    return (
+        subdomain.count('.') + 1 if subdomain else 0,
+        hostname.count('-'),
+        len(hostname),
+        1 if _IP_ADDRESS_RE.match(hostname) else 0,
+        1 if 'https' in hostname else 0,
+        1 if domain and domain in subdomain else 0,
+        domain,
+        domain.lower() in _BRAND_SET
+    )
+
+
+def feature_cache_stats() -> dict:
+    """Hit rates of the host-feature cache and of the suffix split under it"""
+    stats = {}
+    for name, cached in (("host_features", _host_features), ("hostname_split", public_suffix.split_hostname)):
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "size": info.currsize,
+            "max_entries": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0
+        }
+    return stats
+
+
+def _count_digits(url: str) -> int:
+    """Same result as sum(c.isdigit() for c in url), without a Python-level loop for ASCII URLs"""
+    if url.isascii():
+        encoded = url.encode('ascii')
+        return len(encoded) - len(encoded.translate(None, _ASCII_DIGITS))
+    return sum(c.isdigit() for c in url)
+
+
+def _count_query_components(query: str) -> int:
+    """Same result as len(parse_qs(query)), without building the value lists"""
+    if not query:
+        return 0
+    names = set()
+    for pair in query.split('&'):
+        name, sep, value = pair.partition('=')
+        if not sep or not value:
+            continue
+        if '%' in name or '+' in name:
+            name = unquote(name.replace('+', ' '), encoding='utf-8', errors='replace')
+        names.add(name)
+    return len(names)
+
 
 def extract_features(url: str) -> dict:
     """
@@ -38,68 +186,53 @@ def extract_features(url: str) -> dict:
     """
     try:
         parsed = urlparse(url)
-        extracted = tldextract.extract(url)
-        
         hostname = parsed.hostname or ""
+
+        # Host stage (cached per host)
+        (subdomain_level, num_dash_hostname, hostname_length, ip_address, https_in_hostname,
+         domain_in_subdomains, domain, domain_is_brand) = _host_features(hostname, public_suffix.host_from_url(url))
+
+        # Per-URL stage
         path = parsed.path or ""
         query = parsed.query or ""
         scheme = parsed.scheme or ""
+        url_lower = url.lower()
         
-        # Parse query parameters
-        query_params = parse_qs(query)
-        
-        # Basic URL features
+        # Basic URL features (str.count runs in C, cheaper than a Python-level pass)
         num_dots = url.count('.')
         num_dash = url.count('-')
-        num_dash_hostname = hostname.count('-')
         at_symbol = 1 if '@' in url else 0
         tilde_symbol = 1 if '~' in url else 0
         num_underscore = url.count('_')
         num_percent = url.count('%')
-        num_query_components = len(query_params)
+        num_query_components = _count_query_components(query)
         num_ampersand = url.count('&')
         num_hash = url.count('#')
-        num_numeric_chars = sum(c.isdigit() for c in url)
+        num_numeric_chars = _count_digits(url)
         
         # HTTPS check
         no_https = 1 if scheme != 'https' else 0
         
-        # Subdomain analysis
-        subdomain = extracted.subdomain or ""
-        subdomain_level = len(subdomain.split('.')) if subdomain else 0
-        
         # Path analysis
-        path_parts = [p for p in path.split('/') if p]
-        path_level = len(path_parts)
+        path_parts = path.split('/')
+        path_level = len(path_parts) - path_parts.count('')
         double_slash_in_path = 1 if '//' in path else 0
         
         # Length features
         url_length = len(url)
-        hostname_length = len(hostname)
         path_length = len(path)
         query_length = len(query)
         
-        # IP address check
-        ip_address = 1 if re.match(r"^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$", hostname) else 0
-        
         # Domain features
-        domain = extracted.domain or ""
-        domain_in_subdomains = 1 if domain and domain in subdomain else 0
         domain_in_paths = 1 if domain and domain in path else 0
-        https_in_hostname = 1 if 'https' in hostname else 0
         
         # Random string detection (heuristic: many consonants in a row)
-        random_string = 1 if re.search(r'[bcdfghjklmnpqrstvwxyz]{8,}', url.lower()) else 0
+        random_string = 1 if _RANDOM_STRING_RE.search(url_lower) else 0
         
-        # Sensitive words
-        sensitive_words = ['login', 'secure', 'account', 'bank', 'verify', 'update', 
-                          'confirm', 'signin', 'ebay', 'paypal', 'amazon']
-        num_sensitive_words = sum(1 for word in sensitive_words if word in url.lower())
-        
-        # Embedded brand name (heuristic)
-        brand_names = ['paypal', 'amazon', 'google', 'microsoft', 'apple', 'facebook', 
-                      'netflix', 'ebay', 'alibaba', 'instagram']
-        embedded_brand_name = 1 if any(brand in url.lower() for brand in brand_names) and domain.lower() not in brand_names else 0
+        # Sensitive words and embedded brand names (heuristic), from one search per keyword of the union
+        found = [word for word in _KEYWORDS if word in url_lower]
+        num_sensitive_words = sum(1 for word in found if word in _SENSITIVE_SET)
+        embedded_brand_name = 1 if any(word in _BRAND_SET for word in found) and not domain_is_brand else 0
         
         # Build feature dictionary with all possible features
         features = {
@@ -158,7 +291,8 @@ def extract_features(url: str) -> dict:
         return features
         
     except Exception as e:
-        print(f"Error extracting features from {url}: {e}")
+        EXTRACTION_FALLBACKS.inc("scalar")
+        logger.warning("Error extracting features from %s: %s", url, e)
         # Return default features (all zeros)
         return {col: 0 for col in EXPECTED_FEATURES}
 
@@ -178,6 +312,189 @@ def get_feature_vector(url: str, feature_columns: list) -> dict:
     return {col: features.get(col, 0) for col in feature_columns}
 
 
+def _column(func, *iterables) -> np.ndarray:
+    """Apply func element-wise across whole string columns into a float32 array"""
+    return np.fromiter(map(func, *iterables), dtype=np.float32)
+
+
+def _contains(values: list, needle: str) -> np.ndarray:
+    """Boolean column: needle in value, for every value"""
+    return np.fromiter(map(str.__contains__, values, repeat(needle)), dtype=bool, count=len(values))
+
+
+def extract_features_batch(urls: list, feature_columns: list = None) -> np.ndarray:
+    """
+    Extract features for many URLs at once.
+    Returns a C-contiguous float32 array of shape (len(urls), len(feature_columns)),
+    with the same values as extract_features row by row. Columns default to EXPECTED_FEATURES.
+    """
+    columns = list(feature_columns) if feature_columns is not None else EXPECTED_FEATURES
+    n = len(urls)
+    X = np.zeros((n, len(columns)), dtype=np.float32)
+    if n == 0:
+        return X
+
+    # Split every URL into its components once; everything below works column by column
+    hosts, paths, queries, schemes = [], [], [], []
+    failed = []
+    empty_host = _host_features("", "")
+    for i, url in enumerate(urls):
+        try:
+            if not isinstance(url, str):
+                raise TypeError(f"expected a str URL, got {type(url).__name__}")
+            parsed = urlparse(url)
+            hosts.append(_host_features(parsed.hostname or "", public_suffix.host_from_url(url)))
+            paths.append(parsed.path or "")
+            queries.append(parsed.query or "")
+            schemes.append(parsed.scheme or "")
+        except Exception as e:
+            EXTRACTION_FALLBACKS.inc("batch")
+            logger.warning("Error extracting features from %s: %s", url, e)
+            failed.append(i)
+            hosts.append(empty_host)
+            for component in (paths, queries, schemes):
+                component.append("")
+
+    def host_column(index):
+        return np.fromiter((host[index] for host in hosts), dtype=np.float32, count=n)
+
+    domains = [host[6] for host in hosts]
+    if failed:
+        # The string columns below need str everywhere; failed rows are zeroed at the end anyway
+        urls = [url if isinstance(url, str) else "" for url in urls]
+
+    urls_lower = [url.lower() for url in urls]
+    url_length = _column(len, urls)
+    subdomain_level = host_column(0)
+
+    def path_level():
+        # Non-empty segments: collapse runs of '/', then drop the leading and trailing empty segment
+        collapsed = paths
+        while any(map(str.__contains__, collapsed, repeat('//'))):
+            collapsed = list(map(str.replace, collapsed, repeat('//'), repeat('/')))
+        level = (_column(str.count, collapsed, repeat('/')) + 1
+                 - _column(str.startswith, collapsed, repeat('/'))
+                 - _column(str.endswith, collapsed, repeat('/')))
+        level[_column(len, paths) == 0] = 0
+        return level
+
+    def domain_in_paths():
+        return (_column(len, domains) > 0) & (_column(str.__contains__, paths, domains) > 0)
+
+    def num_sensitive_words():
+        return np.sum([_contains(urls_lower, word) for word in SENSITIVE_WORDS], axis=0)
+
+    def embedded_brand_name():
+        any_brand = np.any([_contains(urls_lower, brand) for brand in BRAND_NAMES], axis=0)
+        return any_brand & ~host_column(7).astype(bool)
+
+    # Column builders, only evaluated for the requested columns
+    values = {
+        'NumDots': lambda: _column(str.count, urls, repeat('.')),
+        'SubdomainLevel': lambda: subdomain_level,
+        'PathLevel': path_level,
+        'UrlLength': lambda: url_length,
+        'NumDash': lambda: _column(str.count, urls, repeat('-')),
+        'NumDashInHostname': lambda: host_column(1),
+        'AtSymbol': lambda: _contains(urls, '@'),
+        'TildeSymbol': lambda: _contains(urls, '~'),
+        'NumUnderscore': lambda: _column(str.count, urls, repeat('_')),
+        'NumPercent': lambda: _column(str.count, urls, repeat('%')),
+        'NumQueryComponents': lambda: _column(_count_query_components, queries),
+        'NumAmpersand': lambda: _column(str.count, urls, repeat('&')),
+        'NumHash': lambda: _column(str.count, urls, repeat('#')),
+        'NumNumericChars': lambda: _column(_count_digits, urls),
+        'NoHttps': lambda: _column(str.__ne__, schemes, repeat('https')),
+        'RandomString': lambda: np.fromiter((_RANDOM_STRING_RE.search(u) is not None for u in urls_lower), dtype=bool, count=n),
+        'IpAddress': lambda: host_column(3),
+        'DomainInSubdomains': lambda: host_column(5),
+        'DomainInPaths': domain_in_paths,
+        'HttpsInHostname': lambda: host_column(4),
+        'HostnameLength': lambda: host_column(2),
+        'PathLength': lambda: _column(len, paths),
+        'QueryLength': lambda: _column(len, queries),
+        'DoubleSlashInPath': lambda: _contains(paths, '//'),
+        'NumSensitiveWords': num_sensitive_words,
+        'EmbeddedBrandName': embedded_brand_name,
+        # RT copies of static features; HTML-based and other RT columns stay 0
+        'SubdomainLevelRT': lambda: subdomain_level,
+        'UrlLengthRT': lambda: url_length,
+    }
+
+    for j, col in enumerate(columns):
+        if col in values:
+            X[:, j] = values[col]()
+
+    # Same fallback as extract_features: a URL that fails to parse gets all zeros
+    if failed:
+        X[failed] = 0
+    return X
+
+
+def probe_urls(n: int = 500, seed: int = 0) -> list:
+    """
+    Synthetic URLs toggling every trait the URL-based columns look at independently of each other
+    (userinfo, IP hosts, dashes, brand and sensitive words, '//', '~', '_', '%', queries, fragments, ...),
+    so that no two of those columns coincide by chance. Used by redundant_columns.
+    """
+    rng = random.Random(seed)
+    words = list(SENSITIVE_WORDS + BRAND_NAMES) + ['news', 'shop', 'docs', 'media', 'https', 'portal']
+
+    def maybe(p=0.3):
+        return rng.random() < p
+
+    def label():
+        text = rng.choice(words) if maybe(0.5) else ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 10)))
+        return text + '-' + rng.choice(words) if maybe() else text
+
+    urls = []
+    for _ in range(n):
+        domain = label()
+        if maybe(0.1):
+            host = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+        else:
+            subdomains = [domain if maybe(0.15) else label() for _ in range(rng.randint(0, 3))]
+            host = '.'.join(subdomains + [domain, rng.choice(('com', 'co.uk', 'tk', 'org', 'de', 'com.br'))])
+        segments = [domain if maybe(0.15) else label() + ('_' + label() if maybe() else '')
+                    for _ in range(rng.randint(0, 4))]
+        path = '/'.join([''] + segments) + ('/' if maybe() else '')
+        if maybe(0.15):
+            path = '/' + path
+        if maybe(0.15):
+            path = '/~' + label() + path
+        url = rng.choice(('http', 'https', 'ftp')) + '://' + ('user@' if maybe(0.15) else '') + host + path
+        if maybe(0.5):
+            url += '?' + '&'.join(f"{label()}={rng.randint(0, 99999) if maybe(0.5) else label()}" +
+                                  ('%20' + label() if maybe(0.2) else '') for _ in range(rng.randint(1, 4)))
+        if maybe(0.15):
+            url += '#' + label()
+        urls.append(url)
+    return urls
+
+
+def redundant_columns(columns: list = None, urls: list = None) -> dict:
+    """
+    Columns that carry no information of their own under this URL-only extractor, judged on urls
+    (default: probe_urls()):
+    {column: {"reason": "constant", "value": v}} or {column: {"reason": "duplicate", "of": earlier column}}.
+    Models trained without them see exactly what serving can compute.
+    """
+    columns = list(columns) if columns is not None else list(DEFAULT_FEATURE_COLUMNS)
+    X = extract_features_batch(list(urls) if urls is not None else probe_urls(), columns)
+    redundant, kept = {}, {}
+    for j, col in enumerate(columns):
+        values = X[:, j]
+        if np.all(values == values[0]):
+            redundant[col] = {"reason": "constant", "value": float(values[0])}
+            continue
+        key = values.tobytes()
+        if key in kept:
+            redundant[col] = {"reason": "duplicate", "of": kept[key]}
+        else:
+            kept[key] = col
+    return redundant
+
+
 if __name__ == "__main__":
     # Test the feature extractor
     test_urls = [
@@ -195,4 +512,16 @@ if __name__ == "__main__":
         features = extract_features(url)
         print(f"Extracted {len(features)} features")
         print(f"Sample features: {dict(list(features.items())[:5])}")
-        print()
\ No newline at end of file
+        print()
+
+    # Batch extraction must match the scalar extractor row by row
+    batch = extract_features_batch(test_urls)
+    scalar = np.array([[get_feature_vector(url, EXPECTED_FEATURES)[col] for col in EXPECTED_FEATURES]
+                       for url in test_urls], dtype=np.float32)
+    assert batch.flags['C_CONTIGUOUS'] and batch.dtype == np.float32
+    assert np.array_equal(batch, scalar), "extract_features_batch differs from extract_features"
+    print(f"✅ Batch extraction matches scalar extraction for {len(test_urls)} URLs")
+
+    redundant = redundant_columns()
+    assert set(redundant) == set(PAGE_FEATURE_COLUMNS) | {'SubdomainLevelRT', 'UrlLengthRT'}, redundant
+    print(f"✅ {len(redundant)} of {len(DEFAULT_FEATURE_COLUMNS)} columns are constant or duplicated without the page")
@@ -0,0 +1,395 @@
+"""
+Incremental retraining from newly labeled URLs.
+
+A persisted feature store (X.npy, y.npy and the hashes of every URL already in
+it) grows by the rows of each labeled export, e.g. a mongoexport of the
+backend's PhishCheck records with an analyst label. Only new URLs are
+featurized. The current model is then extended instead of refit from zero:
+
+- RandomForest: warm_start adds trees fitted on the whole store
+- XGBoost: boosting continues from the existing booster (xgb_model=)
+- LightGBM: boosting continues from the existing booster (init_model=)
+
+The store holds exactly the columns the model was trained on (a pruned model
+uses a subset of the CSV columns), and a store built for other columns is
+refused. Appended rows are featurized from the URL alone, so for a model with
+HTML-based columns those columns are 0 in every appended row; the share of
+such rows is reported and recorded in the metadata. Every run writes a new versioned model directory with the pickle, the compiled
+arrays, feature_columns.json and model_metadata.json, ready to copy into the
+API's MODEL_DIR (which hot-reloads it). The metadata gets a drift reference
+over the rows the new model was fitted on, and the cascade's first stage is
+carried over unchanged from the previous model.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+try:
+    from src.drift_monitor import build_reference
+    from src.feature_extractor import PAGE_FEATURE_COLUMNS, get_feature_vector, normalize_url
+    from src.model_training import FIRST_STAGE_DIR, count_trees
+    from src.training_data import load_training_data
+    from src.tree_engine import export_tree_ensemble, replace_directory
+except ImportError:  # run as a script from inside src/
+    from drift_monitor import build_reference
+    from feature_extractor import PAGE_FEATURE_COLUMNS, get_feature_vector, normalize_url
+    from model_training import FIRST_STAGE_DIR, count_trees
+    from training_data import load_training_data
+    from tree_engine import export_tree_ensemble, replace_directory
+
+TRUE_LABELS = {"1", "true", "phishing", "yes"}
+FALSE_LABELS = {"0", "false", "safe", "legitimate", "no"}
+
+
+def url_hash(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8", "replace"), digest_size=8).digest(), "little")
+
+
+def _parse_label(value):
+    if isinstance(value, bool):
+        return int(value)
+    text = str(value).strip().lower()
+    if text in TRUE_LABELS:
+        return 1
+    if text in FALSE_LABELS:
+        return 0
+    return None
+
+
+class FeatureStore:
+    """
+    Append-only feature matrix on disk: X.npy (float32), y.npy (int8), url_hashes.npy (uint64)
+    and meta.json with the feature columns and the history of appended batches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.X = self.y = self.hashes = None
+        self.meta = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "meta.json"))
+
+    def load(self):
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.X = np.load(os.path.join(self.path, "X.npy"))
+        self.y = np.load(os.path.join(self.path, "y.npy"))
+        self.hashes = np.load(os.path.join(self.path, "url_hashes.npy"))
+        return self
+
+    def create(self, X: np.ndarray, y: np.ndarray, feature_columns: list, source: str):
+        """Seed the store with an existing dataset (rows without URLs, so no hashes)"""
+        self.X = np.ascontiguousarray(X, dtype=np.float32)
+        self.y = np.asarray(y, dtype=np.int8)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.meta = {"feature_columns": list(feature_columns), "batches": []}
+        self._record(source, len(self.y))
+        return self
+
+    @property
+    def feature_columns(self) -> list:
+        return self.meta["feature_columns"]
+
+    @property
+    def page_columns(self) -> list:
+        """HTML-based columns of the store: real values in the seed rows, always 0 in appended ones"""
+        return [col for col in self.feature_columns if col in PAGE_FEATURE_COLUMNS]
+
+    @property
+    def url_only_rows(self) -> int:
+        """Rows featurized from their URL alone: every batch after the seed dataset"""
+        return sum(batch["rows"] for batch in self.meta["batches"][1:])
+
+    def check_columns(self, columns: list):
+        """Refuse to train a model on a store built for other columns"""
+        if self.feature_columns != list(columns):
+            missing = [col for col in columns if col not in self.feature_columns]
+            extra = [col for col in self.feature_columns if col not in columns]
+            raise ValueError(
+                f"Feature store {self.path} has {len(self.feature_columns)} columns but the model was trained on "
+                f"{len(columns)} (missing {missing}, extra {extra}, or a different order); use a new --store"
+            )
+
+    def append(self, urls: list, labels: list, source: str) -> np.ndarray:
+        """Featurize and add the URLs not already in the store. Returns the indices of the new rows."""
+        seen = set(self.hashes.tolist())
+        new_urls, new_labels, new_hashes = [], [], []
+        for url, label in zip(urls, labels):
+            h = url_hash(url)
+            if h in seen:
+                continue
+            seen.add(h)
+            new_urls.append(url)
+            new_labels.append(label)
+            new_hashes.append(h)
+
+        columns = self.feature_columns
+        X_new = np.array(
+            [list(get_feature_vector(url, columns).values()) for url in new_urls], dtype=np.float32
+        ).reshape(len(new_urls), len(columns))
+        start = len(self.y)
+        self.X = np.concatenate([self.X, X_new])
+        self.y = np.concatenate([self.y, np.asarray(new_labels, dtype=np.int8)])
+        self.hashes = np.concatenate([self.hashes, np.asarray(new_hashes, dtype=np.uint64)])
+        self._record(source, len(new_urls))
+        return np.arange(start, len(self.y))
+
+    def _record(self, source: str, rows: int):
+        self.meta["batches"].append({
+            "source": source,
+            "rows": rows,
+            "added_at": datetime.utcnow().isoformat() + "Z"
+        })
+        self.meta["rows"] = int(len(self.y))
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in (("X", self.X), ("y", self.y), ("url_hashes", self.hashes)):
+            np.save(os.path.join(self.path, f"{name}.npy"), array)
+        # meta.json last: it records how many rows the arrays above hold
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+
+def read_labeled_export(path: str, url_field: str = "url", label_field: str = "label"):
+    """
+    (urls, labels) from a JSON lines/JSON array or CSV export, URLs normalized as the API normalizes them.
+    Labels may be 0/1, booleans or phishing/safe; records without a usable URL or label are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            text = f.read()
+            stripped = text.lstrip()
+            if stripped.startswith("["):
+                records = json.loads(stripped)
+            else:
+                records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    urls, labels = [], []
+    for record in records:
+        url = record.get(url_field)
+        label = _parse_label(record.get(label_field, ""))
+        if isinstance(url, str) and url.strip() and label is not None:
+            urls.append(normalize_url(url))
+            labels.append(label)
+    return urls, labels
+
+
+def model_feature_columns(model, model_path: str, metadata: dict) -> list:
+    """
+    Columns the model was trained on, in order: the estimator's feature_names_in_, else the
+    feature_columns.json or model_metadata.json saved next to it.
+    """
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is not None:
+        return [str(col) for col in columns]
+    columns_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), "feature_columns.json")
+    if os.path.exists(columns_path):
+        with open(columns_path) as f:
+            return json.load(f)
+    if metadata.get("feature_columns"):
+        return list(metadata["feature_columns"])
+    raise ValueError(f"Cannot tell which columns {model_path} was trained on: no feature_columns.json next to it")
+
+
+def continue_training(model, X, y, add_trees: int):
+    """New model: the existing one plus add_trees trees fitted on X, y"""
+    name = type(model).__name__
+    if name.startswith("XGB"):
+        booster = model.get_booster()
+        booster = booster[:count_trees(model)]  # drop trees past best_iteration
+        updated = type(model)(**dict(model.get_params(), n_estimators=add_trees, early_stopping_rounds=None))
+        updated.fit(X, y, xgb_model=booster, verbose=False)
+    elif name.startswith("LGBM"):
+        updated = type(model)(**dict(model.get_params(), n_estimators=add_trees))
+        updated.fit(X, y, init_model=model.booster_)
+    elif hasattr(model, "estimators_"):
+        updated = model
+        # Fit only the new trees; pruned forests grow back from their kept estimators
+        updated.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees)
+        updated.fit(X, y)
+        updated.set_params(warm_start=False)
+    else:
+        raise ValueError(f"Cannot continue training a {name}")
+    return updated
+
+
+def write_version(model, feature_columns: list, metadata: dict, output_dir: str, X_check: pd.DataFrame,
+                  first_stage_dir: str = None) -> str:
+    """
+    Save a version directory. first_stage_dir, the previous model's first-stage arrays, is copied
+    unchanged alongside when metadata keeps the cascade: the first stage only reads URL columns
+    and is not retrained here.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(output_dir, "phishing_model.pkl"))
+    if first_stage_dir and metadata.get("cascade"):
+        shutil.copytree(first_stage_dir, os.path.join(output_dir, FIRST_STAGE_DIR), dirs_exist_ok=True)
+    compiled = export_tree_ensemble(model, os.path.join(output_dir, "phishing_model_arrays"), feature_columns)
+    metadata["compiled_max_probability_diff"] = float(
+        np.abs(compiled.predict_proba(X_check.to_numpy()) - model.predict_proba(X_check)).max()
+    )
+    with open(os.path.join(output_dir, "feature_columns.json"), "w") as f:
+        json.dump(feature_columns, f)
+    with open(os.path.join(output_dir, "model_metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return output_dir
+
+
+def publish(version_dir: str, model_dir: str):
+    """
+    Copy a version into the API's model directory. Model files go first and metadata last,
+    so the API's file watcher (which debounces) picks up a complete set. Array directories are
+    staged and swapped in whole, never rewritten under workers that memory-map them.
+    """
+    for name in ("phishing_model_arrays", FIRST_STAGE_DIR):
+        source, target = os.path.join(version_dir, name), os.path.join(model_dir, name)
+        if not os.path.isdir(source):
+            # A version without a cascade: drop the previous first stage rather than leave it stale
+            shutil.rmtree(target, ignore_errors=True)
+            continue
+        staging = f"{target}.new"
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source, staging)
+        replace_directory(staging, target)
+    for name in ("phishing_model.pkl", "feature_columns.json", "model_metadata.json"):
+        shutil.copy2(os.path.join(version_dir, name), os.path.join(model_dir, name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append newly labeled URLs and extend the current model.")
+    parser.add_argument("exports", nargs="+", help="labeled exports (.jsonl, .json or .csv)")
+    parser.add_argument("--url-field", default="url")
+    parser.add_argument("--label-field", default="label", help="e.g. is_phishing for verified PhishCheck records")
+    parser.add_argument("--store", default="feature_store", help="persisted feature matrix")
+    parser.add_argument("--data", default="data/phishing.csv", help="seeds the store on the first run")
+    parser.add_argument("--model", default="phishing_model.pkl", help="model to continue from")
+    parser.add_argument("--add-trees", type=int, default=50, help="trees (boosting rounds) to add")
+    parser.add_argument("--versions-dir", default="model_versions")
+    parser.add_argument("--publish", metavar="MODEL_DIR", help="also copy the new version into MODEL_DIR")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model = joblib.load(args.model)
+    previous = {}
+    model_dir = os.path.dirname(os.path.abspath(args.model))
+    metadata_path = os.path.join(model_dir, "model_metadata.json")
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            previous = json.load(f)
+    model_columns = model_feature_columns(model, args.model, previous)
+
+    store = FeatureStore(args.store)
+    if store.exists():
+        store.load()
+        store.check_columns(model_columns)
+        print(f"✅ Feature store: {store.meta['rows']} rows")
+    else:
+        X, y, _ = load_training_data(args.data)
+        missing = [col for col in model_columns if col not in X.columns]
+        if missing:
+            raise ValueError(f"{args.data} lacks columns the model was trained on: {missing}")
+        store.create(X[model_columns].to_numpy(dtype=np.float32), y.to_numpy(), model_columns, args.data)
+        print(f"✅ Feature store seeded from {args.data}: {store.meta['rows']} rows, {len(model_columns)} columns")
+
+    new_rows = []
+    for path in args.exports:
+        urls, labels = read_labeled_export(path, args.url_field, args.label_field)
+        added = store.append(urls, labels, os.path.basename(path))
+        new_rows.append(added)
+        print(f"✅ {path}: {len(urls)} labeled URLs, {len(added)} new")
+    new_rows = np.concatenate(new_rows)
+    featurize_seconds = time.perf_counter() - started
+    url_only_rows = store.url_only_rows if store.page_columns else 0
+    if url_only_rows:
+        print(f"⚠️  {url_only_rows} of {len(store.y)} rows ({url_only_rows / len(store.y):.1%}) are URL-only: "
+              f"their {len(store.page_columns)} HTML-based columns are 0, unlike the seed rows. "
+              f"A model trained without those columns (model_training.py without --all-features) avoids the mix.")
+    if len(new_rows) == 0:
+        store.save()
+        print("ℹ️  No new labeled URLs, model unchanged")
+        return
+
+    # Hold out a fifth of the new rows to compare the old and new model on fresh labels;
+    # they stay in the store and are trained on by the next run
+    y_new = store.y[new_rows]
+    stratify = y_new if len(new_rows) >= 10 and np.bincount(y_new).min() >= 2 else None
+    fit_new, holdout = train_test_split(new_rows, test_size=0.2, random_state=42, stratify=stratify) \
+        if len(new_rows) >= 5 else (new_rows, new_rows[:0])
+    fit_mask = np.ones(len(store.y), dtype=bool)
+    fit_mask[holdout] = False
+
+    # Models fitted on DataFrames check feature names, so keep passing named columns
+    columns = store.feature_columns
+    X_holdout, y_holdout = pd.DataFrame(store.X[holdout], columns=columns), store.y[holdout]
+    old_acc = float(accuracy_score(y_holdout, model.predict(X_holdout))) if len(holdout) else None
+    trees_before = count_trees(model)
+
+    fit_started = time.perf_counter()
+    model = continue_training(model, pd.DataFrame(store.X[fit_mask], columns=columns), store.y[fit_mask],
+                              args.add_trees)
+    fit_seconds = time.perf_counter() - fit_started
+    new_acc = float(accuracy_score(y_holdout, model.predict(X_holdout))) if len(holdout) else None
+
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    metadata = {
+        "version": version,
+        "parent_version": previous.get("version"),
+        "model_type": previous.get("model_type", type(model).__name__),
+        "training": "incremental",
+        "n_trees": count_trees(model),
+        "trees_added": count_trees(model) - trees_before,
+        "rows": int(fit_mask.sum()),
+        "new_rows": int(len(new_rows)),
+        "holdout_rows": int(len(holdout)),
+        "holdout_accuracy_before": old_acc,
+        "holdout_accuracy": new_acc,
+        "accuracy": new_acc if new_acc is not None else previous.get("accuracy"),
+        "featurize_seconds": round(featurize_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "url_only_rows": url_only_rows,
+        "n_features": len(store.feature_columns),
+        "feature_columns": store.feature_columns,
+        # The drift monitor compares live traffic with what this version was fitted on
+        "drift_reference": build_reference(store.X[fit_mask], columns)
+    }
+    # The cascade's first stage is kept as is, so its cut-offs and report stay those of its own training
+    first_stage_dir = os.path.join(model_dir, FIRST_STAGE_DIR)
+    if previous.get("cascade"):
+        if os.path.isdir(first_stage_dir):
+            metadata["cascade"] = previous["cascade"]
+        else:
+            print(f"⚠️  {metadata_path} describes a cascade but {first_stage_dir} is missing; "
+                  f"the new version has no first stage")
+    check_rows = pd.DataFrame(store.X[new_rows[:1000]], columns=columns)
+    version_dir = write_version(model, store.feature_columns, metadata,
+                                os.path.join(args.versions_dir, version), check_rows, first_stage_dir)
+    store.save()
+
+    print(f"\n🏆 Model {version}: {metadata['n_trees']} trees (+{metadata['trees_added']}), "
+          f"{metadata['rows']} rows ({metadata['new_rows']} new)")
+    if old_acc is not None:
+        print(f"   Holdout accuracy on new labels: {old_acc:.4f} -> {new_acc:.4f}")
+    print(f"   Featurize {featurize_seconds:.1f}s, fit {fit_seconds:.1f}s, saved to {version_dir}")
+
+    if args.publish:
+        publish(version_dir, args.publish)
+        print(f"✅ Published {version} to {args.publish}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Small in-process metrics: fixed-bucket histograms, labeled counters and gauges, rendered in the
+Prometheus text exposition format by MetricsRegistry.render(). Updates are a dict lookup and an
+add under a lock, cheap enough to leave on in production.
+"""
+import os
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Tuple
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with O(log buckets) updates.
+    A value is counted in the first bucket whose upper bound is >= value (Prometheus "le" semantics).
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts, keyed by upper bound"""
+        buckets = {}
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = running
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0
+        }
+
+
+# Request and stage latencies, in seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    """Sample value at full float precision; :g would round large counters to 6 significant digits"""
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, split by label values given positionally in labelnames order. Thread-safe."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class LabeledHistogram:
+    """One Histogram per combination of label values. Thread-safe."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            histogram = self._histograms.get(labelvalues)
+            if histogram is None:
+                histogram = self._histograms[labelvalues] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def get(self, *labelvalues):
+        return self._histograms.get(labelvalues)
+
+    def samples(self):
+        with self._lock:
+            snapshots = [(labelvalues, histogram.snapshot()) for labelvalues, histogram in self._histograms.items()]
+        for labelvalues, snapshot in snapshots:
+            for bound, count in snapshot["buckets"].items():
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {count}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(snapshot['sum'])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {snapshot['count']}"
+
+
+class CallbackGauge:
+    """
+    Metric read at render time: callback returns {label values tuple: value}.
+    kind="counter" exposes a running total kept elsewhere, such as a cache's hit count.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], dict], labelnames: tuple = (),
+                 kind: str = "gauge"):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        for labelvalues, value in self.callback().items():
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric (replacing one of the same name) and return it"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry: modules register their metrics here and the API serves it on /metrics
+REGISTRY = MetricsRegistry()
+
+
+_PROC_STATUS_FIELDS = {"VmRSS": "rss_mb", "VmHWM": "peak_rss_mb", "RssAnon": "rss_anon_mb", "RssFile": "rss_file_mb"}
+
+
+def process_memory() -> dict:
+    """
+    Resident memory of this process in MB. On Linux rss_file_mb is the part backed by files,
+    such as memory-mapped model arrays, which is shared with other processes mapping the same files.
+    """
+    memory = {}
+    try:
+        with open(f"/proc/{os.getpid()}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in _PROC_STATUS_FIELDS:
+                    name = _PROC_STATUS_FIELDS[key]
+                    memory[name] = round(int(value.split()[0]) / 1024, 2)
+    except OSError:
+        import resource  # not Linux: only the peak is available
+        memory["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    return memory
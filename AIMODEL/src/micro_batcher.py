@@ -0,0 +1,134 @@
+"""
+Micro-batching dispatcher for single-URL requests.
+
+Requests are queued on an asyncio queue and flushed to a batch scoring function
+once max_batch_size are waiting or the oldest has waited max_wait_ms, so many
+concurrent /predict calls share a few vectorized model calls.
+"""
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+try:
+    from src.metrics import Histogram
+except ImportError:  # run as a script from inside src/
+    from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+WAIT_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class MicroBatcher:
+    """
+    Collects submitted items and scores them in batches on executor (the loop's default one if None,
+    or a callable returning the executor to use).
+    score_batch takes a list of items and returns one result per item, in order;
+    a result that is an Exception is raised to that item's caller only.
+    """
+
+    def __init__(self, score_batch: Callable[[List], List], max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, max_concurrent_batches: int = 2, executor=None):
+        self.score_batch = score_batch
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = set()  # batches being scored; referenced so they aren't garbage collected
+
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.queue_depth = Histogram(BATCH_SIZE_BUCKETS)  # items waiting when a batch is flushed
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = Histogram(WAIT_MS_BUCKETS)  # enqueue -> flush, per item
+
+    def _ensure_started(self):
+        """Start the dispatcher on the running loop (again, if the loop changed or it stopped)"""
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> list:
+        """Wait for the first item, then keep collecting until the batch is full or the window closes"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            flushed_at = time.perf_counter()
+            self.queue_depth.observe(len(batch) + self._queue.qsize())
+            self.batch_size.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                self.wait_ms.observe((flushed_at - enqueued_at) * 1000)
+            self.batches += 1
+            self.items += len(batch)
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list):
+        try:
+            items = [item for item, _, _ in batch]
+            try:
+                executor = self.executor() if callable(self.executor) else self.executor
+                results = await asyncio.get_running_loop().run_in_executor(executor, self.score_batch, items)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future, _), result in zip(batch, results):
+                if future.done():  # caller went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "current_queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+            "wait_ms": self.wait_ms.snapshot()
+        }
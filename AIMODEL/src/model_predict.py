@@ -1,21 +1,45 @@
-import joblib
-import pandas as pd
+import numpy as np
+import argparse
+import csv
+import gzip
+import json
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
-# Path to your saved model (adjust if you saved it elsewhere)
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "phishing_model.pkl")
-MODEL_PATH = os.path.abspath(MODEL_PATH)
+try:
+    from src.feature_extractor import extract_features_batch, normalize_url
+    from src.tree_engine import load_tree_ensemble
+except ImportError:  # run as a script from inside src/
+    from feature_extractor import extract_features_batch, normalize_url
+    from tree_engine import load_tree_ensemble
+
+# Saved model: MODEL_DIR as for the API (the directory of this file unless set)
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.abspath(os.path.join(MODEL_DIR, "phishing_model.pkl"))
+FEATURE_COLUMNS_PATH = os.path.join(os.path.dirname(MODEL_PATH), "feature_columns.json")
+# Flattened NumPy export written next to it by model_training.py; preferred when present
+COMPILED_MODEL_PATH = os.path.splitext(MODEL_PATH)[0] + "_arrays"
+LEGACY_COMPILED_MODEL_PATH = os.path.splitext(MODEL_PATH)[0] + ".npz"
 
 # Load trained model
 try:
-    model = joblib.load(MODEL_PATH)
+    if os.path.exists(COMPILED_MODEL_PATH):
+        model = load_tree_ensemble(COMPILED_MODEL_PATH)
+    elif os.path.exists(LEGACY_COMPILED_MODEL_PATH):
+        model = load_tree_ensemble(LEGACY_COMPILED_MODEL_PATH)
+    else:
+        import joblib
+        model = joblib.load(MODEL_PATH)
 except Exception as e:
     print(f"Error loading model from {MODEL_PATH}: {e}")
     sys.exit(1)
 
 # Full list of feature columns used during training (exact order matters)
-FEATURE_COLUMNS = [
+ALL_FEATURE_COLUMNS = [
     'NumDots', 'SubdomainLevel', 'PathLevel', 'UrlLength', 'NumDash', 'NumDashInHostname',
     'AtSymbol', 'TildeSymbol', 'NumUnderscore', 'NumPercent', 'NumQueryComponents', 'NumAmpersand',
     'NumHash', 'NumNumericChars', 'NoHttps', 'RandomString', 'IpAddress', 'DomainInSubdomains',
@@ -29,6 +53,32 @@ FEATURE_COLUMNS = [
     'PctExtNullSelfRedirectHyperlinksRT'
 ]
 
+
+def _model_feature_columns(model) -> list:
+    """
+    Columns the model was trained on, which may be a pruned subset (see model_training.py --all-features):
+    from a compiled model, the fitted estimator, or feature_columns.json saved next to it, in that order.
+    """
+    columns = getattr(model, "feature_columns", None)
+    if columns is None and getattr(model, "feature_names_in_", None) is not None:
+        columns = [str(col) for col in model.feature_names_in_]
+    if columns is None and os.path.exists(FEATURE_COLUMNS_PATH):
+        with open(FEATURE_COLUMNS_PATH) as f:
+            columns = json.load(f)
+    return list(columns) if columns else ALL_FEATURE_COLUMNS
+
+
+FEATURE_COLUMNS = _model_feature_columns(model)
+
+def _to_number(value) -> float:
+    """Numeric feature value, 0 for anything that isn't a number"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if number != number else number  # NaN -> 0
+
+
 def predict_phishing(features: dict):
     """
     Predict whether a site is phishing/unsafe.
@@ -36,36 +86,160 @@ def predict_phishing(features: dict):
     :return: dict with keys 'prediction' (int) and 'probability_of_being_unsafe' (float)
     """
 
-    # Create DataFrame from input dictionary
-    X = pd.DataFrame([features])
+    # One-row feature matrix in training order; missing or non-numeric features become 0
+    X = np.array([[_to_number(features.get(col, 0)) for col in FEATURE_COLUMNS]], dtype=np.float64)
 
-    # Add missing features with default 0
-    for col in FEATURE_COLUMNS:
-        if col not in X.columns:
-            X[col] = 0
-
-    # Keep only expected columns and ensure correct order
-    X = X[FEATURE_COLUMNS]
-
-    # Some models require numeric dtype; ensure numeric
-    X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
-
-    # Predict
-    pred = model.predict(X)[0]
     # predict_proba returns probabilities for each class; index [1] is the probability for class label 1
     try:
-        prob = model.predict_proba(X)[0][1]
+        proba = model.predict_proba(X)[0]
+        pred = model.classes_[proba.argmax()]
+        prob = proba[1]
     except Exception:
         # If model doesn't implement predict_proba, fallback to distance-based or raise
-        prob = float(model.predict(X)[0])
+        pred = model.predict(X)[0]
+        prob = float(pred)
 
     return {
         "prediction": int(pred),
         "probability_of_being_unsafe": float(prob)
     }
 
+# --- Bulk scanning ---
+def _open_input(path: str):
+    """Text handle for a path, "-" for stdin; .gz files are decompressed on the fly"""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+
+def read_urls(paths: list, input_format: str = "text", column: str = "url"):
+    """
+    Yield URLs one at a time from text (one per line), CSV (column by name) or JSON lines (field by name).
+    Blank values and unparseable JSON lines are skipped.
+    """
+    for path in paths:
+        handle = _open_input(path)
+        try:
+            if input_format == "csv":
+                values = (row.get(column) for row in csv.DictReader(handle))
+            elif input_format == "jsonl":
+                values = (_json_field(line, column) for line in handle)
+            else:
+                values = handle
+            for value in values:
+                url = value.strip() if isinstance(value, str) else ""
+                if url:
+                    yield url
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def _json_field(line: str, field: str):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record.get(field) if isinstance(record, dict) else None
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _extract_chunk(urls: list) -> np.ndarray:
+    # normalize_url is the API's own normalization, so a URL gets the same features here as when served
+    return extract_features_batch([normalize_url(url) for url in urls], FEATURE_COLUMNS)
+
+
+def _feature_chunks(chunks, workers: int):
+    """
+    (urls, feature matrix) per chunk, in input order. With workers > 0 extraction runs in a process pool
+    and at most 2 * workers chunks are in flight, so memory stays flat however long the input is.
+    """
+    if workers <= 0:
+        for urls in chunks:
+            yield urls, _extract_chunk(urls)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for urls in chunks:
+            pending.append((urls, pool.submit(_extract_chunk, urls)))
+            if len(pending) >= 2 * workers:
+                urls, future = pending.popleft()
+                yield urls, future.result()
+        while pending:
+            urls, future = pending.popleft()
+            yield urls, future.result()
+
+
+def scan_urls(urls, out, chunk_size: int = 4096, workers: int = 0, progress_every: float = 10.0) -> dict:
+    """
+    Score a stream of URLs chunk by chunk and write one NDJSON verdict per URL to out.
+    Throughput is reported on stderr every progress_every seconds. Returns summary counts.
+    """
+    started = last_report = time.perf_counter()
+    scanned = flagged = 0
+    for chunk, X in _feature_chunks(_chunks(urls, chunk_size), workers):
+        probabilities = model.predict_proba(X)[:, list(model.classes_).index(1)]
+        predictions = probabilities > 0.5
+        out.write("".join(
+            json.dumps({"url": url, "prediction": int(pred), "probability_of_being_unsafe": round(float(prob), 6)}) + "\n"
+            for url, pred, prob in zip(chunk, predictions, probabilities)
+        ))
+        scanned += len(chunk)
+        flagged += int(predictions.sum())
+
+        now = time.perf_counter()
+        if now - last_report >= progress_every:
+            last_report = now
+            print(f"... {scanned} URLs, {scanned / (now - started):.0f} URLs/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "urls": scanned,
+        "flagged": flagged,
+        "seconds": round(elapsed, 3),
+        "urls_per_second": round(scanned / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    print(f"✅ Scanned {scanned} URLs ({flagged} flagged) in {elapsed:.1f}s, "
+          f"{summary['urls_per_second']:.0f} URLs/s", file=sys.stderr)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score URLs from files or stdin and write NDJSON verdicts.")
+    parser.add_argument("inputs", nargs="*", default=["-"], help="input files (.gz allowed), - for stdin")
+    parser.add_argument("--format", choices=["text", "csv", "jsonl"], default="text", dest="input_format")
+    parser.add_argument("--column", default="url", help="CSV column or JSON field holding the URL")
+    parser.add_argument("--output", "-o", default="-", help="NDJSON output file, - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="feature extraction processes, 0 to extract in this process")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        scan_urls(read_urls(args.inputs, args.input_format, args.column), out,
+                  chunk_size=max(1, args.chunk_size), workers=args.workers)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
 # --- TEST BLOCK ---
-if __name__ == "__main__":
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Bulk mode, e.g. python model_predict.py proxy.log.gz --workers 8 -o verdicts.ndjson
+    main()
+elif __name__ == "__main__":
     # Example input: provide a few features (rest will default to 0)
     # IMPORTANT: adjust these values to reflect realistic ranges from your dataset.
     sample_features = {
@@ -0,0 +1,188 @@
+"""
+Loading and validation of the served model together with its metadata.
+
+A ModelBundle is immutable: the API swaps the whole bundle in one assignment
+on reload, so a request that captured the old bundle finishes with it.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from src.feature_extractor import DEFAULT_FEATURE_COLUMNS
+    from src.tree_engine import load_tree_ensemble
+except ImportError:  # run as a script from inside src/
+    from feature_extractor import DEFAULT_FEATURE_COLUMNS
+    from tree_engine import load_tree_ensemble
+
+MODEL_FILE = "phishing_model.pkl"
+# Flattened NumPy export of the same model, preferred when present (see tree_engine.py).
+# The directory of .npy files is memory-mapped and shared between workers; the .npz is read into each process.
+COMPILED_MODEL_DIR = "phishing_model_arrays"
+COMPILED_MODEL_FILE = "phishing_model.npz"
+# Optional first stage of the cascade (see model_training.py), described by metadata["cascade"]
+FIRST_STAGE_DIR = "phishing_first_stage_arrays"
+FEATURE_COLUMNS_FILE = "feature_columns.json"
+METADATA_FILE = "model_metadata.json"
+
+
+@dataclass(frozen=True)
+class FirstStage:
+    """
+    Cheap model in front of the full one: its verdict stands when the phishing probability is
+    at most low_cutoff or at least high_cutoff, anything in between is escalated.
+    """
+    model: object
+    feature_columns: List[str]
+    low_cutoff: float
+    high_cutoff: float
+    # Positions of feature_columns in ModelBundle.input_columns
+    index: np.ndarray
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """A loaded model plus the feature columns and metadata it was trained with"""
+    model: object
+    feature_columns: List[str]
+    info: dict
+    version: str
+    path: str
+    loaded_at: str = field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
+    first_stage: Optional[FirstStage] = None
+    # Columns to extract per URL: feature_columns first, then any only the first stage uses
+    input_columns: List[str] = None
+
+    def __post_init__(self):
+        if self.input_columns is None:
+            object.__setattr__(self, "input_columns", list(self.feature_columns))
+
+
+def _model_files(path: str) -> List[str]:
+    """path itself, or every file of a compiled model directory in a stable order"""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [path]
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    for file_path in _model_files(path):
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_bundle(model_dir: str) -> ModelBundle:
+    """
+    Load model, feature columns and metadata from model_dir.
+    The compiled NumPy ensemble is used when available; joblib is only imported for the pickle fallback.
+    """
+    candidates = [os.path.join(model_dir, name) for name in (COMPILED_MODEL_DIR, COMPILED_MODEL_FILE)]
+    compiled = [path for path in candidates if os.path.exists(path)]
+    path = compiled[0] if compiled else os.path.join(model_dir, MODEL_FILE)
+    try:
+        if compiled:
+            model = load_tree_ensemble(path)
+        else:
+            import joblib
+            model = joblib.load(path)
+    except Exception as e:
+        raise RuntimeError(f"Error loading model from {path}: {e}")
+
+    feature_columns_path = os.path.join(model_dir, FEATURE_COLUMNS_FILE)
+    if os.path.exists(feature_columns_path):
+        with open(feature_columns_path, 'r') as f:
+            feature_columns = json.load(f)
+    else:
+        print("⚠️  feature_columns.json not found, using fallback")
+        feature_columns = list(DEFAULT_FEATURE_COLUMNS)
+
+    info = {}
+    metadata_path = os.path.join(model_dir, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as f:
+            info = json.load(f)
+
+    version = str(info.get("version") or _file_digest(path))
+    first_stage, input_columns = None, list(feature_columns)
+    cascade = info.get("cascade")
+    first_stage_path = os.path.join(model_dir, FIRST_STAGE_DIR)
+    if cascade and os.path.isdir(first_stage_path):
+        try:
+            first_stage_model = load_tree_ensemble(first_stage_path)
+        except Exception as e:
+            raise RuntimeError(f"Error loading first-stage model from {first_stage_path}: {e}")
+        first_stage_columns = list(cascade["feature_columns"])
+        input_columns += [col for col in first_stage_columns if col not in input_columns]
+        first_stage = FirstStage(
+            model=first_stage_model,
+            feature_columns=first_stage_columns,
+            low_cutoff=float(cascade["low_cutoff"]),
+            high_cutoff=float(cascade["high_cutoff"]),
+            index=np.array([input_columns.index(col) for col in first_stage_columns], dtype=np.intp)
+        )
+    return ModelBundle(model=model, feature_columns=feature_columns, info=info, version=version, path=path,
+                       first_stage=first_stage, input_columns=input_columns)
+
+
+def validate_bundle(bundle: ModelBundle):
+    """Raise ValueError if the bundle can't be served with the current feature extractor"""
+    columns = bundle.feature_columns
+    if not columns or not all(isinstance(col, str) for col in columns):
+        raise ValueError("feature_columns must be a non-empty list of names")
+
+    unknown = [col for col in columns if col not in DEFAULT_FEATURE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Feature extractor does not produce columns: {unknown}")
+
+    metadata_columns = bundle.info.get("feature_columns")
+    if metadata_columns is not None and list(metadata_columns) != list(columns):
+        raise ValueError("model_metadata.json and feature_columns.json disagree on feature columns")
+
+    compiled_columns = getattr(bundle.model, "feature_columns", None)
+    if compiled_columns is not None and list(compiled_columns) != list(columns):
+        raise ValueError("Compiled model was exported with different feature columns")
+
+    n_features = getattr(bundle.model, "n_features_in_", None)
+    if n_features is not None and n_features != len(columns):
+        raise ValueError(f"Model expects {n_features} features, feature_columns.json lists {len(columns)}")
+
+    if not hasattr(bundle.model, "predict_proba") and not hasattr(bundle.model, "predict"):
+        raise ValueError("Model has neither predict_proba nor predict")
+
+    first_stage = bundle.first_stage
+    if first_stage is not None:
+        unknown = [col for col in first_stage.feature_columns if col not in DEFAULT_FEATURE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Feature extractor does not produce first-stage columns: {unknown}")
+        if list(getattr(first_stage.model, "feature_columns", None) or []) != first_stage.feature_columns:
+            raise ValueError("First-stage model was exported with different feature columns")
+        if not first_stage.low_cutoff < first_stage.high_cutoff:
+            raise ValueError("First-stage low_cutoff must be below high_cutoff")
+
+
+def check_probabilities(probabilities: np.ndarray):
+    """Raise ValueError unless every probability is a finite number in [0, 1]"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    if not np.all(np.isfinite(probabilities)) or probabilities.min() < 0 or probabilities.max() > 1:
+        raise ValueError("Model produced probabilities outside [0, 1]")
+
+
+def files_signature(model_dir: str) -> tuple:
+    """(name, mtime, size) of every model file present, to detect a new model on disk"""
+    signature = []
+    for name in (COMPILED_MODEL_DIR, COMPILED_MODEL_FILE, MODEL_FILE, FIRST_STAGE_DIR, FEATURE_COLUMNS_FILE,
+                 METADATA_FILE):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            for file_path in _model_files(path):
+                stat = os.stat(file_path)
+                signature.append((os.path.relpath(file_path, model_dir), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
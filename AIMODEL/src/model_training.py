@@ -1,139 +1,668 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ParameterGrid, train_test_split
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threadpoolctl import threadpool_limits
+import lightgbm
+import argparse
+import copy
+import hashlib
 import joblib
 import json
+import os
+import tempfile
+import time
 
-# Load dataset
-print("Loading dataset...")
-df = pd.read_csv("data/phishing.csv")
-
-print(f"Dataset shape: {df.shape}")
-print(f"Columns: {df.columns.tolist()}")
-
-# Drop unnecessary columns like 'id' if present
-if 'id' in df.columns:
-    df = df.drop(columns=['id'])
-
-# Separate features (X) and target (y)
-X = df.drop(columns=['CLASS_LABEL'])
-y = df['CLASS_LABEL']
-
-print(f"\nFeatures: {X.shape[1]}")
-print(f"Samples: {X.shape[0]}")
-print(f"Class distribution:\n{y.value_counts()}")
-
-# IMPORTANT: Save the feature columns for later use
-feature_columns = X.columns.tolist()
-with open('feature_columns.json', 'w') as f:
-    json.dump(feature_columns, f)
-print(f"\n✅ Saved {len(feature_columns)} feature columns to feature_columns.json")
-
-# Split into train/test with stratification
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-print(f"\nTraining set: {X_train.shape[0]} samples")
-print(f"Test set: {X_test.shape[0]} samples")
-
-# Train models
-print("\n" + "="*50)
-print("TRAINING MODELS")
-print("="*50)
-
-print("\n[1/3] Training RandomForest...")
-rf = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=-1)
-rf.fit(X_train, y_train)
-print("✅ RandomForest trained")
-
-print("\n[2/3] Training XGBoost...")
-xgb = XGBClassifier(
-    use_label_encoder=False, 
-    eval_metric='logloss', 
-    random_state=42,
-    n_estimators=200
-)
-xgb.fit(X_train, y_train)
-print("✅ XGBoost trained")
-
-print("\n[3/3] Training LightGBM...")
-lgbm = LGBMClassifier(random_state=42, n_estimators=200, verbose=-1)
-lgbm.fit(X_train, y_train)
-print("✅ LightGBM trained")
-
-# Evaluate all models
-print("\n" + "="*50)
-print("MODEL EVALUATION")
-print("="*50)
-
-models = {
-    'RandomForest': rf, 
-    'XGBoost': xgb, 
-    'LightGBM': lgbm
+try:
+    from src.drift_monitor import build_reference
+    from src.feature_extractor import URL_FEATURE_COLUMNS, redundant_columns
+    from src.training_data import load_training_data
+    from src.tree_engine import export_tree_ensemble, load_tree_ensemble
+except ImportError:  # run as a script from inside src/
+    from drift_monitor import build_reference
+    from feature_extractor import URL_FEATURE_COLUMNS, redundant_columns
+    from training_data import load_training_data
+    from tree_engine import export_tree_ensemble, load_tree_ensemble
+
+# Candidate models with their fixed settings; the grid below varies the rest.
+# n_jobs is not set here: every job gets an explicit thread budget (see train_candidate).
+MODELS = {
+    'RandomForest': (RandomForestClassifier, {'random_state': 42}),
+    'XGBoost': (XGBClassifier, {'eval_metric': 'logloss', 'random_state': 42}),
+    'LightGBM': (LGBMClassifier, {'random_state': 42, 'verbose': -1}),
+}
+
+# Default hyperparameter grid: one candidate per model, as trained before.
+# Override with --grid grid.json, same shape: {"model": {"param": [values, ...]}}.
+# XGBoost/LightGBM also accept "early_stopping_rounds": 10% of the training set is then held out for it.
+PARAM_GRID = {
+    'RandomForest': {'n_estimators': [200]},
+    'XGBoost': {'n_estimators': [200]},
+    'LightGBM': {'n_estimators': [200]},
 }
 
-best_acc = 0
-best_model_name = None
-best_model = None
 
-for name, model in models.items():
-    preds = model.predict(X_test)
-    acc = accuracy_score(y_test, preds)
-    
-    print(f"\n{name} Results:")
-    print(f"Accuracy: {acc:.4f}")
+def expand_grid(grid: dict) -> list:
+    """(model name, params) for every combination in the grid, in a stable order"""
+    unknown = [name for name in grid if name not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models in grid: {unknown}")
+    return [(name, dict(params)) for name in grid for params in ParameterGrid(grid[name])]
+
+
+def candidate_key(name: str, params: dict) -> str:
+    """File-name-safe id of one candidate, stable across runs"""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:10]
+    return f"{name}-{digest}"
+
+
+def data_fingerprint(*arrays) -> str:
+    """Checkpoints are only reused for the exact same train/test data"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        values = np.ascontiguousarray(np.asarray(array))
+        digest.update(str((values.shape, values.dtype.str)).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()[:12]
+
+
+# --- Worker side ---
+_worker_data = {}
+
+
+def _init_worker(X_train, y_train, X_test, y_test):
+    # Sent once per worker process instead of once per job
+    _worker_data.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+
+
+def train_candidate(name: str, params: dict, threads: int, checkpoint_path: str) -> dict:
+    """
+    Fit one candidate with at most `threads` threads, score it on the test set and save it to checkpoint_path.
+    Returns its leaderboard entry.
+    """
+    model_class, fixed = MODELS[name]
+    model_params = dict(params)
+    early_stopping_rounds = model_params.pop('early_stopping_rounds', None) if name == 'LightGBM' else None
+    model = model_class(**fixed, **model_params, n_jobs=threads)
+    X_fit, y_fit, fit_kwargs = _worker_data['X_train'], _worker_data['y_train'], {}
+    if 'early_stopping_rounds' in params:
+        fit_idx, val_idx = train_test_split(
+            np.arange(len(y_fit)), test_size=0.1, random_state=42, stratify=y_fit
+        )
+        fit_kwargs['eval_set'] = [(X_fit.take(val_idx), y_fit.take(val_idx))]
+        if early_stopping_rounds is not None:
+            fit_kwargs['callbacks'] = [lightgbm.early_stopping(early_stopping_rounds, verbose=False)]
+        else:
+            fit_kwargs['verbose'] = False
+        X_fit, y_fit = X_fit.take(fit_idx), y_fit.take(fit_idx)
+
+    started = time.perf_counter()
+    # Also caps BLAS/OpenMP pools the libraries open on their own
+    with threadpool_limits(limits=threads):
+        model.fit(X_fit, y_fit, **fit_kwargs)
+        fit_seconds = time.perf_counter() - started
+        acc = accuracy_score(_worker_data['y_test'], model.predict(_worker_data['X_test']))
+
+    result = {
+        'key': os.path.splitext(os.path.basename(checkpoint_path))[0],
+        'model': name,
+        'params': params,
+        'accuracy': float(acc),
+        'fit_seconds': round(fit_seconds, 3),
+        'wall_seconds': round(time.perf_counter() - started, 3),
+        'threads': threads,
+        'n_trees': count_trees(model)
+    }
+    joblib.dump(model, checkpoint_path)
+    # Result file last: a candidate counts as finished only once its model is on disk
+    with open(os.path.splitext(checkpoint_path)[0] + '.json', 'w') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+# --- Orchestration ---
+def run_candidates(candidates: list, X_train, y_train, X_test, y_test, checkpoint_dir: str,
+                   jobs: int = None, resume: bool = True) -> list:
+    """
+    Train every (name, params) candidate in a process pool of `jobs` workers, each capped at
+    cpu_count // jobs threads so jobs don't oversubscribe cores. Candidates already finished in
+    checkpoint_dir for the same data are loaded instead of retrained when resume is set.
+    Returns leaderboard entries in candidate order.
+    """
+    cores = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cores, len(candidates), cores))
+    threads = max(1, cores // jobs)
+
+    run_dir = os.path.join(checkpoint_dir, data_fingerprint(X_train, y_train, X_test, y_test))
+    os.makedirs(run_dir, exist_ok=True)
+
+    results = {}
+    pending = []
+    for name, params in candidates:
+        key = candidate_key(name, params)
+        result_path = os.path.join(run_dir, key + '.json')
+        if resume and os.path.exists(result_path) and os.path.exists(os.path.join(run_dir, key + '.pkl')):
+            with open(result_path) as f:
+                results[key] = dict(json.load(f), resumed=True)
+            print(f"↩️  {name} {params}: resumed from checkpoint")
+        else:
+            pending.append((key, name, params))
+
+    print(f"\nTraining {len(pending)} candidates ({len(results)} resumed) "
+          f"on {jobs} workers x {threads} threads ({cores} cores)")
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(X_train, y_train, X_test, y_test)) as pool:
+            futures = {
+                pool.submit(train_candidate, name, params, threads, os.path.join(run_dir, key + '.pkl')): key
+                for key, name, params in pending
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = dict(result, resumed=False)
+                print(f"✅ {result['model']} {result['params']}: accuracy {result['accuracy']:.4f} "
+                      f"in {result['wall_seconds']:.1f}s")
+
+    leaderboard = [results[candidate_key(name, params)] for name, params in candidates]
+    for entry in leaderboard:
+        entry['checkpoint'] = os.path.join(run_dir, entry['key'] + '.pkl')
+    return leaderboard
+
+
+def print_leaderboard(leaderboard: list):
+    print("\n" + "="*50)
+    print("LEADERBOARD")
+    print("="*50)
+    ranked = sorted(leaderboard, key=lambda entry: (-entry['accuracy'], entry['wall_seconds']))
+    for rank, entry in enumerate(ranked, 1):
+        resumed = " (resumed)" if entry.get('resumed') else ""
+        pruned = f", pruned to {entry['pruned_trees']} trees" if entry.get('pruned_trees') else ""
+        line = (f"{rank:>2}. {entry['model']:<13} acc {entry['accuracy']:.4f}  "
+                f"wall {entry['wall_seconds']:>7.2f}s  threads {entry['threads']}")
+        bench = entry.get('benchmark')
+        if bench:
+            line += (f"  p99 {bench['single_row_p99_ms']:.3f}ms  batch {bench['batch_us_per_row']:.1f}us/row  "
+                     f"{bench['compiled_bytes'] / 1024:.0f}KB")
+        print(f"{line}  {entry['params']}{pruned}{resumed}")
+
+
+# --- Cheaper variants and latency benchmarks ---
+def count_trees(model) -> int:
+    """Trees the model actually uses at prediction time"""
+    name = type(model).__name__
+    if name.startswith('XGB'):
+        try:
+            return model.best_iteration + 1
+        except AttributeError:
+            return model.get_booster().num_boosted_rounds()
+    if name.startswith('LGBM'):
+        return model.best_iteration_ or model.booster_.num_trees()
+    return len(model.estimators_)
+
+
+def prune_trees(model, n_trees: int):
+    """
+    Copy of the model that only uses its first n_trees trees (boosting rounds).
+    Boosted models keep their trees and get best_iteration set, which predict_proba and
+    export_tree_ensemble both honor; a random forest keeps a prefix of its estimators.
+    """
+    pruned = copy.deepcopy(model)
+    name = type(model).__name__
+    if name.startswith('XGB'):
+        pruned.get_booster().set_attr(best_iteration=str(n_trees - 1))
+    elif name.startswith('LGBM'):
+        pruned.booster_.best_iteration = n_trees
+        pruned._best_iteration = n_trees
+    else:
+        pruned.estimators_ = pruned.estimators_[:n_trees]
+        pruned.n_estimators = n_trees
+    return pruned
+
+
+def load_candidate(entry: dict):
+    model = joblib.load(entry['checkpoint'])
+    if entry.get('pruned_trees'):
+        model = prune_trees(model, entry['pruned_trees'])
+    return model
+
+
+def add_pruned_variants(leaderboard: list, fractions: list, X_test, y_test) -> list:
+    """
+    Leaderboard plus, for every trained candidate, variants keeping a fraction of its trees.
+    They are derived from the checkpoints without retraining and scored on the test set.
+    """
+    variants = []
+    for entry in leaderboard:
+        if entry.get('pruned_trees'):
+            continue
+        model = joblib.load(entry['checkpoint'])
+        total = count_trees(model)
+        counts = sorted({max(1, int(round(total * fraction))) for fraction in fractions})
+        for n_trees in counts:
+            if n_trees >= total:
+                continue
+            acc = accuracy_score(y_test, prune_trees(model, n_trees).predict(X_test))
+            variants.append(dict(entry, key=f"{entry['key']}-t{n_trees}", accuracy=float(acc),
+                                 n_trees=n_trees, pruned_trees=n_trees))
+            print(f"✂️  {entry['model']} {entry['params']} pruned to {n_trees} trees: accuracy {acc:.4f}")
+    return leaderboard + variants
+
+
+def _percentile_ms(samples: list, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 4)
+
+
+def benchmark_candidate(model, X_test, feature_columns: list, single_rows: int = 200,
+                        batch_size: int = 256, repeats: int = 5) -> dict:
+    """
+    Serving cost of one model as the API runs it: the compiled NumPy ensemble loaded from its arrays
+    directory. Reports single-row p50/p99 latency, batch latency, size on disk and load time,
+    plus size and load time of the pickle fallback.
+    """
+    X = np.ascontiguousarray(X_test.to_numpy(dtype=np.float32))
+    with tempfile.TemporaryDirectory() as tmp:
+        arrays_dir = os.path.join(tmp, "arrays")
+        export_tree_ensemble(model, arrays_dir, feature_columns)
+        started = time.perf_counter()
+        compiled = load_tree_ensemble(arrays_dir)
+        load_ms = (time.perf_counter() - started) * 1000
+        compiled_bytes = sum(entry.stat().st_size for entry in os.scandir(arrays_dir))
+
+        pickle_path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, pickle_path)
+        started = time.perf_counter()
+        joblib.load(pickle_path)
+        pickle_load_ms = (time.perf_counter() - started) * 1000
+        pickle_bytes = os.path.getsize(pickle_path)
+
+        compiled.predict_proba(X[:1])  # page in the arrays
+        single = []
+        for i in range(min(single_rows, len(X))):
+            started = time.perf_counter()
+            compiled.predict_proba(X[i:i + 1])
+            single.append(time.perf_counter() - started)
+
+        batch = X[:batch_size]
+        batches = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            compiled.predict_proba(batch)
+            batches.append(time.perf_counter() - started)
+
+    return {
+        "single_row_p50_ms": _percentile_ms(single, 50),
+        "single_row_p99_ms": _percentile_ms(single, 99),
+        "batch_rows": len(batch),
+        "batch_p50_ms": _percentile_ms(batches, 50),
+        "batch_us_per_row": round(float(np.median(batches)) / len(batch) * 1e6, 3),
+        "compiled_bytes": compiled_bytes,
+        "compiled_load_ms": round(load_ms, 3),
+        "pickle_bytes": pickle_bytes,
+        "pickle_load_ms": round(pickle_load_ms, 3)
+    }
+
+
+def benchmark_candidates(leaderboard: list, X_test, feature_columns: list):
+    """Benchmark every entry one after another in this process, so timings don't compete for cores"""
+    for entry in leaderboard:
+        entry['benchmark'] = benchmark_candidate(load_candidate(entry), X_test, feature_columns)
+
+
+def select_model(leaderboard: list, accuracy_tolerance: float = 0.0,
+                 latency_metric: str = "single_row_p99_ms") -> dict:
+    """
+    Fastest entry (by latency_metric) among those within accuracy_tolerance of the best accuracy.
+    Without a benchmark for every entry (--no-benchmark) the tolerance can't trade accuracy for
+    speed, so the most accurate entry wins. The first candidate wins ties, as in the original
+    sequential loop.
+    """
+    best_acc = max(entry['accuracy'] for entry in leaderboard)
+    if not all((entry.get('benchmark') or {}).get(latency_metric) is not None for entry in leaderboard):
+        return next(entry for entry in leaderboard if entry['accuracy'] == best_acc)
+    best = None
+    for entry in leaderboard:
+        if entry['accuracy'] < best_acc - accuracy_tolerance - 1e-12:
+            continue
+        latency = entry['benchmark'][latency_metric]
+        if best is None or latency < best['benchmark'][latency_metric]:
+            best = entry
+    return best
+
+
+# --- Pruned feature set ---
+def serving_view(X, redundant: dict):
+    """X as the URL-only extractor fills it at serving time: constant columns at their value, copies copied"""
+    X = X.copy()
+    for col, info in redundant.items():
+        X[col] = info["value"] if info["reason"] == "constant" else X[info["of"]]
+    return X
+
+
+def read_probe_urls(path: str) -> list:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+# --- First stage of the serving cascade ---
+# A shallow tree on the URL-only columns answers confident URLs; the rest escalate to the full model.
+# Loaded from this directory by model_registry.py when model_metadata.json has a "cascade" entry.
+FIRST_STAGE_DIR = "phishing_first_stage_arrays"
+FIRST_STAGE_PARAMS = {'max_depth': 6, 'min_samples_leaf': 20, 'random_state': 42}
+
+
+def calibrate_cutoffs(probabilities, y, min_precision: float) -> tuple:
+    """
+    (low, high) cut-offs of the first stage: the highest low cut-off such that rows scored at or
+    below it are at least min_precision safe, and the lowest high cut-off such that rows scored at
+    or above it are at least min_precision phishing. A side without one never answers (-1.0 / 2.0).
+    """
+    p = np.asarray(probabilities, dtype=np.float64)
+    y = np.asarray(y).astype(int)
+    order = np.argsort(p, kind="stable")
+    p, y = p[order], y[order]
+    values = np.unique(p)
+    phishing_before = np.concatenate(([0], np.cumsum(y)))  # phishing rows among the first i
+
+    at_or_below = np.searchsorted(p, values, side="right")
+    safe_precision = (at_or_below - phishing_before[at_or_below]) / at_or_below
+    safe = values[(safe_precision >= min_precision) & (values < 0.5)]
+
+    below = np.searchsorted(p, values, side="left")
+    phishing_precision = (phishing_before[-1] - phishing_before[below]) / (len(p) - below)
+    phishing = values[(phishing_precision >= min_precision) & (values >= 0.5)]
+
+    low = float(safe.max()) if len(safe) else -1.0
+    high = float(phishing.min()) if len(phishing) else 2.0
+    return low, high
+
+
+def train_first_stage(X_train, y_train, columns: list, min_precision: float) -> tuple:
+    """
+    Fit the first-stage tree on 75% of the training split and calibrate its cut-offs on the rest.
+    Returns (tree, low, high).
+    """
+    fit_idx, calib_idx = train_test_split(
+        np.arange(len(y_train)), test_size=0.25, random_state=42, stratify=y_train
+    )
+    tree = DecisionTreeClassifier(**FIRST_STAGE_PARAMS)
+    tree.fit(X_train[columns].take(fit_idx), y_train.take(fit_idx))
+    calib_proba = tree.predict_proba(X_train[columns].take(calib_idx))[:, 1]
+    low, high = calibrate_cutoffs(calib_proba, y_train.take(calib_idx), min_precision)
+    return tree, low, high
+
+
+def evaluate_cascade(tree, low: float, high: float, columns: list, X_test, y_test, full_preds) -> dict:
+    """Escalation rate and accuracy of first stage + full model, against the full model alone"""
+    y_true = np.asarray(y_test).astype(int)
+    proba = tree.predict_proba(X_test[columns])[:, 1]
+    answered = (proba <= low) | (proba >= high)
+    cascade_preds = np.where(answered, (proba >= high).astype(int), np.asarray(full_preds).astype(int))
+    full_acc = accuracy_score(y_true, full_preds)
+    cascade_acc = accuracy_score(y_true, cascade_preds)
+    return {
+        "escalation_rate": round(float(1 - answered.mean()), 4),
+        "first_stage_accuracy": round(float(accuracy_score(y_true, (proba >= 0.5).astype(int))), 4),
+        "answered_accuracy": round(float((cascade_preds[answered] == y_true[answered]).mean()), 4)
+        if answered.any() else None,
+        "full_accuracy": round(float(full_acc), 4),
+        "cascade_accuracy": round(float(cascade_acc), 4),
+        "accuracy_change": round(float(cascade_acc - full_acc), 4)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train candidate models in parallel and save the best one.")
+    parser.add_argument("--data", default="data/phishing.csv")
+    parser.add_argument("--grid", help="JSON file with the hyperparameter grid (default: PARAM_GRID)")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel training jobs (default: one per core)")
+    parser.add_argument("--checkpoint-dir", default="training_checkpoints")
+    parser.add_argument("--no-resume", action="store_true", help="retrain candidates that have a checkpoint")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.0,
+                        help="pick the lowest-latency model within this accuracy of the best (e.g. 0.002)")
+    parser.add_argument("--prune-fractions", default="",
+                        help="comma-separated fractions of trees to keep as extra variants, e.g. 0.25,0.5")
+    parser.add_argument("--no-benchmark", action="store_true", help="select by accuracy only")
+    parser.add_argument("--all-features", action="store_true",
+                        help="serve the model on every column, including those the URL-only extractor can't fill "
+                             "(e.g. with page analysis enabled in the API)")
+    parser.add_argument("--probe-urls", help="file of URLs (one per line) to detect constant/duplicate columns on "
+                                             "(default: feature_extractor.probe_urls())")
+    parser.add_argument("--no-cascade", action="store_true", help="don't train the first-stage model")
+    parser.add_argument("--cascade-precision", type=float, default=0.99,
+                        help="precision the first stage must reach on the URLs it answers by itself")
+    args = parser.parse_args(argv)
+
+    # Load dataset: compact dtypes, parsed in chunks, cached after the first run (see training_data.py).
+    # Unnecessary columns like 'id' are dropped and the target is split off while loading.
+    print("Loading dataset...")
+    X, y, load_stats = load_training_data(args.data)
+
+    print(f"Dataset shape: {X.shape} features + label, loaded from {load_stats['source']} in {load_stats['load_seconds']}s")
+    print(f"Memory: {load_stats['features_mb']} MB (float64 would take {load_stats['features_mb_as_float64']} MB), "
+          f"peak RSS {load_stats['peak_rss_mb']} MB")
+    print(f"Columns: {X.columns.tolist()}")
+
+    print(f"\nFeatures: {X.shape[1]}")
+    print(f"Samples: {X.shape[0]}")
+    print(f"Class distribution:\n{y.value_counts()}")
+
+    feature_columns = X.columns.tolist()
+
+    # Split into train/test with stratification. Splitting row indices and taking each side once
+    # avoids train_test_split copying X and y; the full matrix is freed right after.
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=0.2, random_state=42, stratify=y
+    )
+    X_train, X_test = X.take(train_idx), X.take(test_idx)
+    y_train, y_test = y.take(train_idx), y.take(test_idx)
+    del X, y
+
+    print(f"\nTraining set: {X_train.shape[0]} samples")
+    print(f"Test set: {X_test.shape[0]} samples")
+
+    # Train models
+    print("\n" + "="*50)
+    print("TRAINING MODELS")
+    print("="*50)
+
+    grid = PARAM_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    started = time.perf_counter()
+    leaderboard = run_candidates(expand_grid(grid), X_train, y_train, X_test, y_test,
+                                 args.checkpoint_dir, jobs=args.jobs, resume=not args.no_resume)
+    print(f"\n⏱️  All candidates done in {time.perf_counter() - started:.1f}s")
+
+    fractions = [float(value) for value in args.prune_fractions.split(",") if value.strip()]
+    if fractions:
+        leaderboard = add_pruned_variants(leaderboard, fractions, X_test, y_test)
+    if not args.no_benchmark:
+        print("\nBenchmarking inference latency, size and load time...")
+        benchmark_candidates(leaderboard, X_test, feature_columns)
+    print_leaderboard(leaderboard)
+
+    # Evaluate the winner: the fastest model within the accuracy tolerance of the best one
+    best = select_model(leaderboard, args.accuracy_tolerance)
+    best_model_name, best_acc = best['model'], best['accuracy']
+    best_model = load_candidate(best)
+    best['n_trees'] = count_trees(best_model)
+    preds = best_model.predict(X_test)
+
+    print("\n" + "="*50)
+    print("MODEL EVALUATION")
+    print("="*50)
+    print(f"\n{best_model_name} Results:")
+    print(f"Accuracy: {best_acc:.4f}")
     print("\nClassification Report:")
     print(classification_report(y_test, preds, target_names=['Safe', 'Phishing']))
     print("\nConfusion Matrix:")
     print(confusion_matrix(y_test, preds))
-    
-    if acc > best_acc:
-        best_acc = acc
-        best_model_name = name
-        best_model = model
-
-# Save the best model
-print("\n" + "="*50)
-print(f"🏆 Best Model: {best_model_name} with accuracy {best_acc:.4f}")
-joblib.dump(best_model, "phishing_model.pkl")
-print("✅ Model saved as phishing_model.pkl")
-
-# Save model metadata
-metadata = {
-    "model_type": best_model_name,
-    "accuracy": float(best_acc),
-    "n_features": len(feature_columns),
-    "feature_columns": feature_columns
-}
-with open('model_metadata.json', 'w') as f:
-    json.dump(metadata, f, indent=2)
-print("✅ Model metadata saved to model_metadata.json")
-
-# Feature importance (for RandomForest or best tree model)
-if hasattr(best_model, 'feature_importances_'):
-    feature_importance = pd.DataFrame({
-        'feature': feature_columns,
-        'importance': best_model.feature_importances_
-    }).sort_values('importance', ascending=False)
-    
+    served_benchmark = best.get('benchmark')
+
+    # The URL-only extractor leaves the HTML columns at 0 and copies two RT columns, so a model trained
+    # on all of them sees different inputs in serving than in training. Retrain the winner's settings on
+    # the columns that carry information at serving time and serve that model instead.
+    feature_pruning = None
+    redundant = {} if args.all_features else redundant_columns(
+        feature_columns, read_probe_urls(args.probe_urls) if args.probe_urls else None)
+    if redundant:
+        print("\n" + "="*50)
+        print("PRUNED FEATURE SET")
+        print("="*50)
+        pruned_columns = [col for col in feature_columns if col not in redundant]
+        constant = [col for col, info in redundant.items() if info["reason"] == "constant"]
+        print(f"Dropping {len(redundant)} of {len(feature_columns)} columns: {len(constant)} constant, "
+              f"{len(redundant) - len(constant)} duplicated under the URL-only extractor")
+        serving_acc = accuracy_score(y_test, best_model.predict(serving_view(X_test, redundant)))
+
+        X_train_pruned, X_test_pruned = X_train[pruned_columns], X_test[pruned_columns]
+        pruned_entry = run_candidates([(best_model_name, best['params'])], X_train_pruned, y_train,
+                                      X_test_pruned, y_test, args.checkpoint_dir, jobs=1,
+                                      resume=not args.no_resume)[0]
+        pruned_entry['pruned_trees'] = best.get('pruned_trees')
+        pruned_model = load_candidate(pruned_entry)
+        pruned_preds = pruned_model.predict(X_test_pruned)
+        pruned_acc = float(accuracy_score(y_test, pruned_preds))
+        print(f"Accuracy: all {len(feature_columns)} columns {best_acc:.4f} on the test set, {serving_acc:.4f} with "
+              f"serving-time inputs; pruned {len(pruned_columns)} columns {pruned_acc:.4f}")
+        if not args.no_benchmark:
+            served_benchmark = benchmark_candidate(pruned_model, X_test_pruned, pruned_columns)
+            print(f"Single-row p99: {best['benchmark']['single_row_p99_ms']:.3f}ms -> "
+                  f"{served_benchmark['single_row_p99_ms']:.3f}ms")
+
+        feature_pruning = {
+            "all_feature_columns": feature_columns,
+            "pruned_columns": redundant,
+            "probe_urls": args.probe_urls or "feature_extractor.probe_urls()",
+            "all_features_accuracy": float(best_acc),
+            "all_features_serving_accuracy": float(serving_acc),
+            "pruned_accuracy": pruned_acc,
+            "all_features_benchmark": best.get('benchmark')
+        }
+        best_model, best_acc, preds, feature_columns = pruned_model, pruned_acc, pruned_preds, pruned_columns
+        best = dict(best, accuracy=pruned_acc, n_trees=count_trees(pruned_model))
+
+    # Save the best model
     print("\n" + "="*50)
-    print("TOP 10 MOST IMPORTANT FEATURES")
+    print(f"🏆 Best Model: {best_model_name} {best['params']} ({best['n_trees']} trees, {len(feature_columns)} features) "
+          f"with accuracy {best_acc:.4f}")
+    if served_benchmark:
+        print(f"   single-row p99 {served_benchmark['single_row_p99_ms']:.3f}ms "
+              f"(accuracy tolerance {args.accuracy_tolerance})")
+    joblib.dump(best_model, "phishing_model.pkl")
+    print("✅ Model saved as phishing_model.pkl")
+
+    # IMPORTANT: Save the feature columns the model was trained on, in order; serving builds exactly these
+    with open('feature_columns.json', 'w') as f:
+        json.dump(feature_columns, f)
+    print(f"✅ Saved {len(feature_columns)} feature columns to feature_columns.json")
+
+    # Flatten the winner into NumPy arrays so serving doesn't need sklearn/xgboost/lightgbm.
+    # Written as a directory of .npy files that API workers memory-map and share; save() swaps in a new
+    # directory rather than rewriting the files, so running workers keep the model they loaded.
+    compiled = export_tree_ensemble(best_model, "phishing_model_arrays", feature_columns)
+    X_served = X_test[feature_columns]
+    max_diff = float(np.abs(compiled.predict_proba(X_served.to_numpy()) - best_model.predict_proba(X_served)).max())
+    print(f"✅ Compiled model saved to phishing_model_arrays/ ({compiled.n_trees} trees, "
+          f"{compiled.nbytes / 1024:.0f} KB, max probability diff {max_diff:.2e})")
+
+    # First stage of the cascade: a shallow tree on the URL-only columns, with cut-offs calibrated so
+    # it only answers when confident. Serving escalates everything in between to the model above.
+    cascade = None
+    cascade_columns = [col for col in URL_FEATURE_COLUMNS if col in feature_columns]
+    if not args.no_cascade and cascade_columns:
+        print("\n" + "="*50)
+        print("FIRST STAGE (CASCADE)")
+        print("="*50)
+        tree, low, high = train_first_stage(X_train, y_train, cascade_columns, args.cascade_precision)
+        report = evaluate_cascade(tree, low, high, cascade_columns, X_test, y_test, preds)
+        first_stage = export_tree_ensemble(tree, FIRST_STAGE_DIR, cascade_columns)
+        cascade = {
+            "model_type": "DecisionTree",
+            "params": FIRST_STAGE_PARAMS,
+            "feature_columns": cascade_columns,
+            "low_cutoff": low,
+            "high_cutoff": high,
+            "min_precision": args.cascade_precision,
+            **report,
+            "benchmark": None if args.no_benchmark else benchmark_candidate(
+                tree, X_test[cascade_columns], cascade_columns)
+        }
+        print(f"Cut-offs: answers safe at p <= {low:.4f}, phishing at p >= {high:.4f} "
+              f"(precision target {args.cascade_precision})")
+        print(f"Escalation rate: {report['escalation_rate']:.1%} of test URLs reach the full model")
+        print(f"Accuracy: full model {report['full_accuracy']:.4f}, cascade {report['cascade_accuracy']:.4f} "
+              f"({report['accuracy_change']:+.4f}); first stage alone {report['first_stage_accuracy']:.4f}")
+        if cascade["benchmark"] and served_benchmark:
+            print(f"Single-row p99: first stage {cascade['benchmark']['single_row_p99_ms']:.3f}ms, "
+                  f"full model {served_benchmark['single_row_p99_ms']:.3f}ms")
+        print(f"✅ First stage saved to {FIRST_STAGE_DIR}/ ({first_stage.nbytes / 1024:.1f} KB)")
+
+    # Per-feature histograms of the training data, compared with live traffic by the API's drift monitor
+    drift_reference = build_reference(X_train[feature_columns], feature_columns)
+    print(f"\n✅ Drift reference: {len(feature_columns)} feature histograms over {drift_reference['rows']} rows")
+
+    # Save model metadata
+    metadata = {
+        "model_type": best_model_name,
+        "params": best['params'],
+        "n_trees": best['n_trees'],
+        "accuracy": float(best_acc),
+        "n_features": len(feature_columns),
+        "feature_columns": feature_columns,
+        "benchmark": served_benchmark,
+        "feature_pruning": feature_pruning,
+        "selection": {
+            "accuracy_tolerance": args.accuracy_tolerance,
+            "best_accuracy": max(entry['accuracy'] for entry in leaderboard),
+            "latency_metric": None if args.no_benchmark else "single_row_p99_ms"
+        },
+        "cascade": cascade,
+        "drift_reference": drift_reference,
+        "leaderboard": [
+            {key: entry.get(key) for key in ('model', 'params', 'n_trees', 'pruned_trees', 'accuracy',
+                                             'wall_seconds', 'threads', 'benchmark')}
+            for entry in leaderboard
+        ]
+    }
+    with open('model_metadata.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    print("✅ Model metadata saved to model_metadata.json")
+
+    # Feature importance (for RandomForest or best tree model)
+    if hasattr(best_model, 'feature_importances_'):
+        feature_importance = pd.DataFrame({
+            'feature': feature_columns,
+            'importance': best_model.feature_importances_
+        }).sort_values('importance', ascending=False)
+
+        print("\n" + "="*50)
+        print("TOP 10 MOST IMPORTANT FEATURES")
+        print("="*50)
+        print(feature_importance.head(10).to_string(index=False))
+
+        feature_importance.to_csv('feature_importance.csv', index=False)
+        print("\n✅ Feature importance saved to feature_importance.csv")
+
+    print("\n" + "="*50)
+    print("✅ TRAINING COMPLETE!")
     print("="*50)
-    print(feature_importance.head(10).to_string(index=False))
-    
-    feature_importance.to_csv('feature_importance.csv', index=False)
-    print("\n✅ Feature importance saved to feature_importance.csv")
-
-print("\n" + "="*50)
-print("✅ TRAINING COMPLETE!")
-print("="*50)
-print("\nFiles created:")
-print("  - phishing_model.pkl (trained model)")
-print("  - feature_columns.json (feature list)")
-print("  - model_metadata.json (model info)")
-print("  - feature_importance.csv (feature rankings)")
\ No newline at end of file
+    print("\nFiles created:")
+    print("  - phishing_model.pkl (trained model)")
+    print("  - phishing_model_arrays/ (compiled NumPy model, memory-mapped by the API)")
+    if cascade:
+        print(f"  - {FIRST_STAGE_DIR}/ (first-stage model of the serving cascade)")
+    print("  - feature_columns.json (feature list)")
+    print("  - model_metadata.json (model info)")
+    print("  - feature_importance.csv (feature rankings)")
+    print(f"  - {args.checkpoint_dir}/ (one checkpoint per candidate, reused by the next run)")
+
+
+if __name__ == "__main__":
+    main()
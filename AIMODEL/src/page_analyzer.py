@@ -0,0 +1,626 @@
+"""
+Optional page analysis: fetch the page behind a URL and compute the HTML-based features.
+
+extract_features only looks at the URL string, so the HTML columns (PctExtHyperlinks,
+InsecureForms, IframeOrFrame, MissingTitle, ...) and the page-based RT columns stay 0.
+PageAnalyzer fetches pages with one pooled httpx.AsyncClient, at most PAGE_FETCH_PER_HOST
+requests per host at a time, a hard deadline per page and a cap on the bytes read, and
+feeds the body to an HTMLParser chunk by chunk as it arrives. Features are cached per host.
+On timeout or any fetch error analyze() returns None and the caller keeps the URL-only features.
+
+The URLs are chosen by whoever submits them, so fetches only reach global addresses: the
+connection layer resolves every host itself, refuses it when any of its addresses is loopback,
+private, link-local or otherwise not global, and connects to the address it checked. Redirects
+are followed by hand (at most PAGE_FETCH_MAX_REDIRECTS), each hop going through the same checks,
+and proxies from the environment are ignored.
+
+httpx is optional; without it HAS_HTTPX is False and the stage is unavailable.
+"""
+import asyncio
+import codecs
+import ipaddress
+import os
+import socket
+import time
+from collections import Counter
+from contextlib import aclosing, contextmanager
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import urljoin, urlparse
+
+try:
+    from src import public_suffix
+    from src.feature_extractor import PAGE_FEATURE_COLUMNS
+    from src.metrics import Histogram
+    from src.verdict_cache import VerdictCache
+except ImportError:  # run as a script from inside src/
+    import public_suffix
+    from feature_extractor import PAGE_FEATURE_COLUMNS
+    from metrics import Histogram
+    from verdict_cache import VerdictCache
+
+try:
+    import httpcore
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    httpcore = httpx = None
+    HAS_HTTPX = False
+
+# Deadline for one page, including the wait for a per-host slot
+PAGE_FETCH_TIMEOUT_SECONDS = float(os.environ.get("PAGE_FETCH_TIMEOUT_SECONDS", "2"))
+# Bytes of body parsed per page; the rest is not downloaded
+PAGE_FETCH_MAX_BYTES = int(os.environ.get("PAGE_FETCH_MAX_BYTES", str(512 * 1024)))
+PAGE_FETCH_PER_HOST = int(os.environ.get("PAGE_FETCH_PER_HOST", "2"))
+PAGE_FETCH_MAX_CONNECTIONS = int(os.environ.get("PAGE_FETCH_MAX_CONNECTIONS", "100"))
+PAGE_FETCH_MAX_REDIRECTS = int(os.environ.get("PAGE_FETCH_MAX_REDIRECTS", "5"))
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", "10000"))
+PAGE_CACHE_TTL_SECONDS = float(os.environ.get("PAGE_CACHE_TTL_SECONDS", "600"))
+# Pages on loopback/private/link-local addresses (by name or after DNS) are not fetched unless this is set
+PAGE_FETCH_ALLOW_PRIVATE = os.environ.get("PAGE_FETCH_ALLOW_PRIVATE", "0").lower() in ("1", "true", "yes")
+
+STAGE_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+PAGE_FEATURES = PAGE_FEATURE_COLUMNS
+
+_RESOURCE_TAGS = {"img": "src", "script": "src", "link": "href", "audio": "src", "video": "src",
+                  "source": "src", "embed": "src", "iframe": "src", "frame": "src", "input": "src"}
+_NULL_HREFS = ("", "#", "#nothing", "#doesnotexist", "#null", "#void", "#whatever", "#content",
+               "javascript:void(0)", "javascript:void(0);", "javascript::void(0)", "javascript:;")
+_ABNORMAL_ACTIONS = ("", "#", "about:blank", "javascript:true", "javascript:void(0)")
+
+
+def registered_domain(host: str) -> str:
+    """example.co.uk for www.example.co.uk; the host itself when it has no public suffix"""
+    parts = public_suffix.split_hostname(host.lower())
+    return f"{parts.domain}.{parts.suffix}" if parts.suffix else host.lower()
+
+
+def _rapid_threshold(value: float, legitimate_below: float, phishing_above: float) -> int:
+    """RT encoding used by the training data: 1 legitimate, 0 suspicious, -1 phishing"""
+    if value < legitimate_below:
+        return 1
+    return 0 if value <= phishing_above else -1
+
+
+class _PageParser(HTMLParser):
+    """Counts links, resources and forms of one page as it is fed"""
+
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        parsed = urlparse(page_url)
+        self.page_domain = registered_domain(parsed.hostname or "")
+        self.links = self.ext_links = self.null_links = 0
+        self.link_domains = Counter()
+        self.resources = self.ext_resources = 0
+        self.meta_script_links = self.ext_meta_script_links = 0
+        self.ext_favicon = self.iframe = self.mailto = 0
+        self.fake_status = self.right_click_disabled = self.popup = 0
+        self.forms = self.insecure_forms = self.relative_forms = self.ext_forms = self.abnormal_forms = 0
+        self.images_only_forms = 0
+        self.title = []
+        self._in_title = self._in_script = False
+        self._script = []
+        self._form = None  # [has_text, has_image] of the open form
+
+    def _is_external(self, url: str) -> bool:
+        host = urlparse(urljoin(self.page_url, url)).hostname
+        return bool(host) and registered_domain(host) != self.page_domain
+
+    def _scan_script(self, text: str):
+        compact = text.replace(" ", "").lower()
+        if "window.status" in compact:
+            self.fake_status = 1
+        if "event.button==2" in compact or "contextmenu" in compact and "returnfalse" in compact:
+            self.right_click_disabled = 1
+        if "window.open(" in compact:
+            self.popup = 1
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        for name in ("onmouseover", "oncontextmenu", "onclick", "onload"):
+            if name in attrs:
+                self._scan_script(attrs[name] if name != "oncontextmenu" else "contextmenu " + attrs[name])
+
+        if tag in ("a", "area") and "href" in attrs:
+            href = attrs["href"].strip()
+            lowered = href.lower()
+            self.links += 1
+            if lowered.startswith("mailto:"):
+                self.mailto = 1
+            if lowered in _NULL_HREFS or lowered.startswith(("#", "file:")) or href == self.page_url:
+                self.null_links += 1
+            else:
+                host = urlparse(urljoin(self.page_url, href)).hostname
+                if host:
+                    domain = registered_domain(host)
+                    self.link_domains[domain] += 1
+                    if domain != self.page_domain:
+                        self.ext_links += 1
+
+        attribute = _RESOURCE_TAGS.get(tag)
+        if attribute and attrs.get(attribute, "").strip():
+            external = self._is_external(attrs[attribute].strip())
+            self.resources += 1
+            self.ext_resources += external
+            if tag in ("script", "link"):
+                self.meta_script_links += 1
+                self.ext_meta_script_links += external
+            if tag == "link" and "icon" in attrs.get("rel", "").lower():
+                self.ext_favicon = max(self.ext_favicon, int(external))
+        elif tag == "meta" and "url=" in attrs.get("content", "").lower():
+            target = attrs["content"].lower().split("url=", 1)[1].strip("'\" ")
+            self.meta_script_links += 1
+            self.ext_meta_script_links += self._is_external(target)
+
+        if tag in ("iframe", "frame"):
+            self.iframe = 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "script":
+            self._in_script = True
+            self._script = []
+        elif tag == "form":
+            self._open_form(attrs.get("action", ""))
+        elif self._form is not None:
+            if tag == "img" or tag == "input" and attrs.get("type", "").lower() == "image":
+                self._form[1] = True
+            elif tag in ("input", "textarea", "select", "button") and attrs.get("type", "").lower() != "hidden":
+                self._form[0] = True
+
+    def _open_form(self, action: str):
+        self.forms += 1
+        self._form = [False, False]
+        action = action.strip()
+        lowered = action.lower()
+        if lowered in _ABNORMAL_ACTIONS or lowered.startswith("javascript:"):
+            self.abnormal_forms += 1
+            return
+        if lowered.startswith("mailto:"):
+            self.mailto = 1
+            return
+        if not urlparse(action).scheme and not action.startswith("//"):
+            self.relative_forms += 1
+        if self._is_external(action):
+            self.ext_forms += 1
+        if urlparse(urljoin(self.page_url, action)).scheme != "https":
+            self.insecure_forms += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "script" and self._in_script:
+            self._in_script = False
+            self._scan_script("".join(self._script))
+        elif tag == "form" and self._form is not None:
+            has_text, has_image = self._form
+            self.images_only_forms += has_image and not has_text
+            self._form = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title.append(data)
+        elif self._in_script:
+            self._script.append(data)
+        elif self._form is not None and data.strip():
+            self._form[0] = True
+
+    def features(self) -> dict:
+        pct_ext_links = self.ext_links / self.links if self.links else 0.0
+        pct_null_links = self.null_links / self.links if self.links else 0.0
+        pct_ext_resources = self.ext_resources / self.resources if self.resources else 0.0
+        pct_ext_meta = self.ext_meta_script_links / self.meta_script_links if self.meta_script_links else 0.0
+        frequent = self.link_domains.most_common(1)
+        abnormal_ext_form = -1 if self.abnormal_forms else (0 if self.ext_forms else 1)
+        return {
+            'PctExtHyperlinks': round(pct_ext_links, 4),
+            'PctExtResourceUrls': round(pct_ext_resources, 4),
+            'ExtFavicon': self.ext_favicon,
+            'InsecureForms': int(self.insecure_forms > 0),
+            'RelativeFormAction': int(self.relative_forms > 0),
+            'ExtFormAction': int(self.ext_forms > 0),
+            'AbnormalFormAction': int(self.abnormal_forms > 0),
+            'PctNullSelfRedirectHyperlinks': round(pct_null_links, 4),
+            'FrequentDomainNameMismatch': int(bool(frequent) and frequent[0][0] != self.page_domain),
+            'FakeLinkInStatusBar': self.fake_status,
+            'RightClickDisabled': self.right_click_disabled,
+            'PopUpWindow': self.popup,
+            'SubmitInfoToEmail': self.mailto,
+            'IframeOrFrame': self.iframe,
+            'MissingTitle': int(not "".join(self.title).strip()),
+            'ImagesOnlyInForm': int(self.images_only_forms > 0),
+            'PctExtResourceUrlsRT': _rapid_threshold(pct_ext_resources, 0.22, 0.61),
+            'AbnormalExtFormActionR': abnormal_ext_form,
+            'ExtMetaScriptLinkRT': _rapid_threshold(pct_ext_meta, 0.17, 0.81),
+            'PctExtNullSelfRedirectHyperlinksRT': _rapid_threshold(pct_ext_links + pct_null_links, 0.31, 0.67)
+        }
+
+
+def page_features(html: str, page_url: str) -> dict:
+    """HTML-based features of a complete document (analyze() feeds the parser incrementally instead)"""
+    parser = _PageParser(page_url)
+    parser.feed(html)
+    parser.close()
+    return parser.features()
+
+
+class BlockedAddress(Exception):
+    """Raised instead of connecting to, or following a redirect to, a non-global address"""
+
+
+def is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (IPv4-mapped IPv6 addresses are judged as IPv4)"""
+    try:
+        ip = ipaddress.ip_address(address.strip("[]").split("%", 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+def _is_private_host(host: str) -> bool:
+    """Cheap check of the host as written: localhost names and non-global IP literals (DNS comes later)"""
+    if host == "localhost" or host.endswith(".localhost"):
+        return True
+    try:
+        ipaddress.ip_address(host.strip("[]").split("%", 1)[0])
+    except ValueError:
+        return False
+    return not is_public_address(host)
+
+
+async def resolve_public_address(host: str, port: int) -> str:
+    """An address of host to connect to; BlockedAddress when it has none or any of them is not global"""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = [info[4][0] for info in infos]
+    blocked = [address for address in addresses if not is_public_address(address)]
+    if not addresses or blocked:
+        raise BlockedAddress(f"{host} resolves to non-global addresses {blocked}")
+    return addresses[0]
+
+
+if HAS_HTTPX:
+    class _PublicOnlyBackend(httpcore.AsyncNetworkBackend):
+        """
+        Network backend that resolves hosts itself and connects only to the checked global address,
+        so DNS can't answer one address for the check and another for the connection
+        """
+
+        def __init__(self):
+            self._backend = httpcore.AnyIOBackend()
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            address = await resolve_public_address(host, port)
+            # TLS still verifies the certificate against (and sends SNI for) the host name
+            return await self._backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                                   socket_options=socket_options)
+
+        async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+            raise BlockedAddress("Unix sockets are not fetched")
+
+        async def sleep(self, seconds):
+            await self._backend.sleep(seconds)
+
+    # httpcore errors and the httpx errors of the same name that the client and its callers expect
+    _HTTPCORE_ERRORS = (httpcore.TimeoutException, httpcore.NetworkError, httpcore.ProtocolError,
+                        httpcore.ProxyError, httpcore.UnsupportedProtocol)
+
+    @contextmanager
+    def _as_httpx_errors(request):
+        try:
+            yield
+        except _HTTPCORE_ERRORS as e:
+            raise getattr(httpx, type(e).__name__, httpx.TransportError)(str(e), request=request) from e
+
+    class _ResponseStream(httpx.AsyncByteStream):
+        def __init__(self, stream, request):
+            self._stream = stream
+            self._request = request
+
+        async def __aiter__(self):
+            with _as_httpx_errors(self._request):
+                async for chunk in self._stream:
+                    yield chunk
+
+        async def aclose(self):
+            await self._stream.aclose()
+
+    class _PublicOnlyTransport(httpx.AsyncBaseTransport):
+        """
+        httpx transport over an httpcore connection pool whose connections go through _PublicOnlyBackend.
+        Only public httpx/httpcore API is used, so no httpx release can swap the backend back; no proxies.
+        """
+
+        def __init__(self, limits):
+            self._pool = httpcore.AsyncConnectionPool(
+                ssl_context=httpx.create_ssl_context(trust_env=False),
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=limits.keepalive_expiry,
+                network_backend=_PublicOnlyBackend()
+            )
+
+        async def handle_async_request(self, request):
+            core_request = httpcore.Request(
+                method=request.method,
+                url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port,
+                                 target=request.url.raw_path),
+                headers=request.headers.raw,
+                content=request.stream,
+                extensions=request.extensions
+            )
+            with _as_httpx_errors(request):
+                response = await self._pool.handle_async_request(core_request)
+            return httpx.Response(status_code=response.status, headers=response.headers,
+                                  stream=_ResponseStream(response.stream, request), extensions=response.extensions)
+
+        async def aclose(self):
+            await self._pool.aclose()
+
+
+class PageAnalyzer:
+    """
+    Async fetch-and-parse stage with a shared connection pool, per-host slots and a per-host
+    feature cache. Failed hosts are cached too (as empty results), so a slow host is not
+    retried on every request until the entry expires.
+    """
+
+    def __init__(self, timeout_seconds: float = PAGE_FETCH_TIMEOUT_SECONDS, max_bytes: int = PAGE_FETCH_MAX_BYTES,
+                 per_host: int = PAGE_FETCH_PER_HOST, max_connections: int = PAGE_FETCH_MAX_CONNECTIONS,
+                 cache: Optional[VerdictCache] = None, allow_private: bool = PAGE_FETCH_ALLOW_PRIVATE,
+                 max_redirects: int = PAGE_FETCH_MAX_REDIRECTS):
+        if not HAS_HTTPX:
+            raise RuntimeError("Page analysis needs httpx (pip install httpx)")
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self.per_host = max(1, per_host)
+        self.max_connections = max_connections
+        self.cache = cache if cache is not None else VerdictCache(PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_TTL_SECONDS)
+        self.allow_private = allow_private
+        self.max_redirects = max(0, max_redirects)
+        self._client = None
+        self._loop = None
+        self._host_slots = {}  # host -> [semaphore, users]
+
+        self.requests = 0
+        self.fetched = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.truncated = 0
+        self.skipped = 0  # not HTML or not http(s)
+        self.blocked = 0  # a non-global address: as written, after DNS, or as a redirect target
+        self.total_ms = Histogram(STAGE_MS_BUCKETS)  # analyze() call, cache hits included
+        self.fetch_ms = Histogram(STAGE_MS_BUCKETS)  # network time of fetched pages
+        self.parse_ms = Histogram(STAGE_MS_BUCKETS)
+
+    def _get_client(self):
+        """Client for the running loop (a new one if the loop changed, e.g. in tests)"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._host_slots = {}
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds),
+                transport=(httpx.AsyncHTTPTransport(limits=limits, trust_env=False) if self.allow_private
+                           else _PublicOnlyTransport(limits)),
+                trust_env=False,
+                follow_redirects=False,  # _fetch checks every hop
+                headers={"User-Agent": "Mozilla/5.0 (compatible; phishing-url-analyzer)"}
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def analyze(self, url: str) -> Optional[dict]:
+        """Page features for the URL's host, or None (URL-only fallback) on timeout, error or non-HTML"""
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            parsed = urlparse(url)
+            host = (parsed.hostname or "").lower()
+            if parsed.scheme not in ("http", "https") or not host:
+                self.skipped += 1
+                return None
+            if not self.allow_private and _is_private_host(host):
+                self.blocked += 1
+                return None
+            key = f"{host}:{parsed.port}" if parsed.port else host
+            cached = self.cache.get(key)
+            if cached is None:
+                try:
+                    cached = await asyncio.wait_for(self._fetch_limited(key, url), self.timeout_seconds)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    cached = {}
+                except BlockedAddress:
+                    self.blocked += 1
+                    cached = {}
+                except Exception:
+                    self.errors += 1
+                    cached = {}
+                self.cache.put(key, cached)
+            return cached or None
+        finally:
+            self.total_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def _fetch_limited(self, key: str, url: str) -> dict:
+        client = self._get_client()
+        slot = self._host_slots.setdefault(key, [asyncio.Semaphore(self.per_host), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                # Another request for this host may have filled the cache while this one waited
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+                return await self._fetch(client, url)
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0 and self._host_slots.get(key) is slot:
+                del self._host_slots[key]
+
+    def _check_redirect(self, location: str):
+        """Same rules as analyze() for a redirect target; its address is checked again when connecting"""
+        parsed = urlparse(location)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise BlockedAddress(f"Redirect to {location!r} is not http(s)")
+        if not self.allow_private and _is_private_host(parsed.hostname.lower()):
+            raise BlockedAddress(f"Redirect to non-global host {parsed.hostname}")
+
+    async def _open(self, client, url: str):
+        """Streamed response of the last hop, following at most max_redirects checked redirects"""
+        for _ in range(self.max_redirects + 1):
+            response = await client.send(client.build_request("GET", url), stream=True)
+            if not response.is_redirect:
+                return response
+            await response.aclose()
+            url = urljoin(str(response.url), response.headers["location"])
+            self._check_redirect(url)
+        raise httpx.TooManyRedirects(f"More than {self.max_redirects} redirects")
+
+    async def _fetch(self, client, url: str) -> dict:
+        started = time.perf_counter()
+        parse_seconds = 0.0
+        async with aclosing(await self._open(client, url)) as response:
+            if "html" not in response.headers.get("content-type", "").lower():
+                self.skipped += 1
+                return {}
+            try:
+                decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            parser = _PageParser(str(response.url))
+            received = 0
+            async for chunk in response.aiter_bytes():
+                room = self.max_bytes - received
+                received += len(chunk)
+                parse_started = time.perf_counter()
+                parser.feed(decoder.decode(chunk[:room]))
+                parse_seconds += time.perf_counter() - parse_started
+                if received >= self.max_bytes:
+                    self.truncated += 1  # stop reading; the connection is discarded rather than drained
+                    break
+
+        parse_started = time.perf_counter()
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        features = parser.features()
+        parse_seconds += time.perf_counter() - parse_started
+
+        self.fetched += 1
+        self.parse_ms.observe(parse_seconds * 1000)
+        self.fetch_ms.observe((time.perf_counter() - started - parse_seconds) * 1000)
+        return features
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "requests": self.requests,
+            "fetched": self.fetched,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "truncated": self.truncated,
+            "skipped": self.skipped,
+            "blocked": self.blocked,
+            "host_cache": self.cache.stats(),
+            "latency_ms": {
+                "total": self.total_ms.snapshot(),
+                "fetch": self.fetch_ms.snapshot(),
+                "parse": self.parse_ms.snapshot()
+            }
+        }
+
+
+if __name__ == "__main__":
+    # Demo against a local stub server: a phishing-like page, a slow page, a huge page and a JSON endpoint
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    PHISHING_PAGE = b"""<html><head><title></title>
+<link rel="icon" href="http://cdn.evil.example/favicon.ico">
+<script src="http://cdn.evil.example/a.js"></script>
+<script>document.oncontextmenu = function () { if (event.button == 2) return false; }; window.open('x')</script>
+</head><body>
+<a href="#">Home</a> <a href="#">Help</a> <a href="https://www.paypal.com/">PayPal</a>
+<a href="https://www.paypal.com/signin" onmouseover="window.status='https://www.paypal.com'">Sign in</a>
+<form action="mailto:collect@evil.example"><input type="image" src="/submit.png"></form>
+<form action="http://collect.evil.example/post.php"><input name="password"></form>
+<iframe src="https://www.paypal.com/frame"></iframe>
+</body></html>"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/slow"):
+                time.sleep(1.5)
+            if self.path.startswith("/json"):
+                body, content_type = b'{"ok": true}', "application/json"
+            elif self.path.startswith("/huge"):
+                body, content_type = b"<html><title>big</title>" + b"<p>filler</p>" * 200_000, "text/html"
+            else:
+                body, content_type = PHISHING_PAGE, "text/html; charset=utf-8"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the analyzer stopped reading at its size cap
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    async def demo():
+        analyzer = PageAnalyzer(timeout_seconds=0.5, max_bytes=64 * 1024, allow_private=True)
+        try:
+            features = await analyzer.analyze(f"http://127.0.0.1:{port}/login")
+            assert features["SubmitInfoToEmail"] == 1 and features["IframeOrFrame"] == 1, features
+            assert features["MissingTitle"] == 1 and features["ExtFavicon"] == 1, features
+            assert features["FakeLinkInStatusBar"] == 1 and features["RightClickDisabled"] == 1, features
+            assert features["ImagesOnlyInForm"] == 1 and features["InsecureForms"] == 1, features
+            assert features["FrequentDomainNameMismatch"] == 1, features
+            print(f"✅ Page features: {json.dumps(features)}")
+
+            # Same host: answered from the per-host cache, concurrently
+            results = await asyncio.gather(*(analyzer.analyze(f"http://127.0.0.1:{port}/p{i}") for i in range(20)))
+            assert all(result == features for result in results)
+
+            # Each stub below is a different "host" (localhost vs 127.0.0.1 share no cache entry)
+            slow = PageAnalyzer(timeout_seconds=0.5, allow_private=True)
+            started = time.perf_counter()
+            assert await slow.analyze(f"http://localhost:{port}/slow") is None
+            print(f"✅ Slow page fell back to URL-only features after {time.perf_counter() - started:.2f}s")
+            await slow.aclose()
+
+            huge = PageAnalyzer(max_bytes=64 * 1024, allow_private=True)
+            assert (await huge.analyze(f"http://localhost:{port}/huge"))["MissingTitle"] == 0
+            assert huge.truncated == 1
+            await huge.aclose()
+
+            assert await PageAnalyzer().analyze(f"http://127.0.0.1:{port}/login") is None  # private address
+            json_only = PageAnalyzer(allow_private=True)
+            assert await json_only.analyze(f"http://localhost:{port}/json") is None
+            await json_only.aclose()
+
+            stats = analyzer.stats()
+            print(f"   requests {stats['requests']}, fetched {stats['fetched']}, "
+                  f"host cache hit rate {stats['host_cache']['hit_rate']}")
+            for stage, histogram in stats["latency_ms"].items():
+                print(f"   {stage:<6} mean {histogram['mean']:.2f}ms over {histogram['count']}")
+        finally:
+            await analyzer.aclose()
+            server.shutdown()
+
+    asyncio.run(demo())
@@ -0,0 +1,185 @@
+"""
+Offline registered-domain splitting with a bundled Public Suffix List.
+
+Gives the same subdomain/domain/suffix split as tldextract.extract(url) with
+its default settings (ICANN suffixes only), but reads public_suffix_list.dat
+next to this file once into an in-memory trie and never touches the network
+or a disk cache. Results are memoized per hostname.
+
+To refresh the list, replace public_suffix_list.dat with
+https://publicsuffix.org/list/public_suffix_list.dat
+"""
+import os
+import re
+from functools import lru_cache
+from ipaddress import AddressValueError, IPv6Address
+from typing import NamedTuple
+from urllib.parse import scheme_chars
+
+SUFFIX_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
+# Distinct hostnames remembered by split_hostname
+HOSTNAME_CACHE_SIZE = int(os.environ.get("HOSTNAME_CACHE_SIZE", "65536"))
+
+_SUFFIX_RE = re.compile(r"^(?P<suffix>[.*!]*\w[\S]*)", re.UNICODE | re.MULTILINE)
+_PRIVATE_SEPARATOR = "// ===BEGIN PRIVATE DOMAINS==="
+_IP_RE = re.compile(
+    r"^(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.)"
+    r"{3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$",
+    re.ASCII,
+)
+_SCHEME_CHARS = frozenset(scheme_chars)
+_END = None  # key marking that the labels so far form a complete suffix; labels are always str
+
+try:
+    import idna
+    _idna_decode = idna.decode
+except ImportError:  # the stdlib codec implements the older IDNA 2003 rules
+    def _idna_decode(label: str) -> str:
+        return label.encode("ascii").decode("idna")
+
+
+class ExtractResult(NamedTuple):
+    subdomain: str
+    domain: str
+    suffix: str
+
+
+_trie = None
+
+
+def _load_trie() -> dict:
+    """Nested dicts keyed by reversed suffix labels, built from the ICANN section of the list"""
+    global _trie
+    if _trie is None:
+        with open(SUFFIX_LIST_PATH, encoding="utf-8") as f:
+            public_text = f.read().partition(_PRIVATE_SEPARATOR)[0]
+        root = {}
+        for match in _SUFFIX_RE.finditer(public_text):
+            node = root
+            for label in reversed(match.group("suffix").split(".")):
+                node = node.setdefault(label, {})
+            node[_END] = True
+        _trie = root
+    return _trie
+
+
+def _decode_label(label: str) -> str:
+    lowered = label.lower()
+    if lowered.startswith("xn--"):
+        try:
+            return _idna_decode(lowered)
+        except (UnicodeError, IndexError):
+            pass
+    return lowered
+
+
+def _suffix_index(labels: list):
+    """Index of the first public suffix label, or None when no suffix matches"""
+    node = _load_trie()
+    suffix_index = label_index = len(labels)
+    for label in reversed(labels):
+        decoded = _decode_label(label)
+        if decoded in node:
+            label_index -= 1
+            node = node[decoded]
+            if _END in node:
+                suffix_index = label_index
+            continue
+        if "*" in node:
+            return label_index if "!" + decoded in node else label_index - 1
+        break
+    return None if suffix_index == len(labels) else suffix_index
+
+
+def host_from_url(url: str) -> str:
+    """Case-preserving host of a URL-like string, parsed as leniently as tldextract does"""
+    start = url.find("//")
+    if start == 0:
+        url = url[2:]
+    elif start >= 2 and url[start - 1] == ":" and not set(url[:start - 1]) - _SCHEME_CHARS:
+        url = url[start + 2:]
+    authority = url.partition("/")[0].partition("?")[0].partition("#")[0]
+
+    after_userinfo = authority.rpartition("@")[-1]
+    if after_userinfo and after_userinfo[0] == "[":
+        host, bracket, _ = after_userinfo.partition("]")
+        if bracket:
+            return f"{host}]"
+    return after_userinfo.partition(":")[0].strip().rstrip(".。．｡")
+
+
+@lru_cache(maxsize=HOSTNAME_CACHE_SIZE)
+def split_hostname(host: str) -> ExtractResult:
+    """Subdomain, registered domain label and public suffix of a host"""
+    host = host.replace("。", ".").replace("．", ".").replace("｡", ".")
+    if len(host) >= 4 and host[0] == "[" and host[-1] == "]":
+        try:
+            IPv6Address(host[1:-1])
+            return ExtractResult("", host, "")
+        except AddressValueError:
+            pass
+
+    labels = host.split(".")
+    index = _suffix_index(labels)
+    if index is None:
+        if len(labels) == 4 and host[:1].isdecimal() and _IP_RE.fullmatch(host):
+            return ExtractResult("", host, "")
+        return ExtractResult(".".join(labels[:-1]), labels[-1], "")
+
+    subdomain = ".".join(labels[:index - 1]) if index >= 2 else ""
+    domain = labels[index - 1] if index > 0 else ""
+    return ExtractResult(subdomain, domain, ".".join(labels[index:]))
+
+
+def extract(url: str) -> ExtractResult:
+    """Drop-in for tldextract.extract(url).subdomain/.domain/.suffix"""
+    return split_hostname(host_from_url(url))
+
+
+if __name__ == "__main__":
+    # Parity and speed against tldextract reading its own bundled snapshot (no network)
+    import sys
+    import time
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import tldextract
+
+    urls = [
+        "https://www.google.com/search?q=x", "http://forums.bbc.co.uk/", "http://192.168.1.1/admin",
+        "https://[2001:db8::1]:8443/x", "http://user:pw@Mail.Example.CO.UK.:80/", "https://xn--80ak6aa92e.com/",
+        "https://a.b.c.kawasaki.jp/", "http://city.kawasaki.jp/", "localhost:8000/x", "paypal-login.verify.tk",
+        "https://s3.amazonaws.com/bucket", "http://secure-paypal.com.evil.ru/login", "//cdn.example.net/a.js",
+        "https://foo.github.io/", "http://www.example.com。au/", "", "http://.com", "https://x..y.com/",
+    ]
+    urls += [f"https://sub{i % 500}.site{i % 3000}.{('com', 'co.uk', 'de', 'xyz', 'com.br')[i % 5]}/p?i={i}"
+             for i in range(50000)]
+
+    started = time.perf_counter()
+    reference = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+    reference("example.com")
+    tld_cold_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    extract("example.com")
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    def reference_parts(url):
+        result = reference(url)
+        return result.subdomain, result.domain, result.suffix
+
+    mismatches = [url for url in urls if tuple(extract(url)) != reference_parts(url)]
+    assert not mismatches, mismatches[:5]
+
+    split_hostname.cache_clear()
+    timings = {}
+    for name, func in (("tldextract", reference), ("public_suffix (cold cache)", extract),
+                       ("public_suffix (warm cache)", extract)):
+        started = time.perf_counter()
+        for url in urls:
+            func(url)
+        timings[name] = (time.perf_counter() - started) / len(urls) * 1e6
+
+    print(f"✅ {len(urls)} URLs, identical subdomain/domain/suffix to tldextract")
+    print(f"   First call: tldextract {tld_cold_ms:.1f}ms, public_suffix {cold_ms:.1f}ms")
+    for name, us in timings.items():
+        print(f"   {name:<28} {us:.2f}us/URL")
+    print(f"   {split_hostname.cache_info()}")
@@ -0,0 +1,136 @@
+"""
+Dedicated, bounded executor for the CPU-bound scoring of the API.
+
+Scoring runs on its own ThreadPoolExecutor or ProcessPoolExecutor instead of
+Starlette's shared threadpool, sized by config. Admission is counted on the
+event loop: once max_pending calls are queued or running, further calls fail
+fast with ExecutorBusy (the API answers 503 with Retry-After) rather than
+letting the queue, and with it every caller's latency, grow without limit.
+
+A process pool sidesteps the GIL for the Python-heavy feature extraction, at the
+cost of pickling arguments and results, and metrics observed inside the
+workers stay in the workers.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+try:
+    from src.metrics import Histogram
+except ImportError:  # run as a script from inside src/
+    from metrics import Histogram
+
+THREAD = "thread"
+PROCESS = "process"
+RUN_MS_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class ExecutorBusy(Exception):
+    """Raised instead of queueing when max_pending calls are already admitted"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Scoring queue is full, retry after {retry_after:g}s")
+        self.retry_after = retry_after
+
+
+class ScoringExecutor:
+    """
+    Thread or process pool with an admission limit. All counters are only touched from the event loop,
+    so they need no lock. The pool is created by start(), or on first use.
+    """
+
+    def __init__(self, kind: str = THREAD, workers: int = 0, max_pending: int = 0, retry_after: float = 1.0,
+                 initializer: Optional[Callable] = None, initargs: tuple = ()):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor kind {kind!r}, expected {THREAD!r} or {PROCESS!r}")
+        self.kind = kind
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.max_pending = max_pending if max_pending > 0 else self.workers * 64
+        self.retry_after = retry_after
+        self.initializer = initializer
+        self.initargs = initargs
+        self.pool: Optional[Executor] = None
+
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.run_ms = Histogram(RUN_MS_BUCKETS)  # admission -> result, queue wait included
+
+    def _create_pool(self) -> Executor:
+        if self.kind == PROCESS:
+            return ProcessPoolExecutor(self.workers, initializer=self.initializer, initargs=self.initargs)
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="scoring",
+                                  initializer=self.initializer, initargs=self.initargs)
+
+    def start(self) -> Executor:
+        if self.pool is None:
+            self.pool = self._create_pool()
+        return self.pool
+
+    def restart(self):
+        """Replace the pool (e.g. so process workers pick up a new model); running calls finish on the old one"""
+        old, self.pool = self.pool, self._create_pool()
+        if old is not None:
+            old.shutdown(wait=False)
+            self.restarts += 1
+
+    def shutdown(self, wait: bool = True):
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait)
+            self.pool = None
+
+    @contextmanager
+    def admit(self):
+        """Count one call as pending for the duration of the block, or raise ExecutorBusy"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorBusy(self.retry_after)
+        self.pending += 1
+        self.admitted += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pending -= 1
+            self.run_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def run(self, func: Callable, *args):
+        """Admit the call and run func(*args) on the pool; func and args must be picklable for processes"""
+        with self.admit():
+            return await asyncio.get_running_loop().run_in_executor(self.start(), func, *args)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "max_pending_seen": self.max_pending_seen,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "run_ms": self.run_ms.snapshot()
+        }
+
+
+if __name__ == "__main__":
+    def work(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    async def demo():
+        executor = ScoringExecutor(THREAD, workers=2, max_pending=4, retry_after=0.5)
+        outcomes = await asyncio.gather(*(executor.run(work, 0.05) for _ in range(10)), return_exceptions=True)
+        busy = [outcome for outcome in outcomes if isinstance(outcome, ExecutorBusy)]
+        assert len(busy) == 6 and busy[0].retry_after == 0.5, outcomes
+        assert await executor.run(work, 0) == 0  # admits again once the queue drained
+        executor.shutdown()
+        print(f"✅ 4 admitted, 6 rejected with Retry-After, then admitted again: {executor.stats()}")
+
+    asyncio.run(demo())
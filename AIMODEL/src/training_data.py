@@ -0,0 +1,144 @@
+"""
+Memory-compact loading of the training CSV.
+
+The CSV is parsed in chunks and every column is stored in the smallest dtype
+that holds its values (most are 0/1 flags or small counts), floats as float32,
+which is what the tree learners use internally anyway. The parsed columns are
+cached next to the CSV (Parquet when pyarrow is installed, otherwise one .npy
+per column), so later runs skip CSV parsing until the CSV changes.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.metrics import process_memory
+except ImportError:  # run as a script from inside src/
+    from metrics import process_memory
+
+LABEL_COLUMN = "CLASS_LABEL"
+CHUNK_ROWS = 100_000
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def _compact(frame: pd.DataFrame) -> pd.DataFrame:
+    """Downcast every column: integers to the smallest int type, everything else to float32"""
+    out = {}
+    for name, column in frame.items():
+        values = pd.to_numeric(column, errors="coerce")
+        if values.isna().any() or not np.array_equal(values, np.round(values)):
+            out[name] = values.astype(np.float32)
+        else:
+            out[name] = pd.to_numeric(values.astype(np.int64), downcast="integer")
+    return pd.DataFrame(out, copy=False)
+
+
+def _read_csv_compact(csv_path: str, chunk_rows: int) -> pd.DataFrame:
+    chunks = [_compact(chunk) for chunk in pd.read_csv(csv_path, chunksize=chunk_rows)]
+    if not chunks:
+        raise ValueError(f"{csv_path} has no rows")
+    # Chunks may have picked different widths for a column; concat widens to the common type
+    frame = pd.concat(chunks, ignore_index=True, copy=False) if len(chunks) > 1 else chunks[0]
+    for name in frame.columns:
+        if frame[name].dtype.kind in "iu":
+            frame[name] = pd.to_numeric(frame[name], downcast="integer")
+    return frame
+
+
+def _cache_dir(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".cache"
+
+
+def _source_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _load_cache(csv_path: str):
+    cache_dir = _cache_dir(csv_path)
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("source") != _source_signature(csv_path):
+        return None
+
+    if meta["format"] == "parquet":
+        if not HAS_PYARROW:
+            return None
+        return pd.read_parquet(os.path.join(cache_dir, "data.parquet"))
+    columns = {
+        name: np.load(os.path.join(cache_dir, f"{i}.npy"), allow_pickle=False)
+        for i, name in enumerate(meta["columns"])
+    }
+    return pd.DataFrame(columns, copy=False)
+
+
+def _save_cache(csv_path: str, frame: pd.DataFrame):
+    cache_dir = _cache_dir(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    if HAS_PYARROW:
+        frame.to_parquet(os.path.join(cache_dir, "data.parquet"), index=False)
+        cache_format = "parquet"
+    else:
+        for i, name in enumerate(frame.columns):
+            np.save(os.path.join(cache_dir, f"{i}.npy"), frame[name].to_numpy())
+        cache_format = "npy"
+    # meta.json last: a half-written cache is never picked up
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump({
+            "format": cache_format,
+            "columns": frame.columns.tolist(),
+            "source": _source_signature(csv_path)
+        }, f, indent=2)
+
+
+def load_training_data(csv_path: str, label_column: str = LABEL_COLUMN, drop_columns=("id",),
+                       use_cache: bool = True, chunk_rows: int = CHUNK_ROWS):
+    """
+    Load the training CSV as compact features and labels.
+    Returns (X, y, stats): X is a DataFrame without the label or dropped columns, y the label Series,
+    and stats reports load time, source (csv or cache), size in memory and peak process RSS.
+    """
+    started = time.perf_counter()
+    frame = _load_cache(csv_path) if use_cache else None
+    source = "cache" if frame is not None else "csv"
+    if frame is None:
+        frame = _read_csv_compact(csv_path, chunk_rows)
+        if use_cache:
+            _save_cache(csv_path, frame)
+
+    y = frame[label_column]
+    # One column selection instead of a drop() for 'id' and another for the label
+    X = frame[[name for name in frame.columns if name != label_column and name not in drop_columns]]
+    del frame
+
+    memory = process_memory()
+    stats = {
+        "source": source,
+        "rows": len(X),
+        "load_seconds": round(time.perf_counter() - started, 3),
+        "features_mb": round(float(X.memory_usage(index=False).sum()) / 2 ** 20, 2),
+        "features_mb_as_float64": round(X.shape[0] * X.shape[1] * 8 / 2 ** 20, 2),
+        "peak_rss_mb": memory.get("peak_rss_mb", memory.get("max_rss_mb"))
+    }
+    return X, y, stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    X, y, stats = load_training_data(sys.argv[1] if len(sys.argv) > 1 else "data/phishing.csv")
+    print(f"✅ Loaded {X.shape} from {stats['source']} in {stats['load_seconds']}s")
+    print(f"   {stats['features_mb']} MB in memory (float64 would be {stats['features_mb_as_float64']} MB), "
+          f"peak RSS {stats['peak_rss_mb']} MB")
+    print(X.dtypes.value_counts().to_string())
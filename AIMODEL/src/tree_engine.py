@@ -0,0 +1,312 @@
+"""
+Pandas-free inference for the trained tree ensembles.
+
+model_training.py flattens the winning RandomForest, XGBoost or LightGBM model
+into flat node arrays with export_tree_ensemble(). Serving loads them with
+load_tree_ensemble(), which only needs NumPy.
+
+The arrays are saved as a directory of .npy files, already in the dtypes the
+traversal uses, and loaded read-only with mmap. Every worker process on a host
+then shares the same page-cache pages instead of holding a private copy.
+"""
+import json
+import os
+import shutil
+import numpy as np
+
+# Leaves point back to themselves, so every tree can be stepped a fixed number of times
+_LEAF = -1
+# Arrays saved as one .npy file each
+_ARRAYS = ("feature", "threshold", "children", "value", "roots", "is_leaf")
+
+
+class CompiledTreeEnsemble:
+    """
+    Binary tree ensemble evaluated with vectorized NumPy over all rows and trees at once.
+    Exposes the predict/predict_proba/classes_ subset of the sklearn estimator API used by the service.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth,
+                 kind, base_margin=0.0, sigmoid_scale=1.0, strict_less=False, feature_columns=None,
+                 is_leaf=None):
+        # np.asarray only views memory-mapped arrays when the dtype already matches, so pages stay shared
+        self.memory_mapped = isinstance(value, np.memmap)
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.children = np.asarray(children, dtype=np.intp)  # (n_nodes, 2): [go right, go left]
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.kind = kind  # "mean_proba" (random forest) or "logistic" (boosted margins)
+        self.base_margin = float(base_margin)
+        self.sigmoid_scale = float(sigmoid_scale)
+        self.strict_less = bool(strict_less)  # XGBoost splits on x < t, sklearn/LightGBM on x <= t
+        self.feature_columns = list(feature_columns) if feature_columns is not None else None
+        self.classes_ = np.array([0, 1])
+        if is_leaf is None:
+            is_leaf = self.children[:, 0] == np.arange(len(self.children))
+        self.is_leaf = np.asarray(is_leaf, dtype=bool)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def leaf_values(self, X) -> np.ndarray:
+        """Leaf value reached in every tree, shape (n_rows, n_trees)"""
+        # Trees compare float32 inputs, as sklearn and XGBoost do internally;
+        # widening once up front keeps the comparisons below free of casts
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+
+        # One flat cursor per (row, tree); take() on flat intp-indexed arrays avoids 2-D fancy indexing
+        flat_X = X.ravel()
+        nodes = np.tile(self.roots, n_rows)
+        feature = self.feature
+        children = self.children.reshape(-1)
+        row_offsets = np.repeat(np.arange(n_rows) * n_features, self.n_trees) if n_rows > 1 else None
+        for depth in range(self.max_depth):
+            features = feature.take(nodes)
+            if row_offsets is not None:
+                features += row_offsets
+            x = flat_X.take(features)
+            if self.strict_less:
+                go_left = x < self.threshold.take(nodes)
+            else:
+                go_left = x <= self.threshold.take(nodes)
+            nodes += nodes
+            nodes += go_left
+            nodes = children.take(nodes)
+            # Stop early once every cursor sits on a leaf
+            if depth % 4 == 3 and self.is_leaf.take(nodes).all():
+                break
+        return self.value.take(nodes).reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.leaf_values(X)
+        if self.kind == "mean_proba":
+            positive = leaves.mean(axis=1)
+        else:
+            margin = leaves.sum(axis=1) + self.base_margin
+            positive = 1.0 / (1.0 + np.exp(-self.sigmoid_scale * margin))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        # Ties go to class 0, like argmax in sklearn's predict
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value, self.roots, self.is_leaf))
+
+    def save(self, path: str):
+        """
+        Write one .npy file per array plus meta.json into the directory path.
+        The files are written and fsynced in a sibling directory that then replaces path, so workers
+        that have the previous arrays memory-mapped keep reading them unchanged until they reload.
+        """
+        path = os.path.abspath(path)
+        staging = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name in _ARRAYS:
+            with open(os.path.join(staging, f"{name}.npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(getattr(self, name)))
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({
+                "max_depth": self.max_depth,
+                "kind": self.kind,
+                "base_margin": self.base_margin,
+                "sigmoid_scale": self.sigmoid_scale,
+                "strict_less": self.strict_less,
+                "feature_columns": self.feature_columns
+            }, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_directory(staging, path)
+
+
+def _fsync_directory(path: str):
+    if os.name == "posix":
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def replace_directory(staging: str, path: str):
+    """
+    Move the complete directory staging to path. An existing path is renamed aside and removed
+    afterwards: unlinked files stay valid for processes that memory-map them, rewritten ones would not.
+    """
+    _fsync_directory(staging)
+    retired = None
+    if os.path.exists(path):
+        retired = f"{path}.old-{os.getpid()}"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(path, retired)
+    os.rename(staging, path)
+    _fsync_directory(os.path.dirname(path))
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def load_tree_ensemble(path: str, mmap: bool = True) -> CompiledTreeEnsemble:
+    """
+    Load an ensemble written by CompiledTreeEnsemble.save / export_tree_ensemble.
+    Arrays are memory-mapped read-only unless mmap is False. A single .npz file is also accepted.
+    """
+    if not os.path.isdir(path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return CompiledTreeEnsemble(**{name: data[name] for name in data.files if name != "meta"}, **meta)
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for name in _ARRAYS
+    }
+    return CompiledTreeEnsemble(**arrays, **meta)
+
+
+# --- Export from trained estimators ---
+class _TreeBuilder:
+    """Accumulates nodes of many trees into flat arrays"""
+
+    def __init__(self):
+        self.feature, self.threshold, self.left, self.right, self.value = [], [], [], [], []
+        self.roots = []
+        self.max_depth = 0
+
+    def add_node(self, feature=_LEAF, threshold=0.0, value=0.0) -> int:
+        node_id = len(self.feature)
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.left.append(node_id)
+        self.right.append(node_id)
+        self.value.append(value)
+        return node_id
+
+    def build(self, kind, feature_columns, **params) -> CompiledTreeEnsemble:
+        feature = np.array(self.feature, dtype=np.intp)
+        leaves = feature == _LEAF
+        feature[leaves] = 0
+        threshold = np.array(self.threshold, dtype=np.float64)
+        threshold[leaves] = 0.0  # either direction stays on the leaf
+        children = np.column_stack([self.right, self.left]).astype(np.intp)
+        return CompiledTreeEnsemble(
+            feature, threshold, children, self.value, self.roots, self.max_depth,
+            kind=kind, feature_columns=feature_columns, **params
+        )
+
+
+def _export_sklearn(estimators, positive_index, feature_columns) -> CompiledTreeEnsemble:
+    builder = _TreeBuilder()
+    for estimator in estimators:
+        tree = estimator.tree_
+        offset = len(builder.feature)
+        for node in range(tree.node_count):
+            if tree.children_left[node] == -1:
+                counts = tree.value[node][0]
+                builder.add_node(value=float(counts[positive_index] / counts.sum()))
+            else:
+                builder.add_node(int(tree.feature[node]), float(tree.threshold[node]))
+                builder.left[-1] = offset + int(tree.children_left[node])
+                builder.right[-1] = offset + int(tree.children_right[node])
+        builder.roots.append(offset)
+        builder.max_depth = max(builder.max_depth, int(tree.max_depth))
+    return builder.build("mean_proba", feature_columns)
+
+
+def _export_xgboost(model, feature_columns) -> CompiledTreeEnsemble:
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    if not config["learner"]["objective"]["name"].startswith("binary:logistic"):
+        raise ValueError("Only binary:logistic XGBoost models can be compiled")
+
+    base_score = float(str(config["learner"]["learner_model_param"]["base_score"]).strip("[]"))
+    names = booster.feature_names or feature_columns
+    index = {name: i for i, name in enumerate(names)} if names else {}
+
+    dumps = booster.get_dump(dump_format="json")
+    try:
+        dumps = dumps[:(model.best_iteration + 1) * max(1, int(getattr(model, "num_parallel_tree", 1) or 1))]
+    except AttributeError:
+        pass  # no early stopping: every tree is used
+
+    builder = _TreeBuilder()
+
+    def add(node, depth):
+        builder.max_depth = max(builder.max_depth, depth)
+        if "leaf" in node:
+            return builder.add_node(value=float(node["leaf"]))
+        split = node["split"]
+        feature = index[split] if split in index else int(split.lstrip("f"))
+        # XGBoost stores thresholds as float32
+        node_id = builder.add_node(feature, float(np.float32(node["split_condition"])))
+        children = {child["nodeid"]: child for child in node["children"]}
+        builder.left[node_id] = add(children[node["yes"]], depth + 1)
+        builder.right[node_id] = add(children[node["no"]], depth + 1)
+        return node_id
+
+    for dump in dumps:
+        builder.roots.append(add(json.loads(dump), 0))
+
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+    return builder.build("logistic", feature_columns, base_margin=base_margin, strict_less=True)
+
+
+def _export_lightgbm(model, feature_columns) -> CompiledTreeEnsemble:
+    dump = model.booster_.dump_model()
+    objective = dump.get("objective", "")
+    if not objective.startswith("binary"):
+        raise ValueError("Only binary LightGBM models can be compiled")
+    sigmoid_scale = 1.0
+    for part in objective.split():
+        if part.startswith("sigmoid:"):
+            sigmoid_scale = float(part.split(":", 1)[1])
+
+    builder = _TreeBuilder()
+
+    def add(node, depth):
+        builder.max_depth = max(builder.max_depth, depth)
+        if "leaf_value" in node:
+            return builder.add_node(value=float(node["leaf_value"]))
+        if node["decision_type"] != "<=":
+            raise ValueError(f"Unsupported LightGBM split type: {node['decision_type']}")
+        node_id = builder.add_node(int(node["split_feature"]), float(node["threshold"]))
+        builder.left[node_id] = add(node["left_child"], depth + 1)
+        builder.right[node_id] = add(node["right_child"], depth + 1)
+        return node_id
+
+    for tree in dump["tree_info"]:
+        builder.roots.append(add(tree["tree_structure"], 0))
+
+    return builder.build("logistic", feature_columns, sigmoid_scale=sigmoid_scale)
+
+
+def export_tree_ensemble(model, path: str = None, feature_columns: list = None) -> CompiledTreeEnsemble:
+    """
+    Flatten a fitted binary RandomForest/DecisionTree, XGBoost or LightGBM classifier.
+    Saves it to the directory path when given and returns the compiled ensemble.
+    """
+    name = type(model).__name__
+    if name.startswith("XGB"):
+        compiled = _export_xgboost(model, feature_columns)
+    elif name.startswith("LGBM"):
+        compiled = _export_lightgbm(model, feature_columns)
+    elif hasattr(model, "estimators_") or hasattr(model, "tree_"):
+        estimators = model.estimators_ if hasattr(model, "estimators_") else [model]
+        positive_index = list(model.classes_).index(1)
+        compiled = _export_sklearn(estimators, positive_index, feature_columns)
+    else:
+        raise ValueError(f"Cannot compile model of type {name}")
+
+    if path:
+        compiled.save(path)
+    return compiled
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules import each other as src.<module>, so tests run with AIMODEL/ on the path, wherever pytest starts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,111 @@
+"""
+Allow/deny matching: exact allowed hosts, '*.' allowed domains, denied domains with their subdomains,
+parents only down to the registrable domain, and Bloom filter hits confirmed by the sorted hashes.
+"""
+import numpy as np
+import pytest
+
+from src.domain_index import ALLOW, DENY, DomainIndex, domain_hash, load_domain_index, normalize_domain
+
+ALLOWED = ["www.paypal.com", "*.google.com", "github.io", "*.co.uk", "site5.example.com"]
+DENIED = ["http://evil-login.tk/verify", "*.phish.example.com", "co.jp", "paypal.com.evil.ru"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return DomainIndex.build([normalize_domain(entry) for entry in ALLOWED],
+                             [normalize_domain(entry) for entry in DENIED])
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ("WWW.PayPal.com.", "www.paypal.com"),
+    ("https://user@Evil-Login.tk:8443/verify?x=1", "evil-login.tk"),
+    ("*.Google.com", "*.google.com"),
+    (".google.com", "*.google.com"),
+    ("*.", ""),
+])
+def test_normalize_domain(entry, expected):
+    assert normalize_domain(entry) == expected
+
+
+@pytest.mark.parametrize("host", ["www.paypal.com", "WWW.PayPal.com.", "site5.example.com", "github.io"])
+def test_exact_allow_entry_matches_only_that_host(index, host):
+    assert index.lookup(host) == ALLOW
+
+
+@pytest.mark.parametrize("host", ["paypal.com", "login.www.paypal.com", "x.site5.example.com",
+                                  "attacker.github.io"])
+def test_exact_allow_entry_does_not_cover_other_hosts(index, host):
+    assert index.lookup(host) is None
+
+
+@pytest.mark.parametrize("host", ["google.com", "mail.google.com", "a.b.mail.google.com"])
+def test_wildcard_allow_entry_covers_subdomains(index, host):
+    assert index.lookup(host) == ALLOW
+
+
+@pytest.mark.parametrize("host", ["evil-login.tk", "secure.evil-login.tk", "a.phish.example.com",
+                                  "paypal.com.evil.ru", "login.paypal.com.evil.ru"])
+def test_deny_entry_covers_subdomains(index, host):
+    assert index.lookup(host) == DENY
+
+
+@pytest.mark.parametrize("host", ["paypal.com.evil.ru.example.net", "evil.ru", "paypal.com-evil.ru",
+                                  "notevil-login.tk", "google.com.attacker.tk", "xgoogle.com"])
+def test_lookalikes_do_not_match(index, host):
+    assert index.lookup(host) is None
+
+
+@pytest.mark.parametrize("host", ["bbc.co.uk", "www.bbc.co.uk", "example.co.jp", "co.jp.example.com"])
+def test_public_suffix_entries_never_match_as_parent(index, host):
+    assert index.lookup(host) is None
+
+
+def test_deny_wins_over_allow():
+    index = DomainIndex.build(["*.example.com"], ["bad.example.com"])
+    assert index.lookup("bad.example.com") == DENY and index.lookup("x.bad.example.com") == DENY
+    assert index.lookup("good.example.com") == ALLOW
+
+
+def test_ip_host_matches_only_itself():
+    index = DomainIndex.build(["*.168.1.1"], ["10.0.0.1"])
+    assert index.lookup("10.0.0.1") == DENY
+    assert index.lookup("192.168.1.1") is None
+
+
+def test_bloom_false_positive_is_rejected_by_sorted_hashes(index):
+    # Unlisted hosts that the Bloom filter lets through (about 1% of them) reach the hash arrays
+    passing = [host for host in (f"host{i}.unlisted.org" for i in range(20000))
+               if index._maybe_listed(domain_hash(host))]
+    assert passing
+    assert all(index.lookup(host) is None for host in passing)
+
+
+def test_saturated_bloom_filter_changes_no_verdict(index):
+    # Every lookup passes an all-ones filter, so only the sorted hash arrays decide
+    saturated = DomainIndex(index.allow_hashes, index.deny_hashes, np.full(64, 0xFF, dtype=np.uint8),
+                            index.bloom_hashes, index.allow_wildcard_hashes)
+    hosts = ["www.paypal.com", "paypal.com", "mail.google.com", "secure.evil-login.tk", "bbc.co.uk",
+             "attacker.github.io", "unlisted.org", "a.b.c.unlisted.org"]
+    assert [saturated.lookup(host) for host in hosts] == [index.lookup(host) for host in hosts]
+    assert saturated.lookup("unlisted.org") is None
+
+
+def test_load_domain_index_caches_until_a_list_changes(tmp_path):
+    allow, deny = tmp_path / "allow.txt", tmp_path / "deny.txt"
+    allow.write_text("# comment\n*.google.com\n\nwww.paypal.com  # inline\n")
+    deny.write_text("evil-login.tk\n")
+    index = load_domain_index(str(allow), str(deny))
+    assert (tmp_path / "deny.index.npz").exists()
+    assert index.lookup("mail.google.com") == ALLOW and index.lookup("evil-login.tk") == DENY
+
+    cached = load_domain_index(str(allow), str(deny))
+    assert cached.stats()["allow_entries"] == 1 and cached.stats()["allow_wildcard_entries"] == 1
+
+    deny.write_text("evil-login.tk\nother-bad.tk\n")
+    assert load_domain_index(str(allow), str(deny)).lookup("other-bad.tk") == DENY
+
+
+def test_no_lists():
+    with pytest.raises(ValueError):
+        load_domain_index()
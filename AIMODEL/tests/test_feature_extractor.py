@@ -0,0 +1,89 @@
+"""
+extract_features_batch must give the same rows as get_feature_vector, URL by URL, including on the
+edge cases urlparse treats specially and on input that is not a URL string at all.
+"""
+import numpy as np
+import pytest
+
+from src.feature_extractor import (DEFAULT_FEATURE_COLUMNS, EXPECTED_FEATURES, extract_features_batch,
+                                   get_feature_vector, normalize_url, probe_urls)
+
+EDGE_CASE_URLS = [
+    # IP hosts
+    "http://192.168.1.1/login",
+    "http://10.0.0.1:8080/secure/account",
+    "http://[2001:db8::1]:8080/x",
+    "http://[::1]/",
+    # ports and userinfo
+    "https://paypal.com:8443/a",
+    "http://user:pw@paypal.com.evil.ru/",
+    "http://@example.com/",
+    "https://user@[2001:db8::2]:443/verify?id=1",
+    # empty path, query and fragment
+    "https://a.com",
+    "https://a.com/",
+    "https://a.com/?",
+    "https://a.com/#",
+    "https://a.com/?a=&b",
+    "https://a.com//double//slash/",
+    # unicode and IDN
+    "http://bücher.de/straße?q=ü",
+    "http://xn--bcher-kva.de/",
+    "https://пример.рф/вход",
+    "https://ex.com/%E2%82%AC?x=%20y",
+    # not quite URLs
+    "",
+    "example.com/login",
+    "http://[::1",
+]
+
+NON_STR_INPUTS = [None, 123, 4.5, b"http://a.com/x", ["http://a.com/"]]
+
+
+def scalar_rows(urls, columns):
+    return np.array([[get_feature_vector(url, columns)[col] for col in columns] for url in urls],
+                    dtype=np.float32).reshape(len(urls), len(columns))
+
+
+@pytest.mark.parametrize("url", EDGE_CASE_URLS)
+def test_edge_case_url_matches_scalar(url):
+    assert np.array_equal(extract_features_batch([url]), scalar_rows([url], EXPECTED_FEATURES))
+
+
+@pytest.mark.parametrize("value", NON_STR_INPUTS, ids=repr)
+def test_non_str_input_gives_zero_row(value):
+    # Same fallback as the scalar path: the row is all zeros and the rest of the batch is unaffected
+    urls = ["https://paypal.com.evil.ru/login", value, "http://192.168.1.1/"]
+    batch = extract_features_batch(urls)
+    assert np.array_equal(batch, scalar_rows(urls, EXPECTED_FEATURES))
+    assert not batch[1].any() and batch[0].any() and batch[2].any()
+
+
+def test_whole_batch_matches_scalar():
+    urls = EDGE_CASE_URLS + probe_urls(200)
+    for columns in (EXPECTED_FEATURES, DEFAULT_FEATURE_COLUMNS, ["UrlLength", "NotAColumn", "IpAddress"]):
+        assert np.array_equal(extract_features_batch(urls, columns), scalar_rows(urls, columns)), columns
+
+
+def test_batch_layout():
+    X = extract_features_batch(EDGE_CASE_URLS, DEFAULT_FEATURE_COLUMNS)
+    assert X.dtype == np.float32 and X.flags.c_contiguous
+    assert X.shape == (len(EDGE_CASE_URLS), len(DEFAULT_FEATURE_COLUMNS))
+    assert extract_features_batch([]).shape == (0, len(EXPECTED_FEATURES))
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://Example.com", "http://example.com"),
+    ("  example.com/Path?Q=1 ", "https://example.com/Path?Q=1"),
+    ("https://User:PW@WWW.Example.COM.:8443/A#B", "https://User:PW@www.example.com:8443/A#B"),
+    ("http://[2001:DB8::1]:8080/x", "http://[2001:db8::1]:8080/x"),
+    ("javascript://alert(1)", "https://javascript://alert(1)"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+@pytest.mark.parametrize("url", ["", "   "])
+def test_normalize_url_rejects_empty(url):
+    with pytest.raises(ValueError):
+        normalize_url(url)
@@ -0,0 +1,24 @@
+"""Prometheus samples keep full precision, so rate() and increase() see every increment"""
+from src.metrics import CallbackGauge, Counter, LabeledHistogram
+
+
+def test_large_counter_is_not_rounded():
+    counter = Counter("requests_total", "Requests", ("route",))
+    counter.inc("/predict", amount=1234567)
+    counter.inc("/predict")
+    assert list(counter.samples()) == ['requests_total{route="/predict"} 1234568.0']
+
+
+def test_histogram_sum_is_not_rounded():
+    histogram = LabeledHistogram("latency_seconds", "Latency", buckets=(0.5, 1))
+    for _ in range(3):
+        histogram.observe(1234567.25)
+    samples = list(histogram.samples())
+    assert 'latency_seconds_bucket{le="0.5"} 0' in samples and 'latency_seconds_bucket{le="+Inf"} 3' in samples
+    assert "latency_seconds_sum 3703701.75" in samples
+
+
+def test_callback_gauge_values():
+    gauge = CallbackGauge("cache_hits_total", "Hits", lambda: {("a",): 10**7 + 1, ("b",): float("nan")},
+                          labelnames=("cache",), kind="counter")
+    assert list(gauge.samples()) == ['cache_hits_total{cache="a"} 10000001.0', 'cache_hits_total{cache="b"} NaN']
@@ -0,0 +1,30 @@
+"""select_model: the fastest candidate within the accuracy tolerance, or the most accurate without timings"""
+from src.model_training import select_model
+
+
+def entries(accuracies, latencies=None):
+    board = [{"model": f"m{i}", "accuracy": accuracy} for i, accuracy in enumerate(accuracies)]
+    for entry, latency in zip(board, latencies or []):
+        entry["benchmark"] = {"single_row_p99_ms": latency}
+    return board
+
+
+def test_fastest_within_tolerance():
+    board = entries([0.90, 0.93, 0.93, 0.92], [1.0, 3.0, 2.0, 0.5])
+    assert select_model(board) is board[2]
+    assert select_model(board, accuracy_tolerance=0.015) is board[3]
+    assert select_model(board, accuracy_tolerance=0.05) is board[3]
+
+
+def test_first_candidate_wins_ties():
+    board = entries([0.93, 0.93], [1.0, 1.0])
+    assert select_model(board, accuracy_tolerance=0.01) is board[0]
+
+
+def test_without_benchmark_the_most_accurate_wins():
+    # --no-benchmark: no latencies, so a tolerance must not hand the win to the first candidate
+    board = entries([0.90, 0.93, 0.93])
+    assert select_model(board, accuracy_tolerance=0.05) is board[1]
+    for entry in board:
+        entry["benchmark"] = None
+    assert select_model(board, accuracy_tolerance=0.05) is board[1]
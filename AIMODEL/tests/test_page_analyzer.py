@@ -0,0 +1,190 @@
+"""
+Page fetching only reaches global addresses: by name, after DNS and across redirects.
+
+A stub HTTP server on 127.0.0.1 stands in for the web. Name resolution is faked by patching the
+event loop's getaddrinfo, and tests that need a "public" first hop treat 127.0.0.1 as global.
+"""
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import page_analyzer
+from src.page_analyzer import PageAnalyzer, is_public_address
+
+pytestmark = pytest.mark.skipif(not page_analyzer.HAS_HTTPX, reason="page analysis needs httpx")
+httpx = page_analyzer.httpx
+
+PAGE = b"<html><head><title>Sign in</title></head><body><form action='http://x.example/p'></form></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    paths = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        port = self.server.server_address[1]
+        redirects = {
+            "/to-metadata": "http://169.254.169.254/latest/meta-data/",
+            "/to-internal-name": f"http://internal.test:{port}/secret",
+            "/to-public": f"http://public.test:{port}/login",
+            "/loop": "/loop",
+        }
+        if self.path in redirects:
+            self.send_response(302)
+            self.send_header("Location", redirects[self.path])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubHandler.paths = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1], StubHandler.paths
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_dns(monkeypatch):
+    """Host names of the tests, resolved to fixed addresses; lookups are counted per name"""
+    records = {
+        "public.test": ["127.0.0.1"],
+        "internal.test": ["10.0.0.5"],
+        "mixed.test": ["127.0.0.1", "169.254.169.254"],
+    }
+    lookups = {}
+    real_getaddrinfo = asyncio.BaseEventLoop.getaddrinfo
+
+    async def getaddrinfo(self, host, port, *args, **kwargs):
+        if host not in records:
+            return await real_getaddrinfo(self, host, port, *args, **kwargs)
+        lookups[host] = lookups.get(host, 0) + 1
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in records[host]]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    return lookups
+
+
+@pytest.fixture
+def loopback_is_public(monkeypatch):
+    """Let 127.0.0.1 (the stub) count as a global address, so redirects from it can be tested"""
+    real = page_analyzer.is_public_address
+    monkeypatch.setattr(page_analyzer, "is_public_address", lambda address: address == "127.0.0.1" or real(address))
+
+
+def analyze(url: str, **kwargs):
+    async def run():
+        analyzer = PageAnalyzer(timeout_seconds=2, **kwargs)
+        try:
+            return await analyzer.analyze(url), analyzer
+        finally:
+            await analyzer.aclose()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "192.168.0.1", "169.254.169.254", "0.0.0.0",
+                                     "::1", "fe80::1%eth0", "::ffff:127.0.0.1", "fc00::1", "not-an-ip"])
+def test_non_global_addresses(address):
+    assert not is_public_address(address)
+
+
+@pytest.mark.parametrize("address", ["8.8.8.8", "93.184.216.34", "2606:4700:4700::1111", "[2606:4700:4700::1111]"])
+def test_global_addresses(address):
+    assert is_public_address(address)
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "localhost", "app.localhost", "[::1]"])
+def test_private_host_literal_is_not_fetched(stub, host):
+    port, paths = stub
+    features, analyzer = analyze(f"http://{host}:{port}/login")
+    assert features is None and analyzer.blocked == 1
+    assert paths == []
+
+
+def test_name_resolving_to_private_address_is_not_fetched(stub, fake_dns):
+    port, paths = stub
+    for host in ("internal.test", "mixed.test"):
+        features, analyzer = analyze(f"http://{host}:{port}/login")
+        assert features is None and analyzer.blocked == 1, host
+    assert paths == []
+
+
+def test_redirect_to_non_global_address_is_not_followed(stub, fake_dns, loopback_is_public):
+    port, paths = stub
+    for path in ("/to-metadata", "/to-internal-name"):
+        features, analyzer = analyze(f"http://public.test:{port}{path}")
+        assert features is None and analyzer.blocked == 1, path
+    assert "/secret" not in paths
+
+
+def test_redirect_to_global_address_is_followed(stub, fake_dns, loopback_is_public):
+    port, paths = stub
+    features, analyzer = analyze(f"http://public.test:{port}/to-public")
+    assert features is not None and features["MissingTitle"] == 0 and features["InsecureForms"] == 1
+    assert paths == ["/to-public", "/login"]
+
+
+def test_connection_goes_to_the_checked_address(stub, fake_dns, loopback_is_public):
+    port, _ = stub
+    features, _ = analyze(f"http://public.test:{port}/login")
+    assert features is not None
+    # Resolved once, by the check: the connection used that address rather than resolving again
+    assert fake_dns["public.test"] == 1
+
+
+def test_redirect_limit(stub, fake_dns, loopback_is_public):
+    port, paths = stub
+    features, analyzer = analyze(f"http://public.test:{port}/loop", max_redirects=3)
+    assert features is None and analyzer.errors == 1
+    assert paths == ["/loop"] * 4
+
+
+def test_allow_private_fetches_local_pages(stub):
+    port, _ = stub
+    features, analyzer = analyze(f"http://127.0.0.1:{port}/login", allow_private=True)
+    assert features is not None and analyzer.fetched == 1
+
+
+def transport_get(url: str):
+    """GET through a bare client on the public-only transport"""
+    async def run():
+        limits = httpx.Limits(max_connections=4, max_keepalive_connections=4)
+        async with httpx.AsyncClient(transport=page_analyzer._PublicOnlyTransport(limits), timeout=2) as client:
+            response = await client.get(url)
+            return response.status_code, response.headers.get("content-type"), response.content
+    return asyncio.run(run())
+
+
+def test_transport_refuses_non_global_address(stub):
+    port, paths = stub
+    with pytest.raises(page_analyzer.BlockedAddress):
+        transport_get(f"http://127.0.0.1:{port}/login")
+    assert paths == []
+
+
+def test_transport_serves_checked_address(stub, fake_dns, loopback_is_public):
+    port, paths = stub
+    status, content_type, body = transport_get(f"http://public.test:{port}/login")
+    assert (status, content_type, body) == (200, "text/html", PAGE) and paths == ["/login"]
+
+
+def test_transport_raises_httpx_errors(fake_dns, loopback_is_public):
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    with pytest.raises(httpx.ConnectError):
+        transport_get(f"http://public.test:{port}/")
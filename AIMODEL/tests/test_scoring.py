@@ -0,0 +1,133 @@
+"""
+Request-level scoring: single-flight coalescing of identical URLs, and the bounded scoring executor
+that answers 503 with Retry-After instead of queueing without limit.
+
+The API runs without a model here: scoring functions are replaced by stubs that block until released.
+"""
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from src import api
+from src.scoring_executor import THREAD, ExecutorBusy, ScoringExecutor
+
+
+def test_executor_rejects_past_max_pending():
+    release = threading.Event()
+
+    async def run():
+        executor = ScoringExecutor(THREAD, workers=1, max_pending=2, retry_after=2.5)
+        try:
+            running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(ExecutorBusy) as busy:
+                await executor.run(release.wait)
+            assert busy.value.retry_after == 2.5
+            release.set()
+            await asyncio.gather(*running)
+            assert await executor.run(int, "7") == 7  # admits again once the queue drained
+            return executor.stats()
+        finally:
+            executor.shutdown()
+
+    stats = asyncio.run(run())
+    assert stats["admitted"] == 3 and stats["rejected"] == 1 and stats["pending"] == 0
+
+
+def test_busy_error_rounds_retry_after_up():
+    error = api.busy_error(ExecutorBusy(2.5))
+    assert error.status_code == 503 and error.headers == {"Retry-After": "3"}
+    assert api.busy_error(ExecutorBusy(0.2)).headers == {"Retry-After": "1"}
+
+
+@pytest.fixture
+def stub_scoring(monkeypatch):
+    """_score_url replaced by a stub that counts calls and waits for release"""
+    calls = []
+    release = asyncio.Event()
+
+    async def score(url):
+        calls.append(url)
+        await release.wait()
+        return api.build_prediction_response(url, 0, 0.1)
+
+    monkeypatch.setattr(api, "_score_url", score)
+    monkeypatch.setattr(api, "coalesced_requests", 0)
+    api._inflight.clear()
+    return calls, release
+
+
+def test_concurrent_identical_urls_share_one_scoring_call(stub_scoring):
+    calls, release = stub_scoring
+
+    async def run():
+        waiters = [asyncio.ensure_future(api.predict_single_flight("https://a.com/x")) for _ in range(5)]
+        other = asyncio.ensure_future(api.predict_single_flight("https://b.com/"))
+        await asyncio.sleep(0)
+        assert len(api._inflight) == 2
+        release.set()
+        return await asyncio.gather(*waiters), await other
+
+    results, other = asyncio.run(run())
+    assert calls == ["https://a.com/x", "https://b.com/"]
+    assert all(result is results[0] for result in results) and other.url == "https://b.com/"
+    assert api.coalesced_requests == 4
+    assert api._inflight == {}
+
+
+def test_cancelled_caller_does_not_cancel_shared_prediction(stub_scoring):
+    calls, release = stub_scoring
+
+    async def run():
+        first = asyncio.ensure_future(api.predict_single_flight("https://a.com/x"))
+        second = asyncio.ensure_future(api.predict_single_flight("https://a.com/x"))
+        await asyncio.sleep(0)
+        first.cancel()  # e.g. the client disconnected
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, second = asyncio.run(run())
+    assert first.cancelled()
+    assert second.url == "https://a.com/x" and calls == ["https://a.com/x"]
+
+
+def test_predict_answers_503_with_retry_after_when_saturated(monkeypatch):
+    """The real /predict route and _score_url, with the model call replaced by a blocking stub"""
+    release = threading.Event()
+
+    def blocking_predict(url, *args):
+        release.wait(5)
+        return api.build_prediction_response(url, 0, 0.1)
+
+    executor = ScoringExecutor(THREAD, workers=1, max_pending=1, retry_after=2.5)
+    monkeypatch.setattr(api, "scoring_executor", executor)
+    monkeypatch.setattr(api, "predict_phishing_from_url", blocking_predict)
+    monkeypatch.setattr(api, "micro_batcher", None)
+    monkeypatch.setattr(api, "page_analyzer", None)
+    monkeypatch.setattr(api, "domain_index", None)
+    monkeypatch.setattr(api, "drift_monitor", None)
+    monkeypatch.setattr(api, "ready", True)
+    api.verdict_cache.clear()
+    api._inflight.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            admitted = asyncio.ensure_future(client.post("/predict", json={"url": "https://a.com/"}))
+            while executor.pending == 0:
+                await asyncio.sleep(0.001)
+            rejected = await client.post("/predict", json={"url": "https://b.com/"})
+            release.set()
+            return await admitted, rejected
+
+    try:
+        admitted, rejected = asyncio.run(run())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert admitted.status_code == 200 and admitted.json()["url"] == "https://a.com/"
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "3"
+    assert executor.stats()["rejected"] == 1
@@ -0,0 +1,103 @@
+"""
+CompiledTreeEnsemble gives the probabilities of the estimator it was exported from.
+
+Small models are fitted on count-like features (many ties at split thresholds, as in the real
+URL columns) and compared with their own predict_proba, early-stopped boosters included.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from src.tree_engine import export_tree_ensemble, load_tree_ensemble
+
+TOLERANCE = 1e-5
+COLUMNS = [f"f{i}" for i in range(8)]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 6, 3000), rng.integers(0, 80, 3000), rng.random(3000),
+                         rng.integers(0, 2, (3000, 5))]).astype(np.float32)
+    logit = 0.8 * X[:, 0] - 0.05 * X[:, 1] + 2 * X[:, 2] + X[:, 3] - X[:, 4] + rng.normal(0, 1, 3000)
+    y = (logit > np.median(logit)).astype(int)
+    X = pd.DataFrame(X, columns=COLUMNS)
+    return X[:2000], y[:2000], X[2000:], y[2000:]
+
+
+def assert_parity(model, X_test):
+    compiled = export_tree_ensemble(model, feature_columns=COLUMNS)
+    expected = model.predict_proba(X_test)
+    actual = compiled.predict_proba(X_test.to_numpy())
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() < TOLERANCE
+    assert np.array_equal(compiled.predict(X_test.to_numpy()), model.predict(X_test))
+    # Single rows go through the same traversal
+    assert np.abs(compiled.predict_proba(X_test.to_numpy()[0]) - expected[:1]).max() < TOLERANCE
+    return compiled
+
+
+def test_random_forest(data):
+    X_train, y_train, X_test, _ = data
+    assert_parity(RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X_train, y_train), X_test)
+
+
+def test_decision_tree(data):
+    X_train, y_train, X_test, _ = data
+    assert_parity(DecisionTreeClassifier(max_depth=6, random_state=0).fit(X_train, y_train), X_test)
+
+
+def test_xgboost(data):
+    xgboost = pytest.importorskip("xgboost")
+    X_train, y_train, X_test, _ = data
+    model = xgboost.XGBClassifier(n_estimators=40, max_depth=4, learning_rate=0.3, random_state=0)
+    assert_parity(model.fit(X_train, y_train), X_test)
+
+
+def test_xgboost_early_stopping(data):
+    xgboost = pytest.importorskip("xgboost")
+    X_train, y_train, X_test, y_test = data
+    model = xgboost.XGBClassifier(n_estimators=500, max_depth=4, learning_rate=0.5, early_stopping_rounds=5,
+                                  random_state=0)
+    model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
+    assert model.best_iteration + 1 < 500
+    compiled = assert_parity(model, X_test)
+    assert compiled.n_trees == model.best_iteration + 1
+
+
+def test_lightgbm(data):
+    lightgbm = pytest.importorskip("lightgbm")
+    X_train, y_train, X_test, _ = data
+    model = lightgbm.LGBMClassifier(n_estimators=40, num_leaves=15, random_state=0, verbose=-1)
+    assert_parity(model.fit(X_train, y_train), X_test)
+
+
+def test_lightgbm_early_stopping(data):
+    lightgbm = pytest.importorskip("lightgbm")
+    X_train, y_train, X_test, y_test = data
+    model = lightgbm.LGBMClassifier(n_estimators=500, num_leaves=15, learning_rate=0.5, random_state=0, verbose=-1)
+    model.fit(X_train, y_train, eval_set=[(X_test, y_test)], callbacks=[lightgbm.early_stopping(5, verbose=False)])
+    assert 0 < model.best_iteration_ < 500
+    compiled = assert_parity(model, X_test)
+    assert compiled.n_trees == model.best_iteration_
+
+
+def test_saved_arrays_round_trip(data, tmp_path):
+    X_train, y_train, X_test, _ = data
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X_train, y_train)
+    path = tmp_path / "arrays"
+    compiled = export_tree_ensemble(model, str(path), COLUMNS)
+    loaded = load_tree_ensemble(str(path))
+    assert loaded.memory_mapped and loaded.feature_columns == COLUMNS
+    assert np.array_equal(loaded.predict_proba(X_test.to_numpy()), compiled.predict_proba(X_test.to_numpy()))
+
+    # Saving another model to the same path leaves the one already loaded untouched
+    before = loaded.predict_proba(X_test.to_numpy())
+    other = RandomForestClassifier(n_estimators=3, max_depth=2, random_state=1).fit(X_train, 1 - y_train)
+    export_tree_ensemble(other, str(path), COLUMNS)
+    assert np.array_equal(loaded.predict_proba(X_test.to_numpy()), before)
+    reloaded = load_tree_ensemble(str(path)).predict_proba(X_test.to_numpy())
+    assert np.abs(reloaded - other.predict_proba(X_test)).max() < TOLERANCE
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["arrays"]
@@ -0,0 +1,55 @@
+"""VerdictCache: entries expire after their TTL and the least recently used one is evicted first"""
+import pytest
+
+from src import verdict_cache
+from src.verdict_cache import VerdictCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(verdict_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = VerdictCache(max_entries=10, ttl_seconds=60)
+    cache.put("https://a.com", "verdict")
+    clock[0] += 60
+    assert cache.get("https://a.com") == "verdict"
+    clock[0] += 0.001
+    assert cache.get("https://a.com") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1 and cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_put_renews_ttl(clock):
+    cache = VerdictCache(max_entries=10, ttl_seconds=60)
+    cache.put("https://a.com", "old")
+    clock[0] += 50
+    cache.put("https://a.com", "new")
+    clock[0] += 50
+    assert cache.get("https://a.com") == "new"
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = VerdictCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_zero_entries_disables_cache():
+    cache = VerdictCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_clear():
+    cache = VerdictCache()
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None